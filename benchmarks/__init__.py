@@ -0,0 +1,7 @@
+"""
+Benchmarks of airflow-clickhouse-plugin, run with asv: https://asv.readthedocs.io
+
+Benchmarks which require a ClickHouse server use the connection defined by
+``AIRFLOW_CONN_CLICKHOUSE_DEFAULT`` environment variable and are skipped if
+the server is not available.
+"""
@@ -0,0 +1,14 @@
+import clickhouse_driver
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook
+
+
+def require_clickhouse() -> ClickHouseHook:
+    """ Returns a hook or skips a benchmark if ClickHouse is unavailable. """
+    hook = ClickHouseHook()
+    try:
+        hook.execute('SELECT 1')
+    except (clickhouse_driver.errors.Error, OSError):
+        # asv treats NotImplementedError raised in setup as a skip
+        raise NotImplementedError('ClickHouse server is not available')
+    return hook
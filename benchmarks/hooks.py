@@ -0,0 +1,111 @@
+import time
+
+from benchmarks.common import require_clickhouse
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook
+
+
+class SelectDecode:
+    """ Decoding of SELECT results: tuples vs columnar vs NumPy. """
+
+    params = (
+        ['tuples', 'columnar', 'dataframe'],
+        [10_000, 1_000_000],
+    )
+    param_names = ['mode', 'rows']
+    timeout = 300
+
+    def setup(self, mode: str, rows: int):
+        self.hook = require_clickhouse()
+        self.sql = f'''
+            SELECT number, toString(number), toFloat64(number) / 3
+            FROM system.numbers LIMIT {rows}
+        '''
+
+    def _query(self, mode: str):
+        if mode == 'dataframe':
+            return self.hook.query_dataframe(self.sql)
+        return self.hook.execute(self.sql, columnar=mode == 'columnar')
+
+    def time_select(self, mode: str, rows: int):
+        self._query(mode)
+
+    def peakmem_select(self, mode: str, rows: int):
+        self._query(mode)
+
+
+class Insert:
+    """
+    INSERT throughput by block size: tuples vs columnar vs NumPy.
+
+    Rows are inserted into a Null table, so the client (serialization) and
+    the protocol are measured rather than the storage.
+    """
+
+    params = (
+        ['tuples', 'columnar', 'dataframe'],
+        [10_000, 100_000, 1_048_576],
+    )
+    param_names = ['mode', 'block_size']
+    rows = 1_000_000
+    timeout = 300
+
+    def setup(self, mode: str, block_size: int):
+        self.hook = require_clickhouse()
+        self.hook.execute('''
+            CREATE TABLE IF NOT EXISTS benchmark_insert
+            (id UInt64, name String, value Float64) ENGINE = Null
+        ''')
+        ids = range(self.rows)
+        columns = [list(ids), [str(id_) for id_ in ids], [id_ / 3 for id_ in ids]]
+        if mode == 'tuples':
+            self.data = list(zip(*columns))
+        elif mode == 'columnar':
+            self.data = columns
+        else:
+            import pandas as pd
+
+            self.data = pd.DataFrame(dict(zip(('id', 'name', 'value'), columns)))
+
+    def _insert(self, mode: str, block_size: int):
+        if mode == 'dataframe':
+            return self.hook.insert_dataframe(
+                'benchmark_insert',
+                self.data,
+                chunk_rows=block_size,
+            )
+        return self.hook.execute(
+            'INSERT INTO benchmark_insert (id, name, value) VALUES',
+            self.data,
+            columnar=mode == 'columnar',
+            settings={'insert_block_size': block_size},
+        )
+
+    def time_insert(self, mode: str, block_size: int):
+        self._insert(mode, block_size)
+
+    def track_rows_per_second(self, mode: str, block_size: int):
+        started_at = time.perf_counter()
+        self._insert(mode, block_size)
+        return self.rows / (time.perf_counter() - started_at)
+
+    track_rows_per_second.unit = 'rows/s'
+
+
+class ConnectionReuse:
+    """ Latency of a trivial query: a new connection vs a pooled one. """
+
+    params = ['reconnect', 'pool']
+    param_names = ['connection']
+
+    def setup(self, connection: str):
+        require_clickhouse()
+        self.hook = ClickHouseHook(use_pool=connection == 'pool')
+        self.hook.execute('SELECT 1')  # warms the pool up
+
+    def time_select_one(self, connection: str):
+        self.hook.execute('SELECT 1')
+
+    def time_get_conn(self, connection: str):
+        # connection lookup and client creation, the client connects lazily
+        self.hook.get_conn()
@@ -0,0 +1,22 @@
+from airflow_clickhouse_plugin.hooks.clickhouse import _format_query_log
+
+
+class QueryLog:
+    """ Formatting of query logs for large INSERT parameters. """
+
+    params = [1_000, 1_000_000]
+    param_names = ['rows']
+
+    def setup(self, rows: int):
+        self.query = 'INSERT INTO test (id, name) VALUES'
+        self.params = [(number, str(number)) for number in range(rows)]
+
+    def time_format_query_log(self, rows: int):
+        str(_format_query_log(self.query, self.params))
+
+    def peakmem_format_query_log(self, rows: int):
+        str(_format_query_log(self.query, self.params))
+
+    def time_skipped_query_log(self, rows: int):
+        # the message is not rendered if the log level is above INFO
+        _format_query_log(self.query, self.params)
@@ -0,0 +1,21 @@
+from benchmarks.common import require_clickhouse
+
+from airflow_clickhouse_plugin.sensors.clickhouse import ClickHouseSensor
+
+
+class SensorPoke:
+    """ Overhead of ClickHouseSensor.poke with a trivial query. """
+
+    params = [False, True]
+    param_names = ['use_pool']
+
+    def setup(self, use_pool: bool):
+        require_clickhouse()
+        self.sensor = ClickHouseSensor(
+            task_id='benchmark_poke',
+            sql='SELECT 1',
+            hook_params={'use_pool': use_pool},
+        )
+
+    def time_poke(self, use_pool: bool):
+        self.sensor.poke(context={})
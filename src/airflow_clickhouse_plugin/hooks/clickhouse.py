@@ -1,11 +1,34 @@
+import asyncio
+import concurrent.futures
 import contextlib
+import functools
+import queue
+import threading
+import time
 import typing as t
-from itertools import islice
+from itertools import chain, islice
 
 import clickhouse_driver
+from airflow.exceptions import AirflowException
 from airflow.hooks.base import BaseHook
 from airflow.models import Connection
 
+from airflow_clickhouse_plugin.hooks.clickhouse_batcher import insert_batcher
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import connection_cache
+from airflow_clickhouse_plugin.hooks.clickhouse_hosts import select_host
+from airflow_clickhouse_plugin.hooks.clickhouse_pool import client_pool
+from airflow_clickhouse_plugin.hooks.clickhouse_result_cache import \
+    ResultCacheBackendT, get_cached_result, get_result_cache, is_read_only
+from airflow_clickhouse_plugin.hooks.clickhouse_stats import QueryStatsT, \
+    emit_query_stats, format_bytes, format_query_stats, get_query_stats, \
+    track_profile_events
+from airflow_clickhouse_plugin.hooks.clickhouse_tracing import \
+    add_query_stats, is_tracing_enabled, span
+
+if t.TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
 # annotated according to clickhouse_driver.Client.execute comments
 _ParamT = t.NewType('_ParamT', t.Union[list, tuple, dict])
 ExecuteParamsT = t.NewType(
@@ -17,6 +40,15 @@ ExecuteParamsT = t.NewType(
         dict,
     ],
 )
+ExecuteIterReturnT = t.NewType(
+    # clickhouse_driver.Client.execute_iter yielded items
+    'ExecuteIterReturnT',
+    t.Union[
+        tuple,  # a single row
+        t.List[tuple],  # a chunk of rows if chunk_size > 1
+        t.List[t.Tuple[str, str]],  # the first item if with_column_types
+    ],
+)
 ExecuteReturnT = t.NewType(
     # clickhouse_driver.Client.execute return type
     'ExecuteReturnT',
@@ -35,23 +67,177 @@ class ExternalTable(t.TypedDict):
 
 
 default_conn_name = 'clickhouse_default'
+# clickhouse_driver.defines.DEFAULT_INSERT_BLOCK_SIZE
+default_chunk_rows = 1048576
+
+ErrorPolicyT = t.Literal['fail_fast', 'collect_all']
+
+AsyncInsertT = t.Literal['wait', 'fire_and_forget']
+# settings of server-side buffering of INSERT queries by async_insert mode:
+# 'wait' acknowledges an insert once the buffer is flushed into a part,
+# 'fire_and_forget' once data is buffered, so it may be lost on a failure
+async_insert_settings: t.Dict[AsyncInsertT, t.Dict[str, t.Any]] = {
+    'wait': {
+        'async_insert': 1,
+        'wait_for_async_insert': 1,
+        'async_insert_busy_timeout_ms': 1000,
+    },
+    'fire_and_forget': {
+        'async_insert': 1,
+        'wait_for_async_insert': 0,
+        'async_insert_busy_timeout_ms': 1000,
+    },
+}
+
+
+class ClickHouseParallelExecutionError(AirflowException):
+    """
+    Raised by ``ClickHouseHook.execute`` if queries executed in parallel with
+    ``error_policy='collect_all'`` fail.
+
+    ``errors`` maps indices of failed queries to exceptions, ``results``
+    contains results of all the queries in the original order (``None`` for
+    failed ones).
+    """
+
+    def __init__(
+            self,
+            errors: t.Dict[int, BaseException],
+            results: t.List[t.Optional[ExecuteReturnT]],
+    ):
+        super().__init__(
+            f'{len(errors)} of {len(results)} queries failed: '
+            + '; '.join(
+                f'#{index}: {error!r}' for index, error in sorted(errors.items())
+            ),
+        )
+        self.errors = errors
+        self.results = results
 
 
 class ClickHouseHook(BaseHook):
+    """
+    Stats of every executed query (see ``get_query_stats``) are logged and
+    appended to ``query_stats``. If ``metrics_tags`` is set, they are also
+    emitted as Airflow metrics tagged by ``metrics_tags`` and ``conn_id``.
+
+    If ``result_cache_ttl`` is set, results of ``execute`` calls with
+    SELECT-like arguments are cached for this number of seconds, see
+    ``get_result_cache``.
+
+    If ``async_insert`` is set, settings of the mode from
+    ``async_insert_settings`` are added to settings of queries, so the server
+    buffers small INSERT queries and writes them into a part together.
+    Explicit ``settings`` of a call take precedence.
+    """
+
     def __init__(
             self,
             *args,
             clickhouse_conn_id: str = default_conn_name,
             database: t.Optional[str] = None,
+            use_pool: bool = False,
+            connection_cache_ttl: t.Optional[float] = None,
+            metrics_tags: t.Optional[t.Dict[str, str]] = None,
+            result_cache_ttl: t.Optional[float] = None,
+            result_cache_backend: ResultCacheBackendT = 'memory',
+            result_cache_path: t.Optional[str] = None,
+            async_insert: t.Optional[AsyncInsertT] = None,
             **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        if async_insert is not None and async_insert not in async_insert_settings:
+            raise ValueError(
+                f'async_insert must be one of {list(async_insert_settings)}',
+            )
         self._clickhouse_conn_id = clickhouse_conn_id
         self._database = database
+        self._use_pool = use_pool
+        self._connection_cache_ttl = connection_cache_ttl
+        self._metrics_tags = metrics_tags
+        self._result_cache_ttl = result_cache_ttl
+        self._result_cache_backend = result_cache_backend
+        self._result_cache_path = result_cache_path
+        self._async_insert = async_insert
+        self.query_stats: t.List[QueryStatsT] = []
 
-    def get_conn(self) -> clickhouse_driver.Client:
-        conn = self.get_connection(self._clickhouse_conn_id)
-        return clickhouse_driver.Client(**conn_to_kwargs(conn, self._database))
+    def get_conn(self, use_numpy: bool = False) -> clickhouse_driver.Client:
+        return clickhouse_driver.Client(**self._get_connection_kwargs(use_numpy))
+
+    def _get_connection_kwargs(self, use_numpy: bool = False) -> t.Dict[str, t.Any]:
+        connection_kwargs = get_connection_kwargs(
+            self,
+            self._clickhouse_conn_id,
+            self._database,
+            self._connection_cache_ttl,
+        )
+        if use_numpy:
+            connection_kwargs['settings'] = {
+                **connection_kwargs.get('settings', {}),
+                'use_numpy': True,
+            }
+        return connection_kwargs
+
+    @contextlib.contextmanager
+    def _client(
+            self,
+            use_numpy: bool = False,
+    ) -> t.Iterator[clickhouse_driver.Client]:
+        """
+        Context providing a client for the duration of a block.
+
+        Borrows a client from the process-level pool if ``use_pool`` is set,
+        otherwise creates a new client and disconnects it on exit.
+        """
+        if self._use_pool:
+            client_context = \
+                client_pool.borrow(self._get_connection_kwargs(use_numpy))
+        else:
+            client_context = _disconnecting(self.get_conn(use_numpy))
+        with _invalidating_on_auth_failure(
+                self._clickhouse_conn_id,
+                self._database,
+        ), client_context as client:
+            track_profile_events(client)
+            if is_tracing_enabled() and not client.connection.connected:
+                # the client connects lazily, i.e. within the first query
+                with span('clickhouse.connect', {
+                    'server.address': client.connection.host,
+                    'server.port': client.connection.port,
+                }):
+                    client.connection.force_connect()
+            yield client
+
+    def _with_async_insert(
+            self,
+            settings: t.Optional[t.Dict[str, t.Any]],
+    ) -> t.Optional[t.Dict[str, t.Any]]:
+        if self._async_insert is None:
+            return settings
+        return {**async_insert_settings[self._async_insert], **(settings or {})}
+
+    @staticmethod
+    def _span_query(query_id: t.Optional[str]) -> t.ContextManager[t.Any]:
+        return span('clickhouse.execute', {
+            'db.system': 'clickhouse',
+            'clickhouse.query_id': query_id,
+        })
+
+    def _record_query_stats(
+            self,
+            conn: clickhouse_driver.Client,
+            query_id: t.Optional[str],
+            elapsed: t.Optional[float] = None,
+    ) -> None:
+        stats = get_query_stats(conn, query_id, elapsed)
+        add_query_stats(stats)
+        self.query_stats.append(stats)
+        self.log.info('Query stats: %s', format_query_stats(stats))
+        if self._metrics_tags is not None:
+            emit_query_stats(
+                stats,
+                {**self._metrics_tags, 'conn_id': self._clickhouse_conn_id},
+            )
 
     def execute(
             self,
@@ -64,35 +250,459 @@ class ClickHouseHook(BaseHook):
             settings: t.Dict[str, t.Any] = None,
             types_check: bool = False,
             columnar: bool = False,
+            parallelism: int = 1,
+            error_policy: ErrorPolicyT = 'fail_fast',
+            secret_params: t.Collection[str] = (),
     ) -> ExecuteReturnT:
         """
         Passes arguments to ``clickhouse_driver.Client.execute``.
 
         Allows execution of multiple queries, if ``sql`` argument is an
         iterable. Returns results of the last query's execution.
+
+        By default, queries are executed one by one using a single connection.
+        If ``parallelism`` is greater than 1, up to ``parallelism`` queries are
+        executed concurrently, each using a separate connection, so queries
+        must be independent. ``error_policy`` defines what happens if a query
+        fails: ``fail_fast`` cancels queries which were not started yet and
+        raises the error as soon as running queries finish, ``collect_all``
+        executes all the queries and raises
+        ``ClickHouseParallelExecutionError`` with all the errors.
+
+        Values of ``secret_params`` (names of ``params`` of a dict) are
+        masked in logs, and results of such queries are not cached.
         """
         if isinstance(sql, str):
             sql = (sql,)
-        with _disconnecting(self.get_conn()) as conn:
+        settings = self._with_async_insert(settings)
+        if isinstance(params, t.Generator):
+            sql = list(sql)
+            if len(sql) > 1:
+                # every query gets the same params: a generator is exhausted
+                # by the first query
+                raise ValueError(
+                    'params must not be a generator if sql contains multiple'
+                    ' queries, use insert_rows to stream rows instead',
+                )
+        if parallelism > 1:
+            return self._execute_parallel(
+                list(sql),
+                parallelism,
+                error_policy,
+                secret_params,
+                params=params,
+                with_column_types=with_column_types,
+                external_tables=external_tables,
+                query_id=query_id,
+                settings=settings,
+                types_check=types_check,
+                columnar=columnar,
+            )
+        if self._result_cache_ttl is not None and not external_tables \
+                and not secret_params \
+                and (params is None or isinstance(params, dict)):
+            sql = list(sql)
+            if is_read_only(sql):
+                return get_cached_result(
+                    get_result_cache(
+                        self._result_cache_backend,
+                        self._result_cache_path,
+                    ),
+                    [
+                        self._clickhouse_conn_id, self._database, sql, params,
+                        with_column_types, settings, types_check, columnar,
+                    ],
+                    self._result_cache_ttl,
+                    lambda: self._execute_serial(
+                        sql, params, with_column_types, external_tables,
+                        query_id, settings, types_check, columnar,
+                    ),
+                    self._clickhouse_conn_id,
+                )
+        return self._execute_serial(
+            sql, params, with_column_types, external_tables,
+            query_id, settings, types_check, columnar, secret_params,
+        )
+
+    def _execute_serial(
+            self,
+            sql: t.Iterable[str],
+            params: t.Optional[ExecuteParamsT],
+            with_column_types: bool,
+            external_tables: t.Optional[t.List[ExternalTable]],
+            query_id: t.Optional[str],
+            settings: t.Dict[str, t.Any],
+            types_check: bool,
+            columnar: bool,
+            secret_params: t.Collection[str] = (),
+    ) -> ExecuteReturnT:
+        row_counter = None
+        if isinstance(params, t.Generator):
+            row_counter = _RowCounter()
+            params = row_counter.wrap(params)
+        with self._client() as conn:
             last_result = None
             for query in sql:
-                self.log.info(_format_query_log(query, params))
-                last_result = conn.execute(
+                self.log.info(_format_query_log(query, params, secret_params))
+                with self._span_query(query_id):
+                    last_result = conn.execute(
+                        query,
+                        params=params,
+                        with_column_types=with_column_types,
+                        external_tables=external_tables,
+                        query_id=query_id,
+                        settings=settings,
+                        types_check=types_check,
+                        columnar=columnar,
+                    )
+                    self._record_query_stats(conn, query_id)
+        if row_counter is not None:
+            self.log.info('Sent %s rows of a generator', row_counter.rows)
+        return last_result
+
+    def _execute_parallel(
+            self,
+            queries: t.List[str],
+            parallelism: int,
+            error_policy: ErrorPolicyT,
+            secret_params: t.Collection[str],
+            params: t.Optional[ExecuteParamsT],
+            query_id: t.Optional[str],
+            **execute_kwargs,
+    ) -> ExecuteReturnT:
+        if error_policy not in t.get_args(ErrorPolicyT):
+            raise ValueError(f'unknown error_policy: {error_policy!r}')
+        if params is not None and not isinstance(params, (list, tuple, dict)):
+            # a generator cannot be consumed by multiple queries concurrently
+            raise ValueError(
+                'params must be a list, a tuple or a dict if parallelism > 1',
+            )
+        if not queries:
+            return None  # as returned by serial execution
+
+
+        def execute_query(index: int, query: str) -> ExecuteReturnT:
+            # concurrent queries cannot share an id
+            index_query_id = None if query_id is None else f'{query_id}-{index}'
+            with self._client() as conn, self._span_query(index_query_id):
+                self.log.info(_format_query_log(query, params, secret_params))
+                result = conn.execute(
                     query,
                     params=params,
-                    with_column_types=with_column_types,
+                    query_id=index_query_id,
+                    **execute_kwargs,
+                )
+                self._record_query_stats(conn, index_query_id)
+                return result
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(parallelism, len(queries)),
+                thread_name_prefix='clickhouse-execute',
+        ) as executor:
+            futures = [
+                executor.submit(execute_query, index, query)
+                for index, query in enumerate(queries)
+            ]
+            _, pending = concurrent.futures.wait(
+                futures,
+                return_when=concurrent.futures.FIRST_EXCEPTION
+                if error_policy == 'fail_fast'
+                else concurrent.futures.ALL_COMPLETED,
+            )
+            for future in pending:
+                future.cancel()
+        # executor exit waits for running queries
+        results: t.List[t.Optional[ExecuteReturnT]] = [None] * len(queries)
+        errors: t.Dict[int, BaseException] = {}
+        for index, future in enumerate(futures):
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                results[index] = future.result()
+            elif error_policy == 'fail_fast':
+                raise error
+            else:
+                errors[index] = error
+        if errors:
+            raise ClickHouseParallelExecutionError(errors, results)
+        return results[-1]
+
+    def execute_iter(
+            self,
+            sql: t.Union[str, t.Iterable[str]],
+            # arguments of clickhouse_driver.Client.execute_iter
+            params: t.Optional[ExecuteParamsT] = None,
+            with_column_types: bool = False,
+            external_tables: t.Optional[t.List[ExternalTable]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+            types_check: bool = False,
+            chunk_size: int = 1,
+    ) -> t.Generator[ExecuteIterReturnT, None, None]:
+        """
+        Streams results using ``clickhouse_driver.Client.execute_iter``.
+
+        If ``sql`` is an iterable, all the queries but the last one are
+        executed with ``clickhouse_driver.Client.execute`` and results of the
+        last query are streamed. Rows are yielded one by one or in lists of
+        ``chunk_size`` rows. The server sends rows in blocks of up to
+        ``max_block_size`` rows (set it via ``settings``).
+
+        The connection is established on the first iteration and is kept open
+        only while the generator is alive.
+        """
+        if isinstance(sql, str):
+            sql = (sql,)
+        *queries, last_query = sql
+        settings = self._with_async_insert(settings)
+        with self._client() as conn:
+            for query in queries:
+                self.log.info(_format_query_log(query, params))
+                with self._span_query(query_id):
+                    conn.execute(
+                        query,
+                        params=params,
+                        external_tables=external_tables,
+                        query_id=query_id,
+                        settings=settings,
+                        types_check=types_check,
+                    )
+                    self._record_query_stats(conn, query_id)
+            self.log.info(_format_query_log(last_query, params))
+            # the streamed query is not wrapped into a span: the current span
+            # must not stay active in the caller's context between iterations
+            started_at = time.monotonic()
+            yield from conn.execute_iter(
+                last_query,
+                params=params,
+                with_column_types=with_column_types,
+                external_tables=external_tables,
+                query_id=query_id,
+                settings=settings,
+                types_check=types_check,
+                chunk_size=chunk_size,
+            )
+            # not reached if the generator is closed before exhaustion
+            self._record_query_stats(
+                conn,
+                query_id,
+                elapsed=time.monotonic() - started_at,
+            )
+
+    def query_dataframe(
+            self,
+            sql: t.Union[str, t.Iterable[str]],
+            # arguments of clickhouse_driver.Client.query_dataframe
+            params: t.Optional[dict] = None,
+            external_tables: t.Optional[t.List[ExternalTable]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+            replace_nonwords: bool = True,
+    ) -> 'pd.DataFrame':
+        """
+        Passes arguments to ``clickhouse_driver.Client.query_dataframe``.
+
+        Columns are read directly into NumPy arrays (``use_numpy`` setting),
+        without building Python tuples. Requires NumPy extras of
+        clickhouse-driver to be installed. If ``sql`` is an iterable, returns
+        a DataFrame of the last query.
+        """
+        if isinstance(sql, str):
+            sql = (sql,)
+        *queries, last_query = sql
+        settings = self._with_async_insert(settings)
+        with self._client(use_numpy=True) as conn:
+            for query in queries:
+                self.log.info(_format_query_log(query, params))
+                with self._span_query(query_id):
+                    conn.execute(
+                        query,
+                        params=params,
+                        external_tables=external_tables,
+                        query_id=query_id,
+                        settings=settings,
+                    )
+                    self._record_query_stats(conn, query_id)
+            self.log.info(_format_query_log(last_query, params))
+            with self._span_query(query_id):
+                dataframe = conn.query_dataframe(
+                    last_query,
+                    params=params,
                     external_tables=external_tables,
                     query_id=query_id,
                     settings=settings,
-                    types_check=types_check,
-                    columnar=columnar,
+                    replace_nonwords=replace_nonwords,
                 )
-        return last_result
+                self._record_query_stats(conn, query_id)
+            return dataframe
+
+    def insert_dataframe(
+            self,
+            table: str,
+            data: t.Union['pd.DataFrame', t.Iterable['pd.DataFrame']],
+            chunk_rows: int = default_chunk_rows,
+            # arguments of clickhouse_driver.Client.insert_dataframe
+            external_tables: t.Optional[t.List[ExternalTable]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+    ) -> int:
+        """
+        Inserts pandas DataFrame(s) using ``Client.insert_dataframe``.
+
+        ``data`` is a DataFrame or an iterable (e.g. a generator) of
+        DataFrames: each DataFrame is inserted with a separate query, so only
+        one of them is required to be in memory at once. Columns are sent as
+        NumPy arrays in blocks of up to ``chunk_rows`` rows without building
+        Python tuples. Requires NumPy extras of clickhouse-driver to be
+        installed. Returns the number of inserted rows.
+        """
+        import pandas as pd
+
+        if isinstance(data, pd.DataFrame):
+            data = (data,)
+        settings = {
+            **self._with_async_insert(settings or {}),
+            'insert_block_size': chunk_rows,
+        }
+        inserted_rows = 0
+        with self._client(use_numpy=True) as conn:
+            for dataframe in data:
+                query = _format_insert_query(table, dataframe.columns)
+                self.log.info(f'{query} with DataFrame of {len(dataframe)} rows')
+                with self._span_query(query_id):
+                    inserted_rows += conn.insert_dataframe(
+                        query,
+                        dataframe,
+                        external_tables=external_tables,
+                        query_id=query_id,
+                        settings=settings,
+                    ) or 0
+                    self._record_query_stats(conn, query_id)
+        return inserted_rows
+
+    def insert_arrow(
+            self,
+            table: str,
+            data: t.Union[
+                'pa.Table', 'pa.RecordBatch',
+                t.Iterable[t.Union['pa.Table', 'pa.RecordBatch']],
+            ],
+            chunk_rows: int = default_chunk_rows,
+            external_tables: t.Optional[t.List[ExternalTable]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+    ) -> int:
+        """
+        Inserts PyArrow data using ``Client.insert_dataframe``.
+
+        ``data`` is a Table, a RecordBatch or an iterable of them (e.g. a
+        RecordBatchReader). Data is split into record batches of up to
+        ``chunk_rows`` rows and each batch is converted to a DataFrame and
+        inserted separately, so memory usage is bounded by a single batch.
+        Returns the number of inserted rows.
+        """
+        return self.insert_dataframe(
+            table,
+            (
+                batch.to_pandas()
+                for batch in _iter_record_batches(data, chunk_rows)
+            ),
+            chunk_rows,
+            external_tables,
+            query_id,
+            settings,
+        )
+
+    def insert_rows(
+            self,
+            table: str,
+            rows: t.Union[t.Iterable[t.Any], t.AsyncIterable[t.Any]],
+            columns: t.Optional[t.Sequence[str]] = None,
+            batched: bool = False,
+            block_size: int = default_chunk_rows,
+            on_progress: t.Optional[t.Callable[[int], None]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+            types_check: bool = False,
+    ) -> int:
+        """
+        Streams rows into a table by a single INSERT query.
+
+        ``rows`` is an iterable (e.g. a generator or a file reader) or an
+        async iterable of rows, or of lists of rows if ``batched`` is set.
+        Rows are pulled only when the client builds the next native block of
+        ``block_size`` rows, so memory usage is bounded by a single block
+        regardless of the source size. Blocks are compressed if
+        ``compression`` is set in the connection extras.
+
+        An async iterable is consumed by a separate event loop in a thread.
+        After every block, the number of rows sent so far is logged and
+        passed to ``on_progress``. Returns the number of inserted rows.
+        """
+        if isinstance(rows, t.AsyncIterable):
+            rows = _iter_async(rows)
+        if batched:
+            rows = chain.from_iterable(rows)
+
+        def report(sent_rows: int) -> None:
+            self.log.info('Sent %s rows into %s', sent_rows, table)
+            if on_progress is not None:
+                on_progress(sent_rows)
+
+        query = f'INSERT INTO {table} VALUES' if columns is None \
+            else _format_insert_query(table, columns)
+        row_counter = _RowCounter()
+        with self._client() as conn, self._span_query(query_id):
+            self.log.info(_format_query_log(query, None))
+            inserted_rows = conn.execute(
+                query,
+                row_counter.wrap(rows, block_size, report),
+                query_id=query_id,
+                settings={
+                    **self._with_async_insert(settings or {}),
+                    'insert_block_size': block_size,
+                },
+                types_check=types_check,
+            )
+            self._record_query_stats(conn, query_id)
+        if row_counter.rows % block_size:
+            report(row_counter.rows)  # the last incomplete block
+        return inserted_rows
+
+    def buffer_rows(
+            self,
+            table: str,
+            rows: t.Iterable[t.Any],
+            columns: t.Optional[t.Sequence[str]] = None,
+    ) -> None:
+        """
+        Buffers rows to be inserted into a table together with rows buffered
+        by other calls in the thread, see ``InsertBatcher``.
+
+        Must be called within an ``insert_batcher.batching()`` block, which
+        inserts the rest of buffered rows on exit. Rows are buffered per
+        connection, database, table and columns and are inserted by
+        ``insert_rows`` of the hook of the first buffered call.
+        """
+        if columns is not None:
+            columns = tuple(columns)
+        insert_batcher.add(
+            (self._clickhouse_conn_id, self._database, table, columns),
+            rows,
+            functools.partial(self.insert_rows, table, columns=columns),
+        )
 
 
 def conn_to_kwargs(conn: Connection, database: t.Optional[str]) -> t.Dict[str, t.Any]:
     """ Translate Airflow Connection to clickhouse-driver Connection kwargs. """
     connection_kwargs = conn.extra_dejson.copy()
+    # use_numpy is a setting of clickhouse_driver.Client, not of Connection
+    if 'use_numpy' in connection_kwargs:
+        connection_kwargs['settings'] = {
+            **connection_kwargs.get('settings', {}),
+            'use_numpy': _asbool(connection_kwargs.pop('use_numpy')),
+        }
     # Connection attributes can be parsed to empty strings by urllib.unparse
     connection_kwargs['host'] = conn.host or 'localhost'
     if conn.port:
@@ -108,12 +718,163 @@ def conn_to_kwargs(conn: Connection, database: t.Optional[str]) -> t.Dict[str, t
     return connection_kwargs
 
 
-def _format_query_log(query: str, params: ExecuteParamsT) -> str:
-    return ''.join((query, f' with {_format_params(params)}' if params else ''))
+def get_connection_kwargs(
+        hook: BaseHook,
+        conn_id: str,
+        database: t.Optional[str],
+        cache_ttl: t.Optional[float] = None,
+) -> t.Dict[str, t.Any]:
+    """
+    Returns ``conn_to_kwargs`` output for an Airflow connection.
+
+    If ``cache_ttl`` is set, the output is cached for ``cache_ttl`` seconds in
+    the process-level ``connection_cache``: the Airflow connection is not
+    looked up (e.g. in a secrets backend) until the entry expires.
+
+    If the connection defines multiple ``hosts`` in extras, a host is
+    selected by ``select_host``.
+    """
+    with span('clickhouse.get_connection', {'airflow.conn_id': conn_id}):
+        if cache_ttl is None:
+            return select_host(
+                conn_to_kwargs(hook.get_connection(conn_id), database),
+            )
+        cache_key = (conn_id, database)
+        connection_kwargs = connection_cache.get(cache_key)
+        if connection_kwargs is None:
+            connection_kwargs = \
+                conn_to_kwargs(hook.get_connection(conn_id), database)
+            connection_cache.set(cache_key, connection_kwargs, cache_ttl)
+        # a host is selected on every call, cached kwargs contain all the hosts
+        return select_host(connection_kwargs.copy())
+
+
+_AUTH_FAILURE_CODES = frozenset((
+    clickhouse_driver.errors.ErrorCodes.UNKNOWN_USER,
+    clickhouse_driver.errors.ErrorCodes.WRONG_PASSWORD,
+    clickhouse_driver.errors.ErrorCodes.REQUIRED_PASSWORD,
+    516,  # AUTHENTICATION_FAILED, not defined in clickhouse_driver
+))
+
+
+def is_auth_failure(error: BaseException) -> bool:
+    return isinstance(error, clickhouse_driver.errors.ServerException) \
+        and error.code in _AUTH_FAILURE_CODES
+
+
+@contextlib.contextmanager
+def _invalidating_on_auth_failure(
+        conn_id: str,
+        database: t.Optional[str],
+) -> t.Iterator[None]:
+    """ Drops cached connection kwargs if credentials are rejected. """
+    try:
+        yield
+    except clickhouse_driver.errors.ServerException as error:
+        if is_auth_failure(error):
+            connection_cache.invalidate((conn_id, database))
+        raise
+
+
+def _format_insert_query(table: str, columns: t.Iterable[str]) -> str:
+    columns_str = ', '.join(f'`{column}`' for column in columns)
+    return f'INSERT INTO {table} ({columns_str}) VALUES'
+
+
+def _iter_record_batches(
+        data: t.Union[
+            'pa.Table', 'pa.RecordBatch',
+            t.Iterable[t.Union['pa.Table', 'pa.RecordBatch']],
+        ],
+        chunk_rows: int,
+) -> t.Iterator['pa.RecordBatch']:
+    import pyarrow as pa
+
+    if isinstance(data, (pa.Table, pa.RecordBatch)):
+        data = (data,)
+    for chunk in data:
+        if isinstance(chunk, pa.RecordBatch):
+            chunk = pa.Table.from_batches([chunk])
+        yield from chunk.to_batches(max_chunksize=chunk_rows)
+
+
+def _asbool(value: t.Any) -> bool:
+    # Connection.extra parsed from URI query contains strings only
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes', 'y', 'on')
+    return bool(value)
+
+
+def _estimate_size(value: t.Any) -> int:
+    """ Cheap estimate of a number of bytes of a value serialized to JSON. """
+    if isinstance(value, (str, bytes)):
+        return len(value) + 2
+    if isinstance(value, (list, tuple)):
+        return sum(map(_estimate_size, value)) + len(value) + 1
+    if isinstance(value, dict):
+        return sum(
+            _estimate_size(key) + _estimate_size(item)
+            for key, item in value.items()
+        ) + 2 * len(value) + 1
+    return 8  # numbers, dates, None, etc.
+
+
+# query logs are truncated to this number of characters
+_MAX_QUERY_LOG_SIZE = 4096
+
+
+class _QueryLog:
+    """
+    A log message of a query with its parameters, rendered lazily.
+
+    Logging converts the message to a string only if it is emitted, so the
+    cost of a skipped message does not depend on parameters. Rendering takes
+    the first ``limit`` parameters only, the message is truncated to
+    ``max_size`` characters and secrets are masked.
+    """
+
+    def __init__(
+            self,
+            query: str,
+            params: t.Optional[ExecuteParamsT],
+            limit: int = 10,
+            max_size: int = _MAX_QUERY_LOG_SIZE,
+    ):
+        self._query = query
+        self._params = params
+        self._limit = limit
+        self._max_size = max_size
+        self._rendered: t.Optional[str] = None
+
+    def __str__(self) -> str:
+        if self._rendered is None:
+            message = self._query
+            if self._params:
+                message += f' with {_format_params(self._params, self._limit)}'
+            if len(message) > self._max_size:
+                message = f'{message[:self._max_size]} … and' \
+                    f' {len(message) - self._max_size} more characters'
+            self._rendered = _redact(message)
+        return self._rendered
+
+
+def _format_query_log(
+        query: str,
+        params: t.Optional[ExecuteParamsT],
+        secret_params: t.Collection[str] = (),
+) -> _QueryLog:
+    if secret_params and isinstance(params, dict):
+        params = {
+            name: '***' if name in secret_params else value
+            for name, value in params.items()
+        }
+    return _QueryLog(query, params)
 
 
 def _format_params(params: ExecuteParamsT, limit: int = 10) -> str:
-    if isinstance(params, t.Generator) or len(params) <= limit:
+    if isinstance(params, t.Generator):
+        return 'rows of a generator'
+    if len(params) <= limit:
         return str(params)
     if isinstance(params, dict):
         head = dict(islice(params.items(), limit))
@@ -122,7 +883,109 @@ def _format_params(params: ExecuteParamsT, limit: int = 10) -> str:
     head_str = str(head)
     closing_paren = head_str[-1]
     return f'{head_str[:-1]} … and {len(params) - limit} ' \
-        f'more parameters{closing_paren}'
+        f'more parameters{closing_paren}{_summarize_rows(params, head)}'
+
+
+def _summarize_rows(params: ExecuteParamsT, head: ExecuteParamsT) -> str:
+    """ Summarizes INSERT rows estimating their size by the first ones. """
+    if isinstance(params, dict) or not isinstance(head[0], (list, tuple, dict)):
+        return ''
+    size = sum(map(_estimate_size, head)) * len(params) // len(head)
+    return f' ({len(params)} rows, {len(head[0])} columns, ~{format_bytes(size)})'
+
+
+def _redact(message: str) -> str:
+    return _get_redact()(message)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_redact() -> t.Callable[[str], str]:
+    """ Returns Airflow's secrets masker function for log messages. """
+    try:
+        from airflow.sdk.execution_time.secrets_masker import redact
+    except ImportError:
+        try:  # Airflow 2
+            from airflow.utils.log.secrets_masker import redact
+        except ImportError:
+            return str
+    return redact
+
+
+class _RowCounter:
+    """ Counts rows of generator params consumed by an INSERT query. """
+
+    def __init__(self):
+        self.rows = 0
+
+    def wrap(
+            self,
+            rows: t.Iterable[_ParamT],
+            report_every: t.Optional[int] = None,
+            report: t.Optional[t.Callable[[int], None]] = None,
+    ) -> t.Generator[_ParamT, None, None]:
+        """ Calls ``report`` once every ``report_every`` rows are consumed. """
+        # clickhouse_driver accepts generators, not arbitrary iterators
+        for row in rows:
+            self.rows += 1
+            yield row
+            if report is not None and self.rows % report_every == 0:
+                report(self.rows)
+
+
+_ASYNC_CHUNK_SIZE = 1024  # items passed between threads at once
+_END = object()
+
+
+def _iter_async(
+        items: t.AsyncIterable[t.Any],
+        queue_size: int = 4,
+) -> t.Generator[t.Any, None, None]:
+    """
+    Iterates over an async iterable consumed by an event loop in a thread.
+
+    At most ``queue_size`` chunks of items are read ahead, the reader waits
+    until the consumer catches up.
+    """
+    chunks = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(chunk: t.Any) -> bool:
+        # gives up if the consumer has stopped, e.g. if the insert failed
+        while not stopped.is_set():
+            try:
+                chunks.put(chunk, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    async def consume() -> None:
+        chunk = []
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) >= _ASYNC_CHUNK_SIZE:
+                if not put(chunk):
+                    return
+                chunk = []
+        if not chunk or put(chunk):
+            put(_END)
+
+    def read() -> None:
+        try:
+            asyncio.run(consume())
+        except BaseException as error:
+            put(error)
+
+    reader = threading.Thread(target=read, name='clickhouse-async-rows', daemon=True)
+    reader.start()
+    try:
+        while (chunk := chunks.get()) is not _END:
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield from chunk
+    finally:
+        stopped.set()
+        reader.join()
 
 
 _DisconnectingT = t.TypeVar('_DisconnectingT')
@@ -0,0 +1,109 @@
+import typing as t
+
+import asynch
+from airflow.hooks.base import BaseHook
+from asgiref.sync import sync_to_async
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ExecuteParamsT, \
+    ExecuteReturnT, ExternalTable, _format_query_log, default_conn_name, \
+    get_connection_kwargs
+
+
+class ClickHouseAsyncHook(BaseHook):
+    """
+    Executes queries with asyncio using asynch native-protocol client.
+
+    Mirrors ``ClickHouseHook.execute``, so it can be used in triggers, which
+    run in the event loop of the Airflow triggerer.
+    """
+
+    def __init__(
+            self,
+            *args,
+            clickhouse_conn_id: str = default_conn_name,
+            database: t.Optional[str] = None,
+            connection_cache_ttl: t.Optional[float] = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self._clickhouse_conn_id = clickhouse_conn_id
+        self._database = database
+        self._connection_cache_ttl = connection_cache_ttl
+
+    async def get_conn(self) -> asynch.Connection:
+        # connection lookup might query the metastore or a secrets backend
+        connection_kwargs = await sync_to_async(get_connection_kwargs)(
+            self,
+            self._clickhouse_conn_id,
+            self._database,
+            self._connection_cache_ttl,
+        )
+        return asynch.Connection(**connection_kwargs)
+
+    async def execute(
+            self,
+            sql: t.Union[str, t.Iterable[str]],
+            params: t.Optional[ExecuteParamsT] = None,
+            with_column_types: bool = False,
+            external_tables: t.Optional[t.List[ExternalTable]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+            types_check: bool = False,
+            columnar: bool = False,
+    ) -> ExecuteReturnT:
+        """
+        Executes queries, returns a result of the last one.
+
+        Arguments and return value are the same as of
+        ``ClickHouseHook.execute``.
+        """
+        if isinstance(sql, str):
+            sql = (sql,)
+        last_result = None
+        async with await self.get_conn() as conn:
+            for query in sql:
+                self.log.info(_format_query_log(query, params))
+                async with conn.cursor() as cursor:
+                    _prepare_cursor(
+                        cursor,
+                        external_tables,
+                        query_id,
+                        settings,
+                        types_check,
+                    )
+                    rowcount = await cursor.execute(query, params)
+                    if isinstance(params, (list, tuple)):
+                        # number of inserted rows
+                        last_result = rowcount
+                        continue
+                    rows = await cursor.fetchall()
+                    if columnar:
+                        rows = list(zip(*rows))
+                    if with_column_types:
+                        last_result = rows, [
+                            (column.name, column.type_code)
+                            for column in cursor.description or ()
+                        ]
+                    else:
+                        last_result = rows
+        return last_result
+
+
+def _prepare_cursor(
+        cursor: asynch.Cursor,
+        external_tables: t.Optional[t.List[ExternalTable]],
+        query_id: t.Optional[str],
+        settings: t.Optional[t.Dict[str, t.Any]],
+        types_check: bool,
+) -> None:
+    for external_table in external_tables or ():
+        cursor.set_external_table(
+            external_table['name'],
+            external_table['structure'],
+            external_table['data'],
+        )
+    if query_id is not None:
+        cursor.set_query_id(query_id)
+    if settings is not None:
+        cursor.set_settings(settings)
+    cursor.set_types_check(types_check)
@@ -0,0 +1,124 @@
+import contextlib
+import logging
+import threading
+import time
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+InsertT = t.Callable[[t.List[t.Any]], t.Any]
+
+
+class _Buffer:
+    def __init__(self, insert: InsertT):
+        self.insert = insert
+        self.rows: t.List[t.Any] = []
+        self.created_at = time.monotonic()
+
+
+class _Scope(threading.local):
+    """ Buffers of the outermost batching block of a thread. """
+
+    def __init__(self):
+        self.depth = 0  # the number of active batching blocks of the thread
+        self.buffers: t.Dict[t.Hashable, _Buffer] = {}
+
+
+class InsertBatcher:
+    """
+    Buffer of rows inserted by many calls within a block.
+
+    Rows are added within ``batching`` blocks only and are buffered by a key
+    (e.g. a connection, a table and columns). They are passed to ``insert``
+    of the first ``add`` call of the key once ``max_rows`` rows are buffered,
+    by the first ``add`` call ``max_delay`` seconds after the first buffered
+    row, or on exit of the outermost ``batching`` block. Inserts are
+    executed by the calling thread, so their errors are raised by ``add``
+    and on exit of the block.
+
+    Every thread has its own blocks and buffers: rows added by a thread are
+    inserted or dropped by its outermost block only, so threads do not
+    affect each other.
+
+    Nothing is flushed on process exit: Airflow ends task processes by
+    ``os._exit``, so rows must be flushed by the task itself.
+    """
+
+    def __init__(self, max_rows: int = 100_000, max_delay: float = 5.0):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._scope = _Scope()
+
+    @contextlib.contextmanager
+    def batching(self) -> t.Iterator['InsertBatcher']:
+        """
+        Context of adding rows by the current thread. The outermost block
+        inserts buffered rows on exit, or drops them if the block raises an
+        exception.
+        """
+        self._scope.depth += 1
+        try:
+            yield self
+        except BaseException:
+            buffers = self._exit_block()
+            if buffers:
+                logger.warning(
+                    'Dropped %s buffered rows',
+                    sum(len(buffer.rows) for buffer in buffers),
+                )
+            raise
+        self._insert(self._exit_block())
+
+    def add(self, key: t.Hashable, rows: t.Iterable[t.Any], insert: InsertT) -> None:
+        if not self._scope.depth:
+            raise RuntimeError('rows must be added within a batching block')
+        buffer = self._scope.buffers.get(key)
+        if buffer is None:
+            buffer = self._scope.buffers[key] = _Buffer(insert)
+        buffer.rows.extend(rows)
+        now = time.monotonic()
+        self._insert(self._pop_buffers(
+            lambda buffer: len(buffer.rows) >= self.max_rows
+            or now - buffer.created_at >= self.max_delay
+        ))
+
+    def flush(self) -> None:
+        """ Inserts all rows buffered by the current thread. """
+        self._insert(self._pop_buffers(lambda buffer: True))
+
+    def _exit_block(self) -> t.List[_Buffer]:
+        # buffers of the outermost block
+        self._scope.depth -= 1
+        if self._scope.depth:
+            return []
+        return self._pop_buffers(lambda buffer: True)
+
+    def _pop_buffers(self, is_ready: t.Callable[[_Buffer], bool]) -> t.List[_Buffer]:
+        buffers = self._scope.buffers
+        keys = [key for key, buffer in buffers.items() if is_ready(buffer)]
+        return [buffers.pop(key) for key in keys]
+
+    @staticmethod
+    def _insert(buffers: t.List[_Buffer]) -> None:
+        # every buffer is inserted, the first error is raised afterwards
+        error = None
+        for buffer in buffers:
+            try:
+                buffer.insert(buffer.rows)
+            except Exception as insert_error:
+                logger.error(
+                    'Failed to insert %s buffered rows: %s',
+                    len(buffer.rows),
+                    insert_error,
+                )
+                error = error or insert_error
+        if error is not None:
+            raise error
+
+    def __len__(self) -> int:
+        """ The number of rows buffered by the current thread. """
+        return sum(len(buffer.rows) for buffer in self._scope.buffers.values())
+
+
+# rows buffered by ClickHouseHook.buffer_rows
+insert_batcher = InsertBatcher()
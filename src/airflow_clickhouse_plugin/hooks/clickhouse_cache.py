@@ -0,0 +1,148 @@
+import collections
+import contextlib
+import pickle
+import sqlite3
+import threading
+import time
+import typing as t
+
+_KeyT = t.TypeVar('_KeyT', bound=t.Hashable)
+_ValueT = t.TypeVar('_ValueT')
+
+
+class TTLCache(t.Generic[_KeyT, _ValueT]):
+    """
+    Thread-safe in-memory cache with per-entry TTL and LRU eviction.
+
+    At most ``max_size`` entries are kept: the least recently used entry is
+    evicted on overflow. Counts ``hits`` and ``misses`` of ``get`` calls.
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: t.OrderedDict[_KeyT, t.Tuple[_ValueT, float]] = \
+            collections.OrderedDict()
+
+    def get(self, key: _KeyT, default: t.Optional[_ValueT] = None) -> t.Optional[_ValueT]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: _KeyT, value: _ValueT, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: _KeyT) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> t.Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskTTLCache:
+    """
+    SQLite-backed cache with per-entry TTL and LRU eviction.
+
+    The same interface as ``TTLCache`` but string keys only, values are
+    pickled. Processes of a host using the same ``path`` share entries, so
+    the file must be writable by trusted users only. ``hits`` and ``misses``
+    are counted per process.
+    """
+
+    def __init__(self, path: str, max_size: int = 128):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY,'
+                ' value BLOB, expires_at REAL, accessed_at REAL)'
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> t.Iterator[sqlite3.Connection]:
+        # a connection per call: connections cannot be shared by threads
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            with connection:  # a transaction
+                yield connection
+
+    def get(self, key: str, default: t.Any = None) -> t.Any:
+        now = time.time()
+        with self._connect() as connection:
+            entry = connection.execute(
+                'SELECT value FROM entries WHERE key = ? AND expires_at > ?',
+                (key, now),
+            ).fetchone()
+            if entry is not None:
+                connection.execute(
+                    'UPDATE entries SET accessed_at = ? WHERE key = ?',
+                    (now, key),
+                )
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(entry[0])
+
+    def set(self, key: str, value: t.Any, ttl: float) -> None:
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                (key, pickle.dumps(value), now + ttl, now),
+            )
+            connection.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+            connection.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM entries'
+                ' ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_size,),
+            )
+
+    def invalidate(self, key: str) -> None:
+        with self._connect() as connection:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def clear(self) -> None:
+        with self._connect() as connection:
+            connection.execute('DELETE FROM entries')
+
+    def stats(self) -> t.Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def __len__(self) -> int:
+        with self._connect() as connection:
+            return connection.execute('SELECT count(*) FROM entries').fetchone()[0]
+
+
+# conn_to_kwargs output by (connection id, database)
+connection_cache: TTLCache[t.Tuple[str, t.Optional[str]], t.Dict[str, t.Any]] = \
+    TTLCache()
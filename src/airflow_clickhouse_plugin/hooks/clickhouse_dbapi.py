@@ -1,25 +1,164 @@
+import contextlib
 import typing as t
 
 import clickhouse_driver
 from airflow.providers.common.sql.hooks.sql import DbApiHook
+from clickhouse_driver.dbapi.connection import Connection as DbApiConnection
+from clickhouse_driver.dbapi.cursor import Cursor as DbApiCursor
+from clickhouse_driver.dbapi.errors import OperationalError
 
-from airflow_clickhouse_plugin.hooks.clickhouse import conn_to_kwargs, \
-    default_conn_name
+from airflow_clickhouse_plugin.hooks.clickhouse import default_conn_name, \
+    get_connection_kwargs, is_auth_failure
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import connection_cache
+from airflow_clickhouse_plugin.hooks.clickhouse_pool import client_pool
+from airflow_clickhouse_plugin.hooks.clickhouse_result_cache import \
+    ResultCacheBackendT, get_cached_result, get_result_cache, is_read_only
+
+
+# rows buffered by a streaming cursor, the default max_block_size of ClickHouse
+default_max_row_buffer = 65536
+
+
+def fetch_max_rows_handler(
+        max_rows: int,
+) -> t.Callable[[DbApiCursor], t.List[tuple]]:
+    """
+    Returns a handler for DbApiHook.run which fetches up to ``max_rows`` rows.
+
+    If results are streamed, other rows are not read from the server.
+    """
+    def handler(cursor: DbApiCursor) -> t.List[tuple]:
+        if cursor.description is None:
+            return []
+        return cursor.fetchmany(max_rows)
+
+    return handler
 
 
 class ClickHouseDbApiHook(DbApiHook):
+    """
+    DB API hook based on clickhouse_driver.dbapi.
+
+    If ``stream_results`` is set, cursors read results block by block (of up
+    to ``max_row_buffer`` rows) using clickhouse_driver.Client.execute_iter
+    instead of buffering whole results. ``get_first`` and
+    ``get_records_by_chunks`` always stream.
+    """
+
     conn_name_attr = 'clickhouse_conn_id'
     clickhouse_conn_id: str  # set by DbApiHook.__init__
     default_conn_name = default_conn_name
 
-    def __init__(self, *args, schema: t.Optional[str] = None, **kwargs):
+    def __init__(
+            self,
+            *args,
+            schema: t.Optional[str] = None,
+            use_pool: bool = False,
+            connection_cache_ttl: t.Optional[float] = None,
+            result_cache_ttl: t.Optional[float] = None,
+            result_cache_backend: ResultCacheBackendT = 'memory',
+            result_cache_path: t.Optional[str] = None,
+            stream_results: bool = False,
+            max_row_buffer: int = default_max_row_buffer,
+            **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self._schema = schema
+        self._use_pool = use_pool
+        self._connection_cache_ttl = connection_cache_ttl
+        self._result_cache_ttl = result_cache_ttl
+        self._result_cache_backend = result_cache_backend
+        self._result_cache_path = result_cache_path
+        self._stream_results = stream_results
+        self._max_row_buffer = max_row_buffer
 
     def get_conn(self) -> clickhouse_driver.dbapi.Connection:
-        airflow_conn = self.get_connection(self.clickhouse_conn_id)
-        return clickhouse_driver.dbapi \
-            .connect(**conn_to_kwargs(airflow_conn, self._schema))
+        connection_kwargs = get_connection_kwargs(
+            self,
+            self.clickhouse_conn_id,
+            self._schema,
+            self._connection_cache_ttl,
+        )
+        if not self._use_pool and self._connection_cache_ttl is None \
+                and not self._stream_results:
+            return clickhouse_driver.dbapi.connect(**connection_kwargs)
+        return ClickHouseDbApiConnection(
+            use_pool=self._use_pool,
+            max_row_buffer=self._max_row_buffer if self._stream_results else None,
+            cache_key=(
+                None if self._connection_cache_ttl is None
+                else (self.clickhouse_conn_id, self._schema)
+            ),
+            **connection_kwargs,
+        )
+
+    def get_records(self, sql, parameters=None):
+        return self._get_cached_result(
+            'get_records',
+            sql,
+            parameters,
+            lambda: super(ClickHouseDbApiHook, self).get_records(sql, parameters),
+        )
+
+    def get_first(self, sql, parameters=None):
+        return self._get_cached_result(
+            'get_first',
+            sql,
+            parameters,
+            lambda: self._get_first(sql, parameters),
+        )
+
+    def _get_first(self, sql, parameters):
+        # the first block only is read from the server
+        with self._streaming():
+            return super().get_first(sql, parameters)
+
+    def get_records_by_chunks(
+            self,
+            sql: str,
+            parameters: t.Any = None,
+            chunk_size: int = default_max_row_buffer,
+    ) -> t.Generator[t.List[tuple], None, None]:
+        """
+        Streams a result of a query, yields lists of up to ``chunk_size`` rows.
+
+        At most ``max_row_buffer`` rows are buffered by the cursor.
+        """
+        with self._streaming():
+            conn = self.get_conn()
+        with contextlib.closing(conn), contextlib.closing(conn.cursor()) as cursor:
+            self._run_command(cursor, sql, parameters)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+    @contextlib.contextmanager
+    def _streaming(self) -> t.Iterator[None]:
+        stream_results, self._stream_results = self._stream_results, True
+        try:
+            yield
+        finally:
+            self._stream_results = stream_results
+
+    def _get_cached_result(
+            self,
+            method: str,
+            sql: t.Union[str, t.List[str]],
+            parameters: t.Any,
+            execute: t.Callable[[], t.Any],
+    ) -> t.Any:
+        """ Caches results of check operators and sensors if enabled. """
+        if self._result_cache_ttl is None or not is_read_only(sql):
+            return execute()
+        return get_cached_result(
+            get_result_cache(self._result_cache_backend, self._result_cache_path),
+            [method, self.clickhouse_conn_id, self._schema, sql, parameters],
+            self._result_cache_ttl,
+            execute,
+            self.clickhouse_conn_id,
+        )
 
     def get_openlineage_database_info(self, connection):
         from airflow.providers.openlineage.sqlparser import DatabaseInfo
@@ -33,3 +172,78 @@ class ClickHouseDbApiHook(DbApiHook):
 
     def get_openlineage_default_schema(self):
         return self._schema or "default"
+
+
+class ClickHouseDbApiConnection(DbApiConnection):
+    """
+    DB API connection with optional client pooling and results streaming.
+
+    If ``use_pool`` is set, cursors borrow clients from the process-level pool
+    and return them on close. If credentials are rejected, cached connection
+    kwargs stored under ``cache_key`` are invalidated. If ``max_row_buffer``
+    is set, cursors stream results buffering up to this number of rows.
+    """
+
+    def __init__(
+            self,
+            *,
+            use_pool: bool = False,
+            cache_key: t.Optional[t.Tuple[str, t.Optional[str]]] = None,
+            max_row_buffer: t.Optional[int] = None,
+            **connection_kwargs,
+    ):
+        super().__init__(**connection_kwargs)
+        self._use_pool = use_pool
+        self._cache_key = cache_key
+        self._max_row_buffer = max_row_buffer
+        self._pool_kwargs = connection_kwargs
+
+    def _make_client(self) -> clickhouse_driver.Client:
+        if self._use_pool:
+            return client_pool.acquire(self._pool_kwargs)
+        return super()._make_client()
+
+    def cursor(self, cursor_factory=None) -> DbApiCursor:
+        cursor = super().cursor(cursor_factory or _ClickHouseDbApiCursor)
+        if self._max_row_buffer is not None:
+            cursor.set_stream_results(True, self._max_row_buffer)
+        return cursor
+
+    @contextlib.contextmanager
+    def _invalidating_on_auth_failure(self) -> t.Iterator[None]:
+        try:
+            yield
+        except OperationalError as error:
+            # clickhouse_driver.dbapi wraps driver errors
+            if self._cache_key is not None \
+                    and error.args and is_auth_failure(error.args[0]):
+                connection_cache.invalidate(self._cache_key)
+            raise
+
+
+class _ClickHouseDbApiCursor(DbApiCursor):
+    _connection: ClickHouseDbApiConnection
+
+    def execute(self, operation, parameters=None):
+        if self._client.connection.is_query_executing:
+            # a streamed result of the previous query is partially consumed
+            self._client.disconnect()
+        with self._connection._invalidating_on_auth_failure():
+            return super().execute(operation, parameters)
+
+    def executemany(self, operation, seq_of_parameters):
+        with self._connection._invalidating_on_auth_failure():
+            return super().executemany(operation, seq_of_parameters)
+
+    def close(self):
+        if not self._connection._use_pool:
+            return super().close()
+        # return the client to the pool instead of disconnecting it
+        if self._state != self._states.CURSOR_CLOSED:
+            client_pool.release(self._client)
+        self._state = self._states.CURSOR_CLOSED
+        try:
+            # cursor can be already closed
+            self._connection.cursors.remove(self)
+        except ValueError:
+            pass
@@ -0,0 +1,235 @@
+import itertools
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+HostT = t.Tuple[str, int]
+HostSelectionT = t.Literal['in_order', 'round_robin', 'random', 'least_latency']
+
+# clickhouse_driver.defines.DEFAULT_PORT and DEFAULT_SECURE_PORT
+DEFAULT_PORT = 9000
+DEFAULT_SECURE_PORT = 9440
+# clickhouse_driver.defines.DBMS_DEFAULT_CONNECT_TIMEOUT_SEC
+_DEFAULT_CONNECT_TIMEOUT = 10
+
+
+class _HostState:
+    __slots__ = ('failures', 'retry_at', 'checked_at', 'latency')
+
+    def __init__(self):
+        self.failures = 0
+        self.retry_at = 0.0
+        self.checked_at: t.Optional[float] = None
+        self.latency: t.Optional[float] = None
+
+
+class HostHealth:
+    """
+    Process-level health cache of ClickHouse hosts (replicas).
+
+    A host is checked by opening a TCP connection to it. A host which failed
+    the check is skipped for ``base_backoff * 2 ** (failures - 1)`` seconds
+    (but not more than ``max_backoff``). A host which passed the check is not
+    checked again for ``check_interval`` seconds. Connection latency is
+    smoothed with exponential moving average, ``latency_smoothing`` is the
+    weight of the latest measurement.
+
+    The cache is reset in a forked child process.
+    """
+
+    def __init__(
+            self,
+            base_backoff: float = 1.0,
+            max_backoff: float = 300.0,
+            check_interval: float = 30.0,
+            latency_smoothing: float = 0.3,
+    ):
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.check_interval = check_interval
+        self.latency_smoothing = latency_smoothing
+        self._reset()
+        if hasattr(os, 'register_at_fork'):  # not available on Windows
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._states: t.Dict[HostT, _HostState] = {}
+        self._round_robin: t.Dict[t.Tuple[HostT, ...], t.Iterator[int]] = {}
+
+    def select(
+            self,
+            hosts: t.Sequence[HostT],
+            policy: HostSelectionT = 'in_order',
+            connect_timeout: float = _DEFAULT_CONNECT_TIMEOUT,
+    ) -> t.List[HostT]:
+        """
+        Orders hosts for connection: the first host is a checked one.
+
+        Hosts are ordered by ``policy``, hosts in backoff are moved to the
+        end (the ones to be retried sooner first). Hosts are checked in this
+        order until a host passes the check. If no host passes, all the hosts
+        are returned in this order, so the client fails with its own error.
+        """
+        now = time.monotonic()
+        ordered = self._order(hosts, policy)
+        with self._lock:
+            retry_at = {
+                host: self._states[host].retry_at
+                for host in ordered if host in self._states
+            }
+        available = [host for host in ordered if retry_at.get(host, 0.0) <= now]
+        backed_off = sorted(
+            (host for host in ordered if retry_at.get(host, 0.0) > now),
+            key=retry_at.__getitem__,
+        )
+        ordered = available + backed_off
+        for index, host in enumerate(ordered):
+            if self._check(host, connect_timeout):
+                return ordered[index:] + ordered[:index]
+        return ordered
+
+    def mark_success(self, host: HostT, latency: float) -> None:
+        with self._lock:
+            state = self._states.setdefault(host, _HostState())
+            state.failures = 0
+            state.retry_at = 0.0
+            state.checked_at = time.monotonic()
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += self.latency_smoothing * (latency - state.latency)
+
+    def mark_failure(self, host: HostT) -> None:
+        with self._lock:
+            state = self._states.setdefault(host, _HostState())
+            state.failures += 1
+            backoff = min(
+                self.base_backoff * 2 ** (state.failures - 1),
+                self.max_backoff,
+            )
+            state.retry_at = time.monotonic() + backoff
+            state.checked_at = None
+        logger.warning(
+            'ClickHouse host %s:%s is unreachable, skipping it for %.1f seconds',
+            *host, backoff,
+        )
+
+    def latency(self, host: HostT) -> t.Optional[float]:
+        with self._lock:
+            state = self._states.get(host)
+            return None if state is None else state.latency
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+            self._round_robin.clear()
+
+    def _order(
+            self,
+            hosts: t.Sequence[HostT],
+            policy: HostSelectionT,
+    ) -> t.List[HostT]:
+        hosts = list(hosts)
+        if policy == 'in_order':
+            return hosts
+        if policy == 'round_robin':
+            with self._lock:
+                counter = self._round_robin.setdefault(
+                    tuple(hosts),
+                    itertools.count(),
+                )
+                offset = next(counter) % len(hosts)
+            return hosts[offset:] + hosts[:offset]
+        if policy == 'random':
+            return random.sample(hosts, len(hosts))
+        if policy == 'least_latency':
+            # hosts without measurements go first to be measured
+            return sorted(hosts, key=lambda host: self.latency(host) or 0.0)
+        raise ValueError(f'unknown host_selection: {policy!r}')
+
+    def _check(self, host: HostT, connect_timeout: float) -> bool:
+        with self._lock:
+            state = self._states.get(host)
+            checked_at = state and state.checked_at
+        if checked_at is not None \
+                and time.monotonic() - checked_at < self.check_interval:
+            return True
+        started_at = time.monotonic()
+        try:
+            socket.create_connection(host, timeout=connect_timeout).close()
+        except OSError:
+            self.mark_failure(host)
+            return False
+        self.mark_success(host, time.monotonic() - started_at)
+        return True
+
+
+def parse_hosts(
+        hosts: t.Union[str, t.Iterable[str]],
+        default_port: int,
+) -> t.List[HostT]:
+    """ Parses ``host[:port]`` items of a list or of a comma-separated str. """
+    if isinstance(hosts, str):
+        hosts = hosts.split(',')
+    parsed = []
+    for item in hosts:
+        item = item.strip()
+        if not item:
+            continue
+        host, separator, port = item.rpartition(':')
+        if not separator or host.endswith(':'):  # no port or bare IPv6
+            host, port = item, None
+        parsed.append((host.strip('[]'), int(port) if port else default_port))
+    return parsed
+
+
+def select_host(
+        connection_kwargs: t.Dict[str, t.Any],
+) -> t.Dict[str, t.Any]:
+    """
+    Replaces ``hosts`` and ``host_selection`` of ``conn_to_kwargs`` output
+    with ``host``, ``port`` and ``alt_hosts`` kwargs of a client.
+
+    The selected host is passed as ``host``, other hosts are passed as
+    ``alt_hosts`` so that the client fails over to them in the same order.
+    Connection kwargs without ``hosts`` and ``host_selection`` are returned
+    as is, ``host_selection`` without ``hosts`` is dropped.
+    """
+    if 'hosts' not in connection_kwargs \
+            and 'host_selection' not in connection_kwargs:
+        return connection_kwargs
+    connection_kwargs = connection_kwargs.copy()
+    # not an argument of a client
+    policy = connection_kwargs.pop('host_selection', 'in_order')
+    if 'hosts' not in connection_kwargs:
+        return connection_kwargs
+    is_secure = connection_kwargs.get('secure') in (True, 'True', 'true', '1')
+    default_port = connection_kwargs.get('port') \
+        or (DEFAULT_SECURE_PORT if is_secure else DEFAULT_PORT)
+    hosts = parse_hosts(connection_kwargs.pop('hosts'), int(default_port))
+    if not hosts:
+        return connection_kwargs
+    (host, port), *alt_hosts = host_health.select(
+        hosts,
+        policy,
+        float(connection_kwargs.get('connect_timeout', _DEFAULT_CONNECT_TIMEOUT)),
+    )
+    connection_kwargs.update(host=host, port=port)
+    if alt_hosts:
+        connection_kwargs['alt_hosts'] = ','.join(
+            f'[{host}]:{port}' if ':' in host else f'{host}:{port}'
+            for host, port in alt_hosts
+        )
+    else:
+        connection_kwargs.pop('alt_hosts', None)
+    return connection_kwargs
+
+
+host_health = HostHealth()
@@ -0,0 +1,90 @@
+import json
+import os
+import typing as t
+
+# hooks.handlers was split out of hooks.sql only in common.sql 1.21
+from airflow.providers.common.sql.hooks.sql import DbApiHook, fetch_one_handler
+
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import DiskTTLCache
+
+# parts which might contain rows of a date: by the date partition key, by the
+# DateTime partition key, or any part if the partition key has no dates
+_FINGERPRINT_QUERY = '''SELECT count(), sum(rows), toString(max(modification_time))
+FROM system.parts
+WHERE active
+    AND database = if(%(database)s = '', currentDatabase(), %(database)s)
+    AND table = %(table)s
+    AND (
+        toDate(%(date)s) BETWEEN min_date AND max_date
+        OR toDate(%(date)s) BETWEEN toDate(min_time) AND toDate(max_time)
+        OR max_date = toDate(0) AND max_time = toDateTime(0)
+    )'''
+
+FingerprintT = t.List[t.Any]
+
+
+class MetricStore:
+    """
+    Persisted metrics of tables by date, e.g. for interval checks.
+
+    A metric is stored together with a fingerprint of active parts of the
+    table which might contain rows of the date (see ``get_fingerprint``). A
+    stored metric is returned only if the fingerprint has not changed: an
+    insert, a merge, a mutation or a dropped partition invalidates it.
+    Metrics are kept in an SQLite file at ``path`` (by default
+    ``$AIRFLOW_HOME/clickhouse_metric_store.sqlite``) for ``ttl`` seconds.
+    """
+
+    def __init__(
+            self,
+            path: t.Optional[str] = None,
+            ttl: float = 90 * 24 * 60 * 60,
+            max_size: int = 100_000,
+    ):
+        if path is None:
+            from airflow.configuration import AIRFLOW_HOME
+
+            path = os.path.join(AIRFLOW_HOME, 'clickhouse_metric_store.sqlite')
+        self.ttl = ttl
+        self._cache = DiskTTLCache(path, max_size=max_size)
+
+    @staticmethod
+    def get_fingerprint(hook: DbApiHook, table: str, date: str) -> FingerprintT:
+        """
+        Returns a number of rows, parts and the last modification time of
+        active parts of the ``table`` which might contain rows of the ``date``.
+        """
+        database, _, table = table.rpartition('.')
+        # run is not affected by the result cache of ClickHouseDbApiHook
+        row = hook.run(
+            _FINGERPRINT_QUERY,
+            parameters={'database': database, 'table': table, 'date': date},
+            handler=fetch_one_handler,
+        )
+        return list(row)
+
+    def get(
+            self,
+            key_parts: t.List[t.Any],
+            fingerprint: FingerprintT,
+    ) -> t.Optional[t.Any]:
+        entry = self._cache.get(self._key(key_parts))
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        return entry['value']
+
+    def set(
+            self,
+            key_parts: t.List[t.Any],
+            fingerprint: FingerprintT,
+            value: t.Any,
+    ) -> None:
+        self._cache.set(
+            self._key(key_parts),
+            {'fingerprint': fingerprint, 'value': value},
+            self.ttl,
+        )
+
+    @staticmethod
+    def _key(key_parts: t.List[t.Any]) -> str:
+        return json.dumps(key_parts, default=repr)
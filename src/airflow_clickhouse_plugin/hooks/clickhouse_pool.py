@@ -0,0 +1,166 @@
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import typing as t
+
+import clickhouse_driver
+
+logger = logging.getLogger(__name__)
+
+_IdleClientT = t.Tuple[clickhouse_driver.Client, float]  # client, released at
+
+
+class ClientPool:
+    """
+    Process-level pool of ``clickhouse_driver.Client`` instances.
+
+    Clients are keyed by their ``__init__`` kwargs (as returned by
+    ``conn_to_kwargs``), so a client is reused only for the same connection
+    attributes. A borrowed client is used exclusively by a single borrower.
+
+    * ``max_size``: maximum number of idle clients kept per key. Borrowing is
+      never blocked: if there are no idle clients, a new one is created, and
+      clients released above the limit are disconnected.
+    * ``idle_timeout``: idle clients are disconnected and evicted after this
+      number of seconds.
+    * ``health_check_interval``: a client idle for longer than this number of
+      seconds is pinged before being borrowed and reconnected if the ping
+      fails.
+
+    The pool is reset in a forked child process: sockets inherited from the
+    parent process are never reused nor closed by the child.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 8,
+            idle_timeout: float = 300.0,
+            health_check_interval: float = 30.0,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._reset()
+        if hasattr(os, 'register_at_fork'):  # not available on Windows
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: t.DefaultDict[str, t.Deque[_IdleClientT]] = \
+            collections.defaultdict(collections.deque)
+        self._keys: t.Dict[int, str] = {}  # id(client) -> key
+        self._pid = os.getpid()
+
+    def acquire(self, connection_kwargs: t.Dict[str, t.Any]) -> clickhouse_driver.Client:
+        key = _pool_key(connection_kwargs)
+        client, released_at = self._pop_idle(key)
+        if client is None:
+            client = clickhouse_driver.Client(**connection_kwargs)
+            with self._lock:
+                self._keys[id(client)] = key
+        elif time.monotonic() - released_at > self.health_check_interval:
+            _check_health(client)
+        return client
+
+    def release(self, client: clickhouse_driver.Client) -> None:
+        self._check_pid()
+        connection = client.connection
+        with self._lock:
+            key = self._keys.get(id(client))
+            idle = self._idle[key] if key is not None else None
+            is_reusable = idle is not None \
+                and len(idle) < self.max_size \
+                and not connection.is_query_executing
+            if is_reusable:
+                idle.append((client, time.monotonic()))
+            else:
+                self._keys.pop(id(client), None)
+        if not is_reusable:
+            client.disconnect()
+        self.evict_idle()
+
+    @contextlib.contextmanager
+    def borrow(
+            self,
+            connection_kwargs: t.Dict[str, t.Any],
+    ) -> t.Iterator[clickhouse_driver.Client]:
+        """
+        Context to acquire a client and to release it at the end of a block.
+
+        If the block raises, the client is disconnected instead of being
+        returned to the pool, because its state is unknown.
+        """
+        client = self.acquire(connection_kwargs)
+        try:
+            yield client
+        except BaseException:
+            self.discard(client)
+            raise
+        self.release(client)
+
+    def discard(self, client: clickhouse_driver.Client) -> None:
+        with self._lock:
+            self._keys.pop(id(client), None)
+        client.disconnect()
+
+    def evict_idle(self) -> None:
+        """ Disconnects clients which were idle for longer than idle_timeout. """
+        evicted = []
+        expired_at = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for idle in self._idle.values():
+                # idle clients are ordered by release time
+                while idle and idle[0][1] < expired_at:
+                    client, _ = idle.popleft()
+                    self._keys.pop(id(client), None)
+                    evicted.append(client)
+        for client in evicted:
+            client.disconnect()
+
+    def clear(self) -> None:
+        """ Disconnects all idle clients. """
+        with self._lock:
+            clients = [
+                client for idle in self._idle.values() for client, _ in idle
+            ]
+            for client in clients:
+                self._keys.pop(id(client), None)
+            self._idle.clear()
+        for client in clients:
+            client.disconnect()
+
+    def _pop_idle(self, key: str) -> t.Tuple[t.Optional[clickhouse_driver.Client], float]:
+        self._check_pid()
+        with self._lock:
+            idle = self._idle[key]
+            if idle:
+                # the most recently released client is the most likely alive
+                return idle.pop()
+        return None, 0.0
+
+    def _check_pid(self) -> None:
+        # in case the process was forked without os.register_at_fork support
+        if self._pid != os.getpid():
+            self._reset()
+
+
+def _pool_key(connection_kwargs: t.Dict[str, t.Any]) -> str:
+    return json.dumps(connection_kwargs, sort_keys=True, default=str)
+
+
+def _check_health(client: clickhouse_driver.Client) -> None:
+    connection = client.connection
+    if connection.connected and not connection.ping():
+        logger.warning(
+            'Pooled connection to %s is not alive, reconnecting',
+            connection.get_description(),
+        )
+        # Client reconnects on the next query
+        client.disconnect()
+
+
+client_pool = ClientPool()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import typing as t
+
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import DiskTTLCache, \
+    TTLCache
+from airflow_clickhouse_plugin.hooks.clickhouse_stats import emit_stat
+
+ResultCacheBackendT = t.Literal['memory', 'disk']
+_ResultT = t.TypeVar('_ResultT')
+_MISSING = object()
+# statements which do not change data, after leading comments and brackets
+_READ_ONLY_PATTERN = re.compile(
+    r'(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/|\()*'
+    r'(?:SELECT|WITH|SHOW|DESCRIBE|DESC|EXISTS|EXPLAIN)\b',
+    re.IGNORECASE | re.DOTALL,
+)
+
+# query results by get_result_cache_key, shared by hooks of a process
+result_cache: TTLCache[str, t.Any] = TTLCache(max_size=256)
+_disk_caches: t.Dict[str, DiskTTLCache] = {}
+_disk_caches_lock = threading.Lock()
+
+
+def get_result_cache(
+        backend: ResultCacheBackendT = 'memory',
+        path: t.Optional[str] = None,
+) -> t.Union[TTLCache, DiskTTLCache]:
+    """
+    Returns the process-level ``result_cache`` or a disk cache.
+
+    The disk cache is stored at ``path``, by default
+    ``$AIRFLOW_HOME/clickhouse_result_cache.sqlite``, and is shared by all
+    the processes of a host.
+    """
+    if backend == 'memory':
+        return result_cache
+    if backend != 'disk':
+        raise ValueError(f'unknown result cache backend: {backend!r}')
+    if path is None:
+        from airflow.configuration import AIRFLOW_HOME
+
+        path = os.path.join(AIRFLOW_HOME, 'clickhouse_result_cache.sqlite')
+    with _disk_caches_lock:
+        if path not in _disk_caches:
+            _disk_caches[path] = DiskTTLCache(path)
+        return _disk_caches[path]
+
+
+def is_read_only(sql: t.Union[str, t.Iterable[str]]) -> bool:
+    """
+    Whether ``sql`` contains read-only statements only, which results might
+    be cached: others (INSERT ... SELECT, OPTIMIZE, ALTER, etc.) must reach
+    the server every time.
+    """
+    if isinstance(sql, str):
+        sql = (sql,)
+    return all(_READ_ONLY_PATTERN.match(query) for query in sql)
+
+
+def get_cached_result(
+        cache: t.Union[TTLCache, DiskTTLCache],
+        key_parts: t.List[t.Any],
+        ttl: float,
+        execute: t.Callable[[], _ResultT],
+        conn_id: str,
+) -> _ResultT:
+    """
+    Returns a cached result or executes queries and caches the result.
+
+    ``key_parts`` must identify the queries: a connection, a database,
+    rendered SQL, parameters, settings, etc. Hits and misses are emitted as
+    ``clickhouse.result_cache.hits`` and ``clickhouse.result_cache.misses``
+    Airflow metrics tagged by ``conn_id``.
+    """
+    key = hashlib.sha256(
+        json.dumps(key_parts, default=repr, sort_keys=True).encode(),
+    ).hexdigest()
+    result = cache.get(key, _MISSING)
+    if result is not _MISSING:
+        emit_stat('incr', 'clickhouse.result_cache.hits', tags={'conn_id': conn_id})
+        return result
+    emit_stat('incr', 'clickhouse.result_cache.misses', tags={'conn_id': conn_id})
+    result = execute()
+    cache.set(key, result, ttl)
+    return result
@@ -0,0 +1,170 @@
+import inspect
+import typing as t
+
+import clickhouse_driver
+from clickhouse_driver.protocol import ServerPacketTypes
+
+QueryStatsT = t.Dict[str, t.Any]
+
+# the only ProfileEvent promoted to a top-level key of query stats
+_MEMORY_USAGE_EVENT = 'MemoryTrackerPeakUsage'
+# metric name suffix -> query stats key
+_COUNTERS = {
+    'rows_read': 'rows_read',
+    'bytes_read': 'bytes_read',
+    'rows_written': 'written_rows',
+    'bytes_written': 'written_bytes',
+    'result_rows': 'result_rows',
+}
+
+
+def track_profile_events(client: clickhouse_driver.Client) -> None:
+    """
+    Makes the client keep ProfileEvents sent by the server.
+
+    clickhouse-driver receives ProfileEvents packets but drops them. The
+    client's connection is wrapped once: increments are summed up and gauges
+    are maxed by event name until ``get_query_stats`` pops them.
+    """
+    connection = client.connection
+    if '_profile_events' in vars(connection):
+        return
+    connection._profile_events = {}
+    receive_packet = connection.receive_packet
+
+    def receive_packet_tracking_profile_events():
+        packet = receive_packet()
+        if packet.type == ServerPacketTypes.PROFILE_EVENTS and packet.block:
+            _store_profile_events(connection._profile_events, packet.block)
+        return packet
+
+    connection.receive_packet = receive_packet_tracking_profile_events
+
+
+def _store_profile_events(
+        profile_events: t.Dict[str, int],
+        block: t.Any,
+) -> None:
+    names = [name for name, _ in block.columns_with_types]
+    for row in block.get_rows():
+        event = dict(zip(names, row))
+        name, value = event['name'], event['value']
+        if event['type'] == 'gauge':
+            profile_events[name] = max(profile_events.get(name, value), value)
+        else:
+            profile_events[name] = profile_events.get(name, 0) + value
+
+
+def get_query_stats(
+        client: clickhouse_driver.Client,
+        query_id: t.Optional[str] = None,
+        elapsed: t.Optional[float] = None,
+) -> QueryStatsT:
+    """
+    Returns stats of the last query executed by the client.
+
+    Progress (rows and bytes read and written, server-side elapsed time),
+    profile info (rows of the result) and elapsed time are provided by
+    ``client.last_query``.
+    ``elapsed`` overrides the latter: the client does not measure it for
+    streamed queries. If the client is tracked by ``track_profile_events``,
+    ProfileEvents of the query (and the peak ``memory_usage``) are included.
+    """
+    last_query = client.last_query
+    stats: QueryStatsT = {'query_id': query_id}
+    if last_query is not None:
+        progress = last_query.progress
+        stats.update(
+            elapsed=float(last_query.elapsed if elapsed is None else elapsed),
+            # query execution time measured by the server
+            server_elapsed=int(progress.elapsed_ns) / 1e9,
+            rows_read=int(progress.rows),
+            bytes_read=int(progress.bytes),
+            total_rows_to_read=int(progress.total_rows),
+            written_rows=int(progress.written_rows),
+            written_bytes=int(progress.written_bytes),
+        )
+        # the client drops profile info of some INSERT queries
+        profile_info = last_query.profile_info
+        stats.update(
+            result_rows=int(profile_info.rows) if profile_info else 0,
+            result_bytes=int(profile_info.bytes) if profile_info else 0,
+        )
+    profile_events = vars(client.connection).get('_profile_events')
+    if profile_events is not None:
+        stats['memory_usage'] = profile_events.get(_MEMORY_USAGE_EVENT)
+        stats['profile_events'] = profile_events.copy()
+        profile_events.clear()
+    return stats
+
+
+def format_query_stats(stats: QueryStatsT) -> str:
+    if 'elapsed' not in stats:
+        return 'no stats received'
+    parts = [
+        f"{stats['elapsed']:.3f} s",
+        f"read {stats['rows_read']} rows ({format_bytes(stats['bytes_read'])})",
+    ]
+    if stats['written_rows']:
+        parts.append(
+            f"written {stats['written_rows']} rows"
+            f" ({format_bytes(stats['written_bytes'])})",
+        )
+    parts.append(f"result {stats['result_rows']} rows")
+    if stats.get('memory_usage') is not None:
+        parts.append(f"peak memory {format_bytes(stats['memory_usage'])}")
+    return ', '.join(parts)
+
+
+def emit_query_stats(stats: QueryStatsT, tags: t.Dict[str, str]) -> None:
+    """ Emits query stats as Airflow metrics (StatsD or OpenTelemetry). """
+    emit_stat('incr', 'clickhouse.queries', tags=tags)
+    if 'elapsed' not in stats:
+        return
+    emit_stat('timing', 'clickhouse.query.duration', stats['elapsed'] * 1000, tags=tags)
+    for metric, key in _COUNTERS.items():
+        emit_stat('incr', f'clickhouse.query.{metric}', count=stats[key], tags=tags)
+    if stats.get('memory_usage') is not None:
+        emit_stat(
+            'gauge', 'clickhouse.query.memory_usage', stats['memory_usage'],
+            tags=tags,
+        )
+
+
+def emit_stat(
+        method_name: str,
+        stat: str,
+        *args: t.Any,
+        tags: t.Dict[str, str],
+        **kwargs: t.Any,
+) -> None:
+    """
+    Calls a method of Airflow ``Stats``. Stats loggers of Airflow < 2.6 do
+    not accept ``tags``: the metric is emitted untagged then.
+    """
+    from airflow.stats import Stats
+
+    method = getattr(Stats, method_name)
+    try:
+        parameters = inspect.signature(method).parameters.values()
+    except (TypeError, ValueError):  # not introspectable, assume the new API
+        accepts_tags = True
+    else:
+        accepts_tags = any(
+            parameter.name == 'tags' or parameter.kind is parameter.VAR_KEYWORD
+            for parameter in parameters
+        )
+    if accepts_tags:
+        kwargs['tags'] = tags
+    method(stat, *args, **kwargs)
+
+
+def format_bytes(size: float) -> str:
+    """ Formats a number of bytes in binary units, e.g. ``1.5 KiB``. """
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'TiB'
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
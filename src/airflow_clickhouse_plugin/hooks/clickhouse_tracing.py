@@ -0,0 +1,87 @@
+import contextlib
+import functools
+import typing as t
+
+from airflow.configuration import conf
+
+if t.TYPE_CHECKING:
+    from airflow_clickhouse_plugin.hooks.clickhouse_stats import QueryStatsT
+
+# server-side timings added to spans, see system.events table
+_TIMING_EVENTS = (
+    'RealTimeMicroseconds',
+    'UserTimeMicroseconds',
+    'SystemTimeMicroseconds',
+    'DiskReadElapsedMicroseconds',
+    'NetworkSendElapsedMicroseconds',
+    'NetworkReceiveElapsedMicroseconds',
+)
+_NO_SPAN = contextlib.nullcontext()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_trace() -> t.Any:
+    """
+    Returns Airflow's ``Trace`` if ``[traces] otel_on`` is set, else None.
+
+    Checked once per process, so disabled tracing costs a function call.
+    """
+    if not conf.getboolean('traces', 'otel_on', fallback=False):
+        return None
+    try:
+        # Airflow 2.10+
+        from airflow.traces.tracer import Trace
+    except ImportError:
+        return None
+    return Trace
+
+
+def is_tracing_enabled() -> bool:
+    return _get_trace() is not None
+
+
+def span(
+        name: str,
+        attributes: t.Optional[t.Dict[str, t.Any]] = None,
+) -> t.ContextManager[t.Any]:
+    """
+    Context of an OpenTelemetry span (the current one within the block).
+
+    Spans are exported by Airflow's tracer configured in ``[traces]``
+    section. If tracing is disabled, a no-op context is returned.
+    """
+    trace = _get_trace()
+    if trace is None:
+        return _NO_SPAN
+    return _start_span(trace, name, attributes or {})
+
+
+@contextlib.contextmanager
+def _start_span(
+        trace: t.Any,
+        name: str,
+        attributes: t.Dict[str, t.Any],
+) -> t.Iterator[t.Any]:
+    with trace.start_span(span_name=name, component='clickhouse') as current_span:
+        current_span.set_attributes({
+            key: value for key, value in attributes.items() if value is not None
+        })
+        yield current_span
+
+
+def add_query_stats(stats: 'QueryStatsT') -> None:
+    """ Adds query stats as attributes of the current span (if tracing). """
+    if _get_trace() is None:
+        return
+    from opentelemetry import trace
+
+    attributes = {
+        f'clickhouse.{key}': value for key, value in stats.items()
+        if isinstance(value, (int, float, str))
+    }
+    profile_events = stats.get('profile_events') or {}
+    attributes.update(
+        (f'clickhouse.profile_events.{name}', profile_events[name])
+        for name in _TIMING_EVENTS if name in profile_events
+    )
+    trace.get_current_span().set_attributes(attributes)
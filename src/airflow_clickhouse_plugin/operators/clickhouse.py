@@ -1,9 +1,20 @@
+import collections
+import contextlib
+import gzip
+import json
+import os
+import time
 import typing as t
+from itertools import islice
 
+from airflow.configuration import conf
+from airflow.exceptions import AirflowException
 from airflow.models import BaseOperator
 
-from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook, \
-    ExecuteParamsT, ExecuteReturnT, default_conn_name
+from airflow_clickhouse_plugin.hooks.clickhouse import AsyncInsertT, \
+    ClickHouseHook, ErrorPolicyT, ExecuteIterReturnT, ExecuteParamsT, \
+    ExecuteReturnT, _estimate_size, async_insert_settings, default_conn_name
+from airflow_clickhouse_plugin.triggers.clickhouse import ClickHouseTrigger
 
 
 class BaseClickHouseOperator(BaseOperator):
@@ -41,9 +52,21 @@ class BaseClickHouseOperator(BaseOperator):
             settings: t.Dict[str, t.Any] = None,
             types_check: bool = False,
             columnar: bool = False,
+            # execute multiple queries concurrently
+            parallelism: int = 1,
+            error_policy: ErrorPolicyT = 'fail_fast',
+            # add settings of async inserts, see ClickHouseHook
+            async_insert: t.Optional[AsyncInsertT] = None,
             # arguments of ClickHouseHook.__init__
             clickhouse_conn_id: str = default_conn_name,
             database: t.Optional[str] = None,
+            hook_params: t.Optional[t.Dict[str, t.Any]] = None,
+            # emit query stats as metrics tagged by dag_id, task_id and conn_id
+            emit_metrics: bool = False,
+            # execute queries in the triggerer using ClickHouseTrigger
+            deferrable: bool = conf.getboolean(
+                'operators', 'default_deferrable', fallback=False,
+            ),
             **kwargs,
     ):
         super().__init__(*args, **kwargs)
@@ -54,19 +77,75 @@ class BaseClickHouseOperator(BaseOperator):
         self._with_column_types = with_column_types
         self._external_tables = external_tables
         self._query_id = query_id
+        if async_insert is not None:
+            if async_insert not in async_insert_settings:
+                raise ValueError(
+                    f'async_insert must be one of {list(async_insert_settings)}',
+                )
+            # settings are passed to the hook and to the trigger
+            settings = {**async_insert_settings[async_insert], **(settings or {})}
         self._settings = settings
         self._types_check = types_check
         self._columnar = columnar
+        self._parallelism = parallelism
+        self._error_policy = error_policy
 
         self._clickhouse_conn_id = clickhouse_conn_id
         self._database = database
+        self._hook_params = hook_params
+        self._emit_metrics = emit_metrics
+        self._deferrable = deferrable
+        if self._deferrable and self._parallelism > 1:
+            raise ValueError('parallelism is not supported if deferrable is set')
 
-    def _hook_execute(self) -> ExecuteReturnT:
-        hook = ClickHouseHook(
+    def _get_hook(self) -> ClickHouseHook:
+        hook_params = self._hook_params or {}
+        if self._emit_metrics:
+            hook_params = {
+                'metrics_tags': {'dag_id': self.dag_id, 'task_id': self.task_id},
+                **hook_params,
+            }
+        return ClickHouseHook(
             clickhouse_conn_id=self._clickhouse_conn_id,
             database=self._database,
+            **hook_params,
+        )
+
+    def _hook_execute(self) -> ExecuteReturnT:
+        return self._get_hook().execute(
+            self._sql,
+            self._parameters,
+            self._with_column_types,
+            self._external_tables,
+            self._query_id,
+            self._settings,
+            self._types_check,
+            self._columnar,
+            parallelism=self._parallelism,
+            error_policy=self._error_policy,
+        )
+
+    def _hook_execute_iter(
+            self,
+            chunk_size: int = 1,
+    ) -> t.Generator[ExecuteIterReturnT, None, None]:
+        return self._get_hook().execute_iter(
+            self._sql,
+            self._parameters,
+            self._with_column_types,
+            self._external_tables,
+            self._query_id,
+            self._settings,
+            self._types_check,
+            chunk_size,
         )
-        return hook.execute(
+
+    def _get_trigger(
+            self,
+            poke_interval: t.Optional[float] = None,
+            batched: bool = False,
+    ) -> ClickHouseTrigger:
+        return ClickHouseTrigger(
             self._sql,
             self._parameters,
             self._with_column_types,
@@ -75,9 +154,246 @@ class BaseClickHouseOperator(BaseOperator):
             self._settings,
             self._types_check,
             self._columnar,
+            clickhouse_conn_id=self._clickhouse_conn_id,
+            database=self._database,
+            poke_interval=poke_interval,
+            batched=batched,
         )
 
+    @staticmethod
+    def _get_event_result(event: t.Dict[str, t.Any]) -> ExecuteReturnT:
+        if event['status'] == 'error':
+            raise AirflowException(event['message'])
+        return event['result']
+
+
+SinkT = t.Callable[[t.Iterator[ExecuteIterReturnT]], t.Any]
+ResultModeT = t.Literal['all', 'none', 'first', 'scalar', 'stats', 'spill']
+_ColumnsT = t.List[t.Tuple[str, str]]
+
 
 class ClickHouseOperator(BaseClickHouseOperator, BaseOperator):
-    def execute(self, context: t.Dict[str, t.Any]) -> ExecuteReturnT:
-        return self._hook_execute()
+    """
+    Executes queries using clickhouse_driver.Client.execute.
+
+    If ``sink`` is set, results of the last query are streamed using
+    clickhouse_driver.Client.execute_iter: the iterator over rows (or lists
+    of ``chunk_size`` rows) is passed to the ``sink`` callable instead of
+    materializing the result in memory. The value returned by ``sink`` is
+    pushed to XCom.
+
+    If ``deferrable`` is set, the task is deferred and queries are executed
+    in the triggerer by ``ClickHouseTrigger``.
+
+    ``result_mode`` defines what is pushed to XCom for a SELECT query:
+
+    * ``all`` (default): the result as returned by ``ClickHouseHook.execute``.
+    * ``none``: nothing, rows are read and discarded.
+    * ``first``: the first ``result_rows`` rows.
+    * ``scalar``: the first column of the first row (``None`` if no rows).
+    * ``stats``: a number of ``rows``, estimated ``bytes``, ``columns``,
+      ``seconds`` spent and server-side stats of the ``query``.
+    * ``spill``: rows are written to gzip-compressed JSON lines at
+      ``result_path`` (a local path or an object storage URI), the ``path``
+      is pushed together with ``stats``.
+
+    If ``max_result_bytes`` is set, the estimated size of rows is checked
+    while they are streamed (in ``all``, ``first`` and ``spill`` modes), and
+    AirflowException is raised once it is exceeded.
+    """
+
+    template_fields = (*BaseClickHouseOperator.template_fields, '_result_path')
+
+    def __init__(
+            self,
+            *args,
+            sink: t.Optional[SinkT] = None,
+            chunk_size: int = 1,
+            result_mode: ResultModeT = 'all',
+            result_rows: int = 1,
+            result_path: t.Optional[str] = None,
+            result_conn_id: t.Optional[str] = None,
+            max_result_bytes: t.Optional[int] = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if sink is not None and self._columnar:
+            raise ValueError('columnar is not supported when sink is set')
+        if sink is not None and self._deferrable:
+            raise ValueError('deferrable is not supported when sink is set')
+        if sink is not None and self._parallelism > 1:
+            raise ValueError('parallelism is not supported when sink is set')
+        if result_mode not in t.get_args(ResultModeT):
+            raise ValueError(f'unknown result_mode: {result_mode!r}')
+        if result_mode == 'spill' and result_path is None:
+            raise ValueError('result_path is required if result_mode is spill')
+        streams_result = result_mode != 'all' or max_result_bytes is not None
+        if streams_result and sink is not None:
+            raise ValueError('result_mode is not supported when sink is set')
+        if streams_result and self._deferrable:
+            raise ValueError('result_mode is not supported if deferrable is set')
+        if streams_result and self._parallelism > 1:
+            raise ValueError('result_mode is not supported if parallelism > 1')
+        self._sink = sink
+        self._chunk_size = chunk_size
+        self._result_mode = result_mode
+        self._result_rows = result_rows
+        self._result_path = result_path
+        self._result_conn_id = result_conn_id
+        self._max_result_bytes = max_result_bytes
+
+    def execute(self, context: t.Dict[str, t.Any]) -> t.Any:
+        if self._deferrable:
+            self.defer(
+                trigger=self._get_trigger(),
+                method_name='execute_complete',
+            )
+        if self._sink is not None:
+            # the query is cancelled if the sink stops iterating early
+            with contextlib.closing(self._hook_execute_iter(self._chunk_size)) as rows:
+                return self._sink(rows)
+        if self._result_mode == 'all' and self._max_result_bytes is None:
+            return self._hook_execute()
+        if self._parameters is not None and not isinstance(self._parameters, dict):
+            # INSERT queries return a number of inserted rows only
+            if self._result_mode != 'none':
+                raise ValueError(
+                    f'result_mode {self._result_mode} is not supported for'
+                    ' INSERT queries with parameters',
+                )
+            self._hook_execute()
+            return None
+        return self._handle_result()
+
+    def _handle_result(self) -> t.Any:
+        started_at = time.monotonic()
+        hook = self._get_hook()
+        rows = hook.execute_iter(
+            self._sql,
+            self._parameters,
+            True,  # column names are required by stats and spill modes
+            self._external_tables,
+            self._query_id,
+            self._settings,
+            self._types_check,
+        )
+        try:
+            # queries without a result (e.g. DDL or INSERT ... SELECT) yield
+            # neither columns nor rows
+            columns = next(rows, [])
+            if self._result_mode == 'none':
+                collections.deque(rows, maxlen=0)
+                return None
+            if self._result_mode == 'scalar':
+                row = next(rows, None)
+                return None if row is None else row[0]
+            if self._result_mode == 'stats':
+                row_count, size = _count(rows)
+                return self._get_stats(hook, columns, row_count, size, started_at)
+            capped_rows = _capped(rows, self._max_result_bytes)
+            if self._result_mode == 'spill':
+                path, row_count, size = _spill(
+                    capped_rows,
+                    columns,
+                    self._result_path,
+                    self._result_conn_id,
+                )
+                self.log.info('Spilled %s rows to %s', row_count, path)
+                return {
+                    'path': path,
+                    **self._get_stats(hook, columns, row_count, size, started_at),
+                }
+            if self._result_mode == 'first':
+                capped_rows = islice(capped_rows, self._result_rows)
+            result = list(capped_rows)
+        finally:
+            rows.close()
+        if self._columnar:
+            result = list(zip(*result))
+        return (result, columns) if self._with_column_types else result
+
+    @staticmethod
+    def _get_stats(
+            hook: ClickHouseHook,
+            columns: _ColumnsT,
+            row_count: int,
+            size: int,
+            started_at: float,
+    ) -> t.Dict[str, t.Any]:
+        return {
+            'rows': row_count,
+            'bytes': size,
+            'columns': columns,
+            'seconds': time.monotonic() - started_at,
+            # server-side stats of the query, see ClickHouseHook.query_stats
+            'query': hook.query_stats[-1] if hook.query_stats else None,
+        }
+
+    def execute_complete(
+            self,
+            context: t.Dict[str, t.Any],
+            event: t.Dict[str, t.Any],
+    ) -> ExecuteReturnT:
+        return self._get_event_result(event)
+
+
+def _count(rows: t.Iterator[tuple]) -> t.Tuple[int, int]:
+    """ Returns a number of rows and their estimated size. """
+    row_count = size = 0
+    for row in rows:
+        row_count += 1
+        size += _estimate_size(row)
+    return row_count, size
+
+
+def _capped(
+        rows: t.Iterator[tuple],
+        max_bytes: t.Optional[int],
+) -> t.Generator[tuple, None, None]:
+    if max_bytes is None:
+        yield from rows
+        return
+    size = 0
+    for row in rows:
+        size += _estimate_size(row)
+        if size > max_bytes:
+            raise AirflowException(
+                f'Result exceeds max_result_bytes={max_bytes}, consider'
+                ' result_mode="spill" or a narrower query',
+            )
+        yield row
+
+
+def _spill(
+        rows: t.Iterable[tuple],
+        columns: _ColumnsT,
+        path: str,
+        conn_id: t.Optional[str],
+) -> t.Tuple[str, int, int]:
+    """
+    Writes column names and rows as gzip-compressed JSON arrays, one per line.
+
+    Returns the path, a number of rows and their estimated size.
+    """
+    row_count = size = 0
+    with _open_for_writing(path, conn_id) as raw_file, \
+            gzip.open(raw_file, 'wt', encoding='utf-8') as file:
+        file.write(json.dumps([name for name, _ in columns]))
+        file.write('\n')
+        for row in rows:
+            file.write(json.dumps(row, default=str))
+            file.write('\n')
+            row_count += 1
+            size += _estimate_size(row)
+    return path, row_count, size
+
+
+def _open_for_writing(path: str, conn_id: t.Optional[str]) -> t.BinaryIO:
+    if '://' not in path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return open(path, 'wb')
+    try:  # Airflow 3
+        from airflow.sdk import ObjectStoragePath
+    except ImportError:  # Airflow 2.8+
+        from airflow.io.path import ObjectStoragePath
+    return ObjectStoragePath(path, conn_id=conn_id).open('wb')
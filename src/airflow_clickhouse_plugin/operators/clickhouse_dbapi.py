@@ -1,9 +1,12 @@
+import datetime
+import re
 import typing as t
 
 from airflow.providers.common.sql.operators import sql
 
 from airflow_clickhouse_plugin.hooks.clickhouse_dbapi import \
-    ClickHouseDbApiHook
+    ClickHouseDbApiHook, fetch_max_rows_handler
+from airflow_clickhouse_plugin.hooks.clickhouse_metric_store import MetricStore
 
 
 class ClickHouseDbApiHookMixin(object):
@@ -37,22 +40,233 @@ class ClickHouseSQLExecuteQueryOperator(
     ClickHouseBaseDbApiOperator,
     sql.SQLExecuteQueryOperator,
 ):
-    def __init__(self, *args, **kwargs):
+    """
+    If ``max_rows`` is set, results are streamed and up to ``max_rows`` rows
+    of every query are fetched, other rows are not read from the server.
+    """
+
+    def __init__(self, *args, max_rows: t.Optional[int] = None, **kwargs):
+        if max_rows is not None:
+            if 'handler' in kwargs:
+                raise ValueError('handler is not supported if max_rows is set')
+            kwargs['handler'] = fetch_max_rows_handler(max_rows)
         super().__init__(*args, **kwargs)
+        self.max_rows = max_rows
+
+    def get_db_hook(self) -> ClickHouseDbApiHook:
+        if self.max_rows is None:
+            return super().get_db_hook()
+        return self._get_clickhouse_db_api_hook(
+            schema=self.database,
+            stream_results=True,
+        )
+
+
+# table checks with these functions are evaluated once for the whole table:
+# aggregate functions (or families of them) with any combinators
+_AGGREGATE_FUNCTIONS = (
+    r'count|sum|avg|min|max|any|anyLast|anyHeavy|argMin|argMax|uniq\w*'
+    r'|quantiles?\w*|median\w*|groupArray\w*|groupUniqArray|groupBit\w+'
+    r'|topK\w*|stddev\w*|var(?:Pop|Samp)\w*|covar\w*|corr\w*|skew\w*|kurt\w*'
+    r'|entropy|sumMap|minMap|maxMap|sumWithOverflow|sumKahan|avgWeighted'
+    r'|first_value|last_value|histogram|deltaSum\w*|boundingRatio'
+)
+_AGGREGATE_COMBINATORS = (
+    r'(?:If|Array|Map|ForEach|Distinct|OrDefault|OrNull|Resample|State'
+    r'|SimpleState|Merge|MergeState)*'
+)
+_AGGREGATE_PATTERN = re.compile(
+    rf'\b(?:{_AGGREGATE_FUNCTIONS}){_AGGREGATE_COMBINATORS}\s*\(',
+    re.IGNORECASE,
+)
 
 
 class ClickHouseSQLColumnCheckOperator(
     ClickHouseBaseDbApiOperator,
     sql.SQLColumnCheckOperator,
 ):
-    pass
+    """
+    Runs all the column checks in a single pass over the table.
+
+    Every check is an aggregate of a single SELECT: ``partition_clause`` of
+    a check is applied by the -If combinator, ``partition_clause`` of the
+    operator goes to WHERE. If every check has ``partition_clause``, they
+    are added to WHERE too, so that partitions can be pruned.
+
+    If ``sample`` is set (e.g. ``0.1``), the table is read with SAMPLE (it
+    must have SAMPLE BY): ``null_check`` is scaled by ``_sample_factor``,
+    other checks are computed on the sample. If ``approximate`` is set,
+    ``distinct_check``, ``unique_check`` and ``median`` use approximate
+    functions (``uniq`` and ``quantileTDigest``) instead of exact ones.
+    """
+
+    column_checks = {
+        **sql.SQLColumnCheckOperator.column_checks,
+        'median': 'quantileExact(0.5)({column})',
+    }
+    # aggregates of the single pass query
+    column_aggregates = {
+        'null_check': 'sum{If}(isNull({column}){condition}){scale}',
+        'distinct_check': '{uniq}{If}({column}{condition})',
+        'unique_check': (
+            'count{If}({column}{condition}) - {uniq}{If}({column}{condition})'
+        ),
+        'min': 'min{If}({column}{condition})',
+        'max': 'max{If}({column}{condition})',
+        'median': '{quantile}{If}(0.5)({column}{condition})',
+    }
+
+    def __init__(
+            self,
+            *args,
+            sample: t.Optional[t.Union[float, int, str]] = None,
+            approximate: bool = False,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.sample = sample
+        self.approximate = approximate
+
+    def execute(self, context: t.Dict[str, t.Any]) -> None:
+        checks = [
+            (column, check)
+            for column, column_checks in self.column_mapping.items()
+            for check in column_checks
+        ]
+        self.sql = self._generate_single_pass_query(checks)
+        row = self.get_db_hook().get_first(self.sql)
+        if row is None:
+            self._raise_exception(f'The following query returned zero rows: {self.sql}')
+        records = [
+            (column, check, result)
+            for (column, check), result in zip(checks, row)
+        ]
+        self.log.info('Record: %s', records)
+        for column, check, result in records:
+            check_values = self.column_mapping[column][check]
+            check_values['result'] = result
+            check_values['success'] = self._get_match(
+                check_values,
+                result,
+                check_values.get('tolerance'),
+            )
+        failed_tests = [
+            f'Column: {column}\n\tCheck: {check},\n\tCheck Values: {check_values}\n'
+            for column, column_checks in self.column_mapping.items()
+            for check, check_values in column_checks.items()
+            if not check_values['success']
+        ]
+        if failed_tests:
+            self._raise_exception(
+                f'Test failed.\nResults:\n{records!s}\n'
+                f'The following tests have failed:\n{"".join(failed_tests)}'
+            )
+        self.log.info('All tests have passed')
+
+    def _generate_single_pass_query(
+            self,
+            checks: t.List[t.Tuple[str, str]],
+    ) -> str:
+        aggregates = []
+        for column, check in checks:
+            check_values = self.column_mapping[column][check]
+            self._column_mapping_validation(check, check_values)
+            condition = check_values.get('partition_clause')
+            aggregates.append(self.column_aggregates[check].format(
+                column=column,
+                If='' if condition is None else 'If',
+                condition='' if condition is None else f', {condition}',
+                scale='' if self.sample is None else ' * any(_sample_factor)',
+                uniq='uniq' if self.approximate else 'uniqExact',
+                quantile='quantileTDigest' if self.approximate else 'quantileExact',
+            ))
+        return _single_pass_query(
+            aggregates,
+            self.table,
+            self.sample,
+            self.partition_clause,
+            [
+                self.column_mapping[column][check].get('partition_clause')
+                for column, check in checks
+            ],
+        )
 
 
 class ClickHouseSQLTableCheckOperator(
     ClickHouseBaseDbApiOperator,
     sql.SQLTableCheckOperator,
 ):
-    pass
+    """
+    Runs all the table checks in a single pass over the table.
+
+    A row-level ``check_statement`` (e.g. ``col_a + col_b < col_c``)
+    succeeds if it is true for every row: it becomes ``min(...)`` of a single
+    SELECT, ``partition_clause`` of the check is applied by the -If
+    combinator. A ``check_statement`` with aggregate functions (e.g.
+    ``count() = 1000``) is evaluated by the same SELECT, unless it has its
+    own ``partition_clause``: then it needs a scalar subquery.
+
+    If ``sample`` is set, the table is read with SAMPLE (it must have SAMPLE
+    BY), so aggregates are computed on the sample.
+    """
+
+    def __init__(
+            self,
+            *args,
+            sample: t.Optional[t.Union[float, int, str]] = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.sample = sample
+
+    def execute(self, context: t.Dict[str, t.Any]) -> None:
+        self.sql = self._generate_single_pass_query()
+        row = self.get_db_hook().get_first(self.sql)
+        if row is None:
+            self._raise_exception(f'The following query returned zero rows: {self.sql}')
+        records = list(zip(self.checks, row))
+        self.log.info('Record:\n%s', records)
+        for check, result in records:
+            self.checks[check]['success'] = sql._parse_boolean(str(result))
+        failed_tests = [
+            f'\tCheck: {check},\n\tCheck Values: {check_values}\n'
+            for check, check_values in self.checks.items()
+            if not check_values['success']
+        ]
+        if failed_tests:
+            self._raise_exception(
+                f'Test failed.\nQuery:\n{self.sql}\nResults:\n{records!s}\n'
+                f'The following tests have failed:\n{", ".join(failed_tests)}'
+            )
+        self.log.info('All tests have passed')
+
+    def _generate_single_pass_query(self) -> str:
+        aggregates = []
+        for check in self.checks.values():
+            statement = check['check_statement']
+            condition = check.get('partition_clause')
+            if not _AGGREGATE_PATTERN.search(statement):
+                aggregates.append(
+                    f'min(toUInt8({statement}))' if condition is None
+                    else f'minIf(toUInt8({statement}), {condition})'
+                )
+            elif condition is None:
+                aggregates.append(f'toUInt8({statement})')
+            else:
+                aggregates.append(_single_pass_query(
+                    [f'toUInt8({statement})'],
+                    self.table,
+                    self.sample,
+                    self.partition_clause,
+                    [condition],
+                ).join('()'))
+        return _single_pass_query(
+            aggregates,
+            self.table,
+            self.sample,
+            self.partition_clause,
+            [check.get('partition_clause') for check in self.checks.values()],
+        )
 
 
 class ClickHouseSQLCheckOperator(
@@ -66,14 +280,233 @@ class ClickHouseSQLValueCheckOperator(
     ClickHouseBaseDbApiOperator,
     sql.SQLValueCheckOperator,
 ):
-    pass
+    """
+    If ``sample`` or ``approximate`` is set, the query is first executed
+    with SAMPLE and approximate functions (see ``_approximate_query``). If
+    every value is farther than ``approximate_tolerance`` (relative) from
+    the bounds of ``pass_value`` and ``tolerance``, the check is decided by
+    approximate values. Otherwise, the exact query is executed.
+    """
+
+    def __init__(
+            self,
+            *args,
+            sample: t.Optional[t.Union[float, int, str]] = None,
+            approximate: bool = False,
+            approximate_tolerance: float = 0.1,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.sample = sample
+        self.approximate = approximate
+        self.approximate_tolerance = approximate_tolerance
+
+    def execute(self, context: t.Dict[str, t.Any]) -> None:
+        pass_value = sql._convert_to_float_if_possible(self.pass_value)
+        if (self.sample is not None or self.approximate) \
+                and isinstance(pass_value, float):
+            query = _approximate_query(self.sql, self.sample, self.approximate)
+            self.log.info('Executing approximate SQL check: %s', query)
+            records = self.get_db_hook().get_first(query, self.parameters)
+            is_success = self._check_approximately(records, pass_value)
+            if is_success:
+                self.log.info('Approximate values %s passed the check', records)
+                return
+            if is_success is not None:
+                self._raise_exception(
+                    f'Test failed.\nPass value:{pass_value}\n'
+                    f'Tolerance:{self.tol}\nApproximate query:\n{query}\n'
+                    f'Approximate results:\n{records!s}'
+                )
+            self.log.info(
+                'Approximate values %s are close to the bounds, executing'
+                ' the exact query',
+                records,
+            )
+        super().execute(context)
+
+    def _check_approximately(
+            self,
+            records: t.Optional[t.Sequence[t.Any]],
+            pass_value: float,
+    ) -> t.Optional[bool]:
+        """ Returns None if approximate values cannot decide the check. """
+        tolerance = self.tol or 0
+        low, high = sorted((pass_value * (1 - tolerance), pass_value * (1 + tolerance)))
+        results = []
+        for record in records or [None]:
+            if record is None:
+                return None
+            value = float(record)
+            margin = self.approximate_tolerance * abs(value)
+            if low + margin <= value <= high - margin:
+                results.append(True)
+            elif value < low - margin or value > high + margin:
+                results.append(False)
+            else:
+                return None
+        return all(results)
 
 
 class ClickHouseSQLIntervalCheckOperator(
     ClickHouseBaseDbApiOperator,
     sql.SQLIntervalCheckOperator,
 ):
-    pass
+    """
+    If ``sample`` or ``approximate`` is set, metrics are first computed with
+    SAMPLE and approximate functions (see ``_approximate_query``). If every
+    ratio is farther than ``approximate_tolerance`` (relative) from its
+    threshold, the check is decided by approximate metrics. Otherwise (or
+    if a metric is zero), exact metrics are computed.
+
+    If ``metric_store`` is set, exact metrics of every date are persisted in
+    ``MetricStore``: metrics of the reference date (``days_back``) are
+    computed once and reused until parts of the table containing the date
+    change.
+    """
+
+    def __init__(
+            self,
+            *args,
+            sample: t.Optional[t.Union[float, int, str]] = None,
+            approximate: bool = False,
+            approximate_tolerance: float = 0.1,
+            metric_store: bool = False,
+            metric_store_path: t.Optional[str] = None,
+            metric_store_ttl: float = 90 * 24 * 60 * 60,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.sample = sample
+        self.approximate = approximate
+        self.approximate_tolerance = approximate_tolerance
+        self.metric_store = metric_store
+        self.metric_store_path = metric_store_path
+        self.metric_store_ttl = metric_store_ttl
+        self._metric_dates: t.Dict[str, str] = {}
+
+    def get_db_hook(self) -> ClickHouseDbApiHook:
+        hook = super().get_db_hook()
+        if not self._metric_dates:
+            return hook
+        return _MetricStoreHook(
+            hook,
+            MetricStore(self.metric_store_path, self.metric_store_ttl),
+            self,
+        )
+
+    def execute(self, context: t.Dict[str, t.Any]) -> None:
+        if self.metric_store:
+            reference_date = datetime.date.fromisoformat(context['ds']) \
+                + datetime.timedelta(days=self.days_back)
+            # exact metric queries by dates, see _MetricStoreHook
+            self._metric_dates = {
+                self.sql1: context['ds'],
+                self.sql2: reference_date.isoformat(),
+            }
+        if self.sample is not None or self.approximate:
+            hook = self.get_db_hook()
+            rows = []
+            for query in (self.sql1, self.sql2):
+                query = _approximate_query(query, self.sample, self.approximate)
+                self.log.info('Executing approximate SQL check: %s', query)
+                rows.append(hook.get_first(query))
+            failed = self._check_approximately(*rows)
+            if failed is not None and not failed:
+                self.log.info('All tests have passed by approximate metrics')
+                return
+            if failed:
+                self._raise_exception(
+                    'The following tests have failed by approximate metrics:\n'
+                    f' {", ".join(failed)}'
+                )
+            self.log.info(
+                'Approximate ratios are close to thresholds, computing exact'
+                ' metrics',
+            )
+        super().execute(context)
+
+    def _check_approximately(
+            self,
+            current_row: t.Optional[t.Sequence[t.Any]],
+            reference_row: t.Optional[t.Sequence[t.Any]],
+    ) -> t.Optional[t.List[str]]:
+        """
+        Returns failed metrics or None if approximate metrics cannot decide
+        the check.
+        """
+        if not current_row or not reference_row:
+            return None
+        failed = []
+        for metric, current, reference in zip(
+                self.metrics_sorted, current_row, reference_row,
+        ):
+            if not current or not reference:
+                return None  # zeros might be caused by sampling
+            ratio = self.ratio_formulas[self.ratio_formula](current, reference)
+            threshold = self.metrics_thresholds[metric]
+            margin = self.approximate_tolerance * threshold
+            self.log.info(
+                'Approximate ratio for %s: %s, threshold: %s',
+                metric,
+                ratio,
+                threshold,
+            )
+            if threshold - margin <= ratio < threshold + margin:
+                return None
+            if ratio >= threshold:
+                failed.append(metric)
+        return failed
+
+
+class _MetricStoreHook:
+    """
+    Wraps a hook of ClickHouseSQLIntervalCheckOperator: ``get_first`` of an
+    exact metric query returns stored metrics if they are still valid, and
+    stores computed ones otherwise.
+    """
+
+    def __init__(
+            self,
+            hook: ClickHouseDbApiHook,
+            store: MetricStore,
+            operator: ClickHouseSQLIntervalCheckOperator,
+    ):
+        self._hook = hook
+        self._store = store
+        self._operator = operator
+
+    def get_first(self, sql, parameters=None):
+        date = self._operator._metric_dates.get(sql)
+        if date is None:
+            return self._hook.get_first(sql, parameters)
+        fingerprint = self._store.get_fingerprint(
+            self._hook,
+            self._operator.table,
+            date,
+        )
+        keys = [
+            [
+                self._hook.clickhouse_conn_id,
+                self._operator.database,
+                self._operator.table,
+                self._operator.date_filter_column,
+                metric,
+                date,
+            ]
+            for metric in self._operator.metrics_sorted
+        ]
+        row = [self._store.get(key, fingerprint) for key in keys]
+        if None not in row:
+            self._operator.log.info('Reusing stored metrics of %s: %s', date, row)
+            return row
+        row = self._hook.get_first(sql, parameters)
+        for key, value in zip(keys, row or ()):
+            self._store.set(key, fingerprint, value)
+        return row
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self._hook, name)
 
 
 class ClickHouseSQLThresholdCheckOperator(
@@ -88,3 +521,103 @@ class ClickHouseBranchSQLOperator(
     sql.BranchSQLOperator,
 ):
     pass
+
+
+def _single_pass_query(
+        aggregates: t.List[str],
+        table: str,
+        sample: t.Optional[t.Union[float, int, str]],
+        partition_clause: t.Optional[str],
+        check_conditions: t.List[t.Optional[str]],
+) -> str:
+    """
+    Builds ``SELECT <aggregates> FROM <table> [SAMPLE] [WHERE]``.
+
+    If every check has a condition, rows matching none of them are skipped.
+    """
+    conditions = [] if partition_clause is None else [partition_clause]
+    if check_conditions and None not in check_conditions:
+        check_conditions = list(dict.fromkeys(check_conditions))
+        conditions.append(
+            check_conditions[0] if len(check_conditions) == 1
+            else ' OR '.join(f'({condition})' for condition in check_conditions)
+        )
+    query = f'SELECT {", ".join(aggregates)} FROM {table}'
+    if sample is not None:
+        query += f' SAMPLE {sample}'
+    if conditions:
+        query += f' WHERE {" AND ".join(f"({condition})" for condition in conditions)}'
+    return query
+
+
+# SELECT ... FROM <table> [WHERE ...] [GROUP BY ...] etc. without subqueries
+_SIMPLE_QUERY_PATTERN = re.compile(
+    r'\s*SELECT\b.*?\bFROM\s+[\w.`"]+'
+    r'(?=\s*(?:;?\s*$|(?:PREWHERE|WHERE|GROUP|HAVING|ORDER|LIMIT|SETTINGS)\b))',
+    re.IGNORECASE | re.DOTALL,
+)
+_NOT_SIMPLE_PATTERN = re.compile(
+    r'\b(?:SELECT|FROM|JOIN|UNION|INTERSECT|EXCEPT)\b',
+    re.IGNORECASE,
+)
+_ADDITIVE_PATTERN = re.compile(r'\b(count|sum)(If)?\s*\(', re.IGNORECASE)
+_APPROXIMATE_FUNCTIONS = (
+    (re.compile(r'\bcount\s*\(\s*DISTINCT\s+', re.IGNORECASE), 'uniq('),
+    (re.compile(r'\buniqExact(If)?\s*\('), r'uniq\1('),
+    (re.compile(r'\b(quantiles?|median)(Exact)?(If)?\s*\('), r'\1TDigest\3('),
+)
+
+
+def _approximate_query(
+        query: str,
+        sample: t.Optional[t.Union[float, int, str]],
+        approximate: bool,
+) -> str:
+    """
+    Rewrites a query to compute metrics approximately.
+
+    If ``sample`` is set, SAMPLE clause is added after ``FROM <table>``,
+    ``count`` and ``sum`` aggregates are scaled by ``_sample_factor``. It is
+    supported for simple single-table queries only (no subqueries, joins or
+    other ``FROM`` keywords), ValueError is raised otherwise. If
+    ``approximate`` is set, exact distinct counts and quantiles are replaced
+    by ``uniq`` and ``quantileTDigest``.
+    """
+    if approximate:
+        for pattern, replacement in _APPROXIMATE_FUNCTIONS:
+            query = pattern.sub(replacement, query)
+    if sample is None:
+        return query
+    match = _SIMPLE_QUERY_PATTERN.match(query)
+    if match is None or len(_NOT_SIMPLE_PATTERN.findall(query)) != 2:
+        raise ValueError(
+            'sample is supported for simple single-table queries'
+            ' (SELECT ... FROM <table> [WHERE ...]) only, use exact mode'
+            f' (sample=None) for the query: {query}',
+        )
+    query = f'{match.group()} SAMPLE {sample}{query[match.end():]}'
+    parts = []
+    position = 0
+    for match in _ADDITIVE_PATTERN.finditer(query):
+        if match.start() < position:
+            continue  # nested into a scaled aggregate
+        end = _find_closing_parenthesis(query, match.end())
+        if re.match(r'\s*DISTINCT\b', query[match.end():end], re.IGNORECASE):
+            continue  # distinct counts are not proportional to a sample
+        parts.append(query[position:match.start()])
+        parts.append(f'({query[match.start():end + 1]} * any(_sample_factor))')
+        position = end + 1
+    parts.append(query[position:])
+    return ''.join(parts)
+
+
+def _find_closing_parenthesis(query: str, start: int) -> int:
+    depth = 1
+    for position in range(start, len(query)):
+        if query[position] == '(':
+            depth += 1
+        elif query[position] == ')':
+            depth -= 1
+            if depth == 0:
+                return position
+    raise ValueError(f'Unbalanced parentheses in query: {query}')
@@ -1,31 +1,229 @@
+import datetime
+import time
 import typing as t
 
-from airflow.exceptions import AirflowException
+from airflow.exceptions import AirflowException, AirflowSensorTimeout, \
+    AirflowSkipException
 from airflow.sensors.base import BaseSensorOperator
 
 from airflow_clickhouse_plugin.hooks.clickhouse import ExecuteReturnT
+from airflow_clickhouse_plugin.hooks.clickhouse_tracing import span
 from airflow_clickhouse_plugin.operators.clickhouse import \
     BaseClickHouseOperator
 
 
 class ClickHouseSensor(BaseClickHouseOperator, BaseSensorOperator):
-    """ Pokes using clickhouse_driver.Client.execute. """
+    """
+    Pokes using clickhouse_driver.Client.execute.
+
+    If ``deferrable`` is set, the sensor is deferred and ClickHouseTrigger
+    re-executes queries in the triggerer every ``poke_interval`` seconds until
+    the result is truthy. Then ``is_failure`` and ``is_success`` are checked:
+    if ``is_success`` is falsy, the sensor is deferred again for the rest of
+    ``timeout`` counted from the first deferral.
+
+    If ``batched`` is set (requires ``deferrable``), queries of sensors
+    poking at the same time are combined by ClickHouseTrigger into a single
+    query per connection.
+    """
 
     def __init__(
             self,
             *args,
             is_failure: t.Callable[[ExecuteReturnT], bool] = None,
             is_success: t.Callable[[ExecuteReturnT], bool] = None,
+            batched: bool = False,
             **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        if batched and not self._deferrable:
+            raise ValueError('batched requires deferrable')
         self._is_failure = is_failure
         self._is_success = bool if is_success is None else is_success
+        self._batched = batched
 
     def poke(self, context: dict) -> bool:
-        result = self._hook_execute()
+        with span('clickhouse.sensor.poke', {
+            'airflow.dag_id': self.dag_id,
+            'airflow.task_id': self.task_id,
+        }):
+            return self._check(self._hook_execute())
+
+    def execute(self, context: dict) -> t.Any:
+        if not self._deferrable:
+            return super().execute(context)
+        self._defer(time.time() + self.timeout)
+
+    def execute_complete(
+            self,
+            context: dict,
+            event: t.Dict[str, t.Any],
+            deadline: t.Optional[float] = None,
+    ) -> None:
+        if not self._check(self._get_event_result(event)):
+            if deadline is None:  # deferred by a previous version
+                deadline = time.time() + self.timeout
+            self._defer(deadline)
+
+    def _defer(self, deadline: float) -> None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            message = f'Sensor has timed out after {self.timeout} seconds'
+            if self.soft_fail:
+                raise AirflowSkipException(message)
+            raise AirflowSensorTimeout(message)
+        self.defer(
+            trigger=self._get_trigger(
+                poke_interval=self.poke_interval,
+                batched=self._batched,
+            ),
+            method_name='execute_complete',
+            kwargs={'deadline': deadline},
+            timeout=datetime.timedelta(seconds=remaining),
+        )
+
+    def _check(self, result: ExecuteReturnT) -> bool:
         if self._is_failure is not None:
             is_failure = self._is_failure(result)
             if is_failure:
                 raise AirflowException(f'is_failure returned {is_failure}')
         return self._is_success(result)
+
+
+# requested names are matched either as 'database.table' or as a table of the
+# current database: the query returns the database, the table and whether
+# the database is the current one
+_TABLES_FILTER = (
+    "(has(%(tables)s, concat(database, '.', {table}))"
+    ' OR database = currentDatabase() AND has(%(tables)s, {table}))'
+)
+
+
+class _ClickHouseTablesSensor(ClickHouseSensor):
+    """
+    A superclass for sensors which query system tables of ClickHouse instead
+    of scanning data. Succeeds once every table of ``tables`` is found in the
+    result of the query.
+    """
+
+    def __init__(
+            self,
+            *args,
+            sql: str,
+            tables: t.Union[str, t.Sequence[str]],
+            parameters: t.Dict[str, t.Any],
+            **kwargs,
+    ):
+        tables = [tables] if isinstance(tables, str) else list(tables)
+        if not tables:
+            raise ValueError('tables must not be empty')
+        if kwargs.get('is_success') is None:
+            kwargs['is_success'] = self._all_tables_found
+        super().__init__(
+            *args,
+            sql=sql,
+            parameters={'tables': tables, **parameters},
+            **kwargs,
+        )
+
+    def _all_tables_found(self, result: ExecuteReturnT) -> bool:
+        found = set()
+        for database, table, is_current_database in result:
+            found.add(f'{database}.{table}')
+            if is_current_database:
+                found.add(table)
+        missing = [
+            table for table in self._parameters['tables']
+            if table not in found
+        ]
+        if missing:
+            self.log.info('Waiting for %s', ', '.join(missing))
+        return not missing
+
+
+class ClickHousePartitionSensor(_ClickHouseTablesSensor):
+    """
+    Waits for a partition of every table of ``tables`` using system.parts.
+
+    A partition is found once its active parts contain at least ``min_rows``
+    rows (and, if ``modified_after`` is set, a part was modified after it).
+    A poke reads metadata of parts, not data, and all the tables are checked
+    by a single query.
+    """
+
+    def __init__(
+            self,
+            *args,
+            tables: t.Union[str, t.Sequence[str]],
+            partition: t.Optional[str] = None,
+            min_rows: int = 1,
+            modified_after: t.Optional[str] = None,
+            **kwargs,
+    ):
+        conditions = ['active', _TABLES_FILTER.format(table='table')]
+        if partition is not None:
+            conditions.append('partition = %(partition)s')
+        having = ['sum(rows) >= %(min_rows)s']
+        if modified_after is not None:
+            having.append(
+                'max(modification_time)'
+                ' > parseDateTimeBestEffort(%(modified_after)s)'
+            )
+        super().__init__(
+            *args,
+            sql='\n'.join((
+                'SELECT database, table, database = currentDatabase()',
+                'FROM system.parts',
+                f'WHERE {" AND ".join(conditions)}',
+                'GROUP BY database, table',
+                f'HAVING {" AND ".join(having)}',
+            )),
+            tables=tables,
+            parameters={
+                'partition': partition,
+                'min_rows': min_rows,
+                'modified_after': modified_after,
+            },
+            **kwargs,
+        )
+
+
+class ClickHouseTableChangeSensor(_ClickHouseTablesSensor):
+    """
+    Waits until every table of ``tables`` changes after ``modified_after``.
+
+    A table is changed if any of its active parts (system.parts) or its
+    metadata (system.tables) were modified after ``modified_after``: e.g. by
+    an INSERT, a merge, a mutation or an ALTER. A table which is created
+    after ``modified_after`` is changed too. A poke reads metadata only, and
+    all the tables are checked by a single query.
+    """
+
+    def __init__(
+            self,
+            *args,
+            tables: t.Union[str, t.Sequence[str]],
+            modified_after: str,
+            **kwargs,
+    ):
+        super().__init__(
+            *args,
+            sql='\n'.join((
+                'SELECT database, table, database = currentDatabase()',
+                'FROM (',
+                '    SELECT database, table, modification_time',
+                '    FROM system.parts',
+                f'    WHERE active AND {_TABLES_FILTER.format(table="table")}',
+                '    UNION ALL',
+                '    SELECT database, name, metadata_modification_time',
+                '    FROM system.tables',
+                f'    WHERE {_TABLES_FILTER.format(table="name")}',
+                ')',
+                'GROUP BY database, table',
+                'HAVING max(modification_time)'
+                ' > parseDateTimeBestEffort(%(modified_after)s)',
+            )),
+            tables=tables,
+            parameters={'modified_after': modified_after},
+            **kwargs,
+        )
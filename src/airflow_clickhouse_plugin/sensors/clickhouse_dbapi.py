@@ -1,6 +1,7 @@
 from airflow.providers.common.sql.sensors.sql import SqlSensor
 
 from airflow_clickhouse_plugin.hooks.clickhouse_dbapi import ClickHouseDbApiHook
+from airflow_clickhouse_plugin.hooks.clickhouse_tracing import span
 from airflow_clickhouse_plugin.operators.clickhouse_dbapi import \
     ClickHouseDbApiHookMixin
 
@@ -8,3 +9,10 @@ from airflow_clickhouse_plugin.operators.clickhouse_dbapi import \
 class ClickHouseSqlSensor(ClickHouseDbApiHookMixin, SqlSensor):
     def _get_hook(self) -> ClickHouseDbApiHook:
         return self._get_clickhouse_db_api_hook()
+
+    def poke(self, context) -> bool:
+        with span('clickhouse.sensor.poke', {
+            'airflow.dag_id': self.dag_id,
+            'airflow.task_id': self.task_id,
+        }):
+            return super().poke(context)
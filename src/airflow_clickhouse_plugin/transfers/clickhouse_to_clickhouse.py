@@ -0,0 +1,224 @@
+import queue
+import threading
+import typing as t
+from itertools import islice
+
+from airflow.models import BaseOperator
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook, \
+    _asbool, _format_insert_query, default_conn_name, get_connection_kwargs
+from airflow_clickhouse_plugin.hooks.clickhouse_hosts import \
+    DEFAULT_PORT, DEFAULT_SECURE_PORT, parse_hosts
+
+_END = object()  # the reader has read all the rows
+
+
+class _ReaderError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class ClickHouseToClickHouseOperator(BaseOperator):
+    """
+    Copies a result of a SELECT query from one ClickHouse to another.
+
+    By default, a reader thread streams rows from the source using
+    ``ClickHouseHook.execute_iter`` into a queue of at most ``queue_size``
+    chunks of ``chunk_rows`` rows, and the task's thread streams them from
+    the queue into a single INSERT query to the destination ``table``
+    (sent in blocks of ``chunk_rows`` rows). Rows are neither materialized as
+    a whole nor pushed to XCom.
+
+    If ``server_side`` is set, the source executes
+    ``INSERT INTO FUNCTION remote(<destination>, <table>) <sql>``, so data is
+    sent from the source to the destination directly. The source must be
+    able to reach the destination's native port. The destination password
+    is masked in task logs, but it is substituted into the query text by the
+    client, so it is stored in plain text in ``system.query_log`` of the
+    source.
+
+    Returns a number of inserted rows.
+    """
+
+    template_fields = (
+        '_sql',
+        '_parameters',
+        '_table',
+        '_source_settings',
+        '_destination_settings',
+        '_source_database',
+        '_destination_database',
+    )
+    template_ext: t.Sequence[str] = ('.sql',)
+    template_fields_renderers = {
+        '_sql': 'sql',
+        '_parameters': 'json',
+        '_source_settings': 'json',
+        '_destination_settings': 'json',
+    }
+
+    def __init__(
+            self,
+            *args,
+            sql: str,
+            table: str,
+            columns: t.Optional[t.Sequence[str]] = None,
+            parameters: t.Optional[dict] = None,
+            source_conn_id: str = default_conn_name,
+            source_database: t.Optional[str] = None,
+            source_settings: t.Dict[str, t.Any] = None,
+            destination_conn_id: str = default_conn_name,
+            destination_database: t.Optional[str] = None,
+            destination_settings: t.Dict[str, t.Any] = None,
+            chunk_rows: int = 65536,
+            queue_size: int = 4,
+            server_side: bool = False,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self._sql = sql
+        self._table = table
+        self._columns = columns
+        self._parameters = parameters
+        self._source_conn_id = source_conn_id
+        self._source_database = source_database
+        self._source_settings = source_settings
+        self._destination_conn_id = destination_conn_id
+        self._destination_database = destination_database
+        self._destination_settings = destination_settings
+        self._chunk_rows = chunk_rows
+        self._queue_size = queue_size
+        self._server_side = server_side
+
+    def execute(self, context: t.Dict[str, t.Any]) -> int:
+        source_hook = ClickHouseHook(
+            clickhouse_conn_id=self._source_conn_id,
+            database=self._source_database,
+        )
+        destination_hook = ClickHouseHook(
+            clickhouse_conn_id=self._destination_conn_id,
+            database=self._destination_database,
+        )
+        if self._server_side:
+            inserted_rows = self._transfer_server_side(source_hook, destination_hook)
+        else:
+            inserted_rows = self._transfer(source_hook, destination_hook)
+        self.log.info('Inserted %s rows into %s', inserted_rows, self._table)
+        return inserted_rows
+
+    def _transfer(
+            self,
+            source_hook: ClickHouseHook,
+            destination_hook: ClickHouseHook,
+    ) -> int:
+        chunks = queue.Queue(maxsize=self._queue_size)
+        stopped = threading.Event()
+
+        def put(item: t.Any) -> bool:
+            # gives up if the writer has stopped, e.g. if the insert failed
+            while not stopped.is_set():
+                try:
+                    chunks.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def read() -> None:
+            try:
+                rows = source_hook.execute_iter(
+                    self._sql,
+                    self._parameters,
+                    with_column_types=True,
+                    settings=self._source_settings,
+                )
+                try:
+                    if not put(next(rows)):  # column names and types
+                        return
+                    while chunk := list(islice(rows, self._chunk_rows)):
+                        if not put(chunk):
+                            return
+                finally:
+                    rows.close()
+            except BaseException as error:
+                put(_ReaderError(error))
+            else:
+                put(_END)
+
+        def get() -> t.Any:
+            item = chunks.get()
+            if isinstance(item, _ReaderError):
+                raise item.error
+            return item
+
+        def iter_rows() -> t.Generator[tuple, None, None]:
+            while (chunk := get()) is not _END:
+                yield from chunk
+
+        reader = threading.Thread(
+            target=read,
+            name='clickhouse-transfer-reader',
+            daemon=True,
+        )
+        reader.start()
+        try:
+            columns = get()
+            return destination_hook.execute(
+                _format_insert_query(
+                    self._table,
+                    self._columns or [name for name, _ in columns],
+                ),
+                iter_rows(),
+                settings={
+                    **(self._destination_settings or {}),
+                    'insert_block_size': self._chunk_rows,
+                },
+            )
+        finally:
+            stopped.set()
+            reader.join()
+
+    def _transfer_server_side(
+            self,
+            source_hook: ClickHouseHook,
+            destination_hook: ClickHouseHook,
+    ) -> int:
+        destination = get_connection_kwargs(
+            destination_hook,
+            self._destination_conn_id,
+            self._destination_database,
+        )
+        is_secure = _asbool(destination.get('secure', False))
+        port = int(
+            destination.get('port')
+            or (DEFAULT_SECURE_PORT if is_secure else DEFAULT_PORT)
+        )
+        addresses = [(destination['host'], port)]
+        addresses += parse_hosts(destination.get('alt_hosts', ''), port)
+        table = self._table
+        if '.' not in table:
+            table = f"{destination.get('database', 'default')}.{table}"
+        columns = ''
+        if self._columns:
+            columns = ' ({})'.format(', '.join(f'`{column}`' for column in self._columns))
+        query = (
+            f"INSERT INTO FUNCTION {'remoteSecure' if is_secure else 'remote'}("
+            '%(_remote_addresses)s, %(_remote_table)s,'
+            ' %(_remote_user)s, %(_remote_password)s'
+            f'){columns} {self._sql}'
+        )
+        parameters = {
+            **(self._parameters or {}),
+            # replicas of a single shard
+            '_remote_addresses': '|'.join(f'{host}:{port}' for host, port in addresses),
+            '_remote_table': table,
+            '_remote_user': destination.get('user', 'default'),
+            '_remote_password': destination.get('password', ''),
+        }
+        source_hook.execute(
+            query,
+            parameters,
+            settings=self._source_settings,
+            secret_params=('_remote_password',),
+        )
+        return source_hook.query_stats[-1]['written_rows']
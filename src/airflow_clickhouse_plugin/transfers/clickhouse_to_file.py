@@ -0,0 +1,270 @@
+import concurrent.futures
+import contextlib
+import csv
+import os
+import typing as t
+from itertools import chain, islice
+
+from airflow.models import BaseOperator
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook, \
+    default_conn_name
+
+if t.TYPE_CHECKING:
+    import pyarrow as pa
+
+ManifestT = t.Dict[str, t.Any]
+_WriteT = t.Callable[[t.List[tuple]], None]
+
+# ClickHouse types with an unambiguous PyArrow counterpart (type aliases)
+_ARROW_TYPE_ALIASES = {
+    'Int8': 'int8', 'Int16': 'int16', 'Int32': 'int32', 'Int64': 'int64',
+    'UInt8': 'uint8', 'UInt16': 'uint16', 'UInt32': 'uint32',
+    'UInt64': 'uint64', 'Float32': 'float32', 'Float64': 'float64',
+    'Bool': 'bool', 'String': 'string', 'Date': 'date32', 'Date32': 'date32',
+    'DateTime': 'timestamp[s]',
+}
+_FILE_FORMATS = ('parquet', 'csv')  # also used as file extensions
+
+
+class ClickHouseToFileOperator(BaseOperator):
+    """
+    Exports a result of a SELECT query to local Parquet or CSV files.
+
+    The query is split into slices which are exported concurrently to
+    separate files, each slice using a separate (pooled) connection. Rows are
+    streamed using ``ClickHouseHook.execute_iter`` and written in batches of
+    ``chunk_rows`` rows, so memory usage is bounded by ``parallelism`` batches.
+
+    Slices are defined by ``partition_by`` expression and ``partitions``:
+
+    * ``partition_by`` is not set: a single slice, the whole query.
+    * ``partitions`` is an int ``N``: a slice per
+      ``cityHash64(partition_by) % N`` value.
+    * ``partitions`` is a list: a slice per value of ``partition_by``.
+    * ``partitions`` is not set: a slice per distinct value of
+      ``partition_by``, the values are queried beforehand.
+
+    Returns a manifest of written files, see ``_get_manifest``. Slices without
+    rows produce no files.
+    """
+
+    template_fields = (
+        '_sql',
+        '_parameters',
+        '_output_dir',
+        '_settings',
+        '_database',
+    )
+    template_ext: t.Sequence[str] = ('.sql',)
+    template_fields_renderers = {
+        '_sql': 'sql',
+        '_parameters': 'json',
+        '_settings': 'json',
+    }
+
+    def __init__(
+            self,
+            *args,
+            sql: str,
+            output_dir: str,
+            file_format: t.Literal['parquet', 'csv'] = 'parquet',
+            partition_by: t.Optional[str] = None,
+            partitions: t.Union[int, t.Sequence[t.Any], None] = None,
+            parallelism: int = 4,
+            chunk_rows: int = 65536,
+            parameters: t.Optional[dict] = None,
+            settings: t.Dict[str, t.Any] = None,
+            clickhouse_conn_id: str = default_conn_name,
+            database: t.Optional[str] = None,
+            hook_params: t.Optional[t.Dict[str, t.Any]] = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if file_format not in _FILE_FORMATS:
+            raise ValueError(f'unsupported file_format: {file_format!r}')
+        if partitions is not None and partition_by is None:
+            raise ValueError('partition_by is required if partitions are set')
+        self._sql = sql
+        self._output_dir = output_dir
+        self._file_format = file_format
+        self._partition_by = partition_by
+        self._partitions = partitions
+        self._parallelism = parallelism
+        self._chunk_rows = chunk_rows
+        self._parameters = parameters
+        self._settings = settings
+        self._clickhouse_conn_id = clickhouse_conn_id
+        self._database = database
+        self._hook_params = hook_params
+
+    def execute(self, context: t.Dict[str, t.Any]) -> ManifestT:
+        hook = ClickHouseHook(
+            clickhouse_conn_id=self._clickhouse_conn_id,
+            database=self._database,
+            **{'use_pool': True, **(self._hook_params or {})},
+        )
+        slices = self._get_slices(hook)
+        os.makedirs(self._output_dir, exist_ok=True)
+        if not slices:  # no partitions or an empty source
+            self.log.info('No partitions to export')
+            return self._get_manifest([])
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self._parallelism, len(slices)),
+                thread_name_prefix='clickhouse-export',
+        ) as executor:
+            futures = [
+                executor.submit(self._export_slice, hook, index, *slice_)
+                for index, slice_ in enumerate(slices)
+            ]
+            _, pending = concurrent.futures.wait(
+                futures,
+                return_when=concurrent.futures.FIRST_EXCEPTION,
+            )
+            for future in pending:
+                future.cancel()
+        files = [
+            file for future in futures
+            if not future.cancelled() and (file := future.result()) is not None
+        ]
+        return self._get_manifest(files)
+
+    def _get_slices(
+            self,
+            hook: ClickHouseHook,
+    ) -> t.List[t.Tuple[t.Any, str, t.Optional[dict]]]:
+        """ Returns (partition, query, parameters) of every slice. """
+        if self._partition_by is None:
+            return [(None, self._sql, self._parameters)]
+        subquery = f'SELECT * FROM ({self._sql})'
+        if isinstance(self._partitions, int):
+            return [
+                (
+                    partition,
+                    f'{subquery} WHERE cityHash64({self._partition_by})'
+                    f' % {self._partitions} = {partition}',
+                    self._parameters,
+                )
+                for partition in range(self._partitions)
+            ]
+        partitions = self._partitions
+        if partitions is None:
+            partitions = [row[0] for row in hook.execute(
+                f'SELECT DISTINCT {self._partition_by} FROM ({self._sql})',
+                self._parameters,
+                settings=self._settings,
+            )]
+        return [
+            (
+                partition,
+                f'{subquery} WHERE {self._partition_by} = %(_partition)s',
+                {**(self._parameters or {}), '_partition': partition},
+            )
+            for partition in partitions
+        ]
+
+    def _export_slice(
+            self,
+            hook: ClickHouseHook,
+            index: int,
+            partition: t.Any,
+            query: str,
+            parameters: t.Optional[dict],
+    ) -> t.Optional[t.Dict[str, t.Any]]:
+        rows = hook.execute_iter(
+            query,
+            parameters,
+            with_column_types=True,
+            settings=self._settings,
+        )
+        try:
+            columns = next(rows, [])  # nothing is yielded without a result
+            batches = iter(lambda: list(islice(rows, self._chunk_rows)), [])
+            first_batch = next(batches, None)
+            if first_batch is None:
+                self.log.info('Slice %s (partition %r) is empty', index, partition)
+                return None
+            path = os.path.join(
+                self._output_dir,
+                f'part-{index:05d}.{self._file_format}',
+            )
+            row_count = 0
+            with _open_writer(self._file_format, path, columns, first_batch) as write:
+                for batch in chain((first_batch,), batches):
+                    write(batch)
+                    row_count += len(batch)
+        finally:
+            rows.close()
+        self.log.info(
+            'Exported %s rows of slice %s (partition %r) to %s',
+            row_count, index, partition, path,
+        )
+        return {'path': path, 'partition': partition, 'rows': row_count}
+
+    def _get_manifest(self, files: t.List[t.Dict[str, t.Any]]) -> ManifestT:
+        """
+        Returns ``{'format': ..., 'rows': ..., 'files': [...]}``: a number
+        of exported rows and ``path``, ``partition``, ``rows`` and ``bytes``
+        of every file.
+        """
+        for file in files:
+            file['bytes'] = os.path.getsize(file['path'])
+        return {
+            'format': self._file_format,
+            'rows': sum(file['rows'] for file in files),
+            'files': files,
+        }
+
+
+@contextlib.contextmanager
+def _open_writer(
+        file_format: str,
+        path: str,
+        columns: t.List[t.Tuple[str, str]],
+        first_batch: t.List[tuple],
+) -> t.Iterator[_WriteT]:
+    if file_format == 'csv':
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(name for name, _ in columns)
+            yield writer.writerows
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _get_arrow_schema(columns, first_batch)
+
+    def write(batch: t.List[tuple]) -> None:
+        writer.write_table(pa.Table.from_arrays(
+            [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*batch), schema)
+            ],
+            schema=schema,
+        ))
+
+    with pq.ParquetWriter(path, schema) as writer:
+        yield write
+
+
+def _get_arrow_schema(
+        columns: t.List[t.Tuple[str, str]],
+        first_batch: t.List[tuple],
+) -> 'pa.Schema':
+    """ Maps simple ClickHouse types, infers others from the first batch. """
+    import pyarrow as pa
+
+    fields = []
+    for (name, type_name), values in zip(columns, zip(*first_batch)):
+        alias = _ARROW_TYPE_ALIASES.get(_unwrap_type(type_name))
+        arrow_type = pa.type_for_alias(alias) if alias else pa.array(values).type
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _unwrap_type(type_name: str) -> str:
+    for wrapper in ('Nullable(', 'LowCardinality('):
+        if type_name.startswith(wrapper):
+            return _unwrap_type(type_name[len(wrapper):-1])
+    return type_name
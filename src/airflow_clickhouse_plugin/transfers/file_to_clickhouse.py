@@ -0,0 +1,224 @@
+import concurrent.futures
+import json
+import os
+import time
+import typing as t
+from itertools import islice
+
+from airflow.models import BaseOperator
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook, \
+    default_conn_name
+
+if t.TYPE_CHECKING:
+    import pyarrow as pa
+
+FileFormatT = t.Literal['csv', 'parquet', 'ndjson']
+_FILE_FORMATS_BY_EXTENSION: t.Dict[str, FileFormatT] = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+class FileToClickHouseOperator(BaseOperator):
+    """
+    Loads local CSV, Parquet or NDJSON files into a ClickHouse table.
+
+    Files are read incrementally into PyArrow tables of ``chunk_rows`` rows,
+    every chunk is inserted by a separate ``ClickHouseHook.insert_arrow``
+    call (a single block of columns). Up to ``parallelism`` chunks are
+    inserted concurrently, each using a separate (pooled) connection, so
+    memory usage is bounded by ``2 * parallelism`` chunks.
+
+    If ``insert_deduplication_token`` is set, a chunk is inserted with
+    ``{insert_deduplication_token}-{file index}-{chunk index}`` token: chunks
+    inserted before a failure are deduplicated by the server on retry (if
+    deduplication is enabled for the table).
+
+    Returns a number of inserted ``rows`` and ``chunks``, ``seconds`` spent
+    and ``rows_per_second``.
+    """
+
+    template_fields = (
+        '_path',
+        '_table',
+        '_settings',
+        '_insert_deduplication_token',
+        '_database',
+    )
+    template_fields_renderers = {'_settings': 'json'}
+
+    def __init__(
+            self,
+            *args,
+            path: t.Union[str, t.Sequence[str]],
+            table: str,
+            file_format: t.Optional[FileFormatT] = None,
+            columns: t.Optional[t.Sequence[str]] = None,
+            chunk_rows: int = 65536,
+            parallelism: int = 4,
+            insert_deduplication_token: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+            clickhouse_conn_id: str = default_conn_name,
+            database: t.Optional[str] = None,
+            hook_params: t.Optional[t.Dict[str, t.Any]] = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if file_format is not None \
+                and file_format not in _FILE_FORMATS_BY_EXTENSION.values():
+            raise ValueError(f'unsupported file_format: {file_format!r}')
+        self._path = path
+        self._table = table
+        self._file_format = file_format
+        self._columns = columns
+        self._chunk_rows = chunk_rows
+        self._parallelism = parallelism
+        self._insert_deduplication_token = insert_deduplication_token
+        self._settings = settings
+        self._clickhouse_conn_id = clickhouse_conn_id
+        self._database = database
+        self._hook_params = hook_params
+
+    def execute(self, context: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+        hook = ClickHouseHook(
+            clickhouse_conn_id=self._clickhouse_conn_id,
+            database=self._database,
+            **{'use_pool': True, **(self._hook_params or {})},
+        )
+        paths = [self._path] if isinstance(self._path, str) else self._path
+        started_at = time.monotonic()
+        inserted_rows = inserted_chunks = 0
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._parallelism,
+                thread_name_prefix='clickhouse-insert',
+        ) as executor:
+            pending = set()
+            try:
+                for file_index, path in enumerate(paths):
+                    self.log.info('Reading %s', path)
+                    chunks = _read_chunks(
+                        path,
+                        self._file_format or _get_file_format(path),
+                        self._columns,
+                        self._chunk_rows,
+                    )
+                    for chunk_index, chunk in enumerate(chunks):
+                        if len(pending) >= 2 * self._parallelism:
+                            done, pending = concurrent.futures.wait(
+                                pending,
+                                return_when=concurrent.futures.FIRST_COMPLETED,
+                            )
+                            for future in done:
+                                inserted_rows += future.result()
+                                inserted_chunks += 1
+                        pending.add(executor.submit(
+                            self._insert_chunk,
+                            hook,
+                            chunk,
+                            self._get_settings(file_index, chunk_index),
+                        ))
+                for future in concurrent.futures.as_completed(pending):
+                    inserted_rows += future.result()
+                    inserted_chunks += 1
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        seconds = time.monotonic() - started_at
+        rows_per_second = inserted_rows / seconds if seconds else 0.0
+        self.log.info(
+            'Inserted %s rows in %s chunks in %.1f seconds (%.0f rows/s)',
+            inserted_rows, inserted_chunks, seconds, rows_per_second,
+        )
+        return {
+            'rows': inserted_rows,
+            'chunks': inserted_chunks,
+            'seconds': seconds,
+            'rows_per_second': rows_per_second,
+        }
+
+    def _insert_chunk(
+            self,
+            hook: ClickHouseHook,
+            chunk: 'pa.Table',
+            settings: t.Dict[str, t.Any],
+    ) -> int:
+        return hook.insert_arrow(
+            self._table,
+            chunk,
+            self._chunk_rows,
+            settings=settings,
+        )
+
+    def _get_settings(self, file_index: int, chunk_index: int) -> t.Dict[str, t.Any]:
+        settings = dict(self._settings or {})
+        if self._insert_deduplication_token is not None:
+            settings['insert_deduplication_token'] = \
+                f'{self._insert_deduplication_token}-{file_index}-{chunk_index}'
+        return settings
+
+
+def _get_file_format(path: str) -> FileFormatT:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _FILE_FORMATS_BY_EXTENSION:
+        raise ValueError(f'cannot detect file_format of {path}')
+    return _FILE_FORMATS_BY_EXTENSION[extension]
+
+
+def _read_chunks(
+        path: str,
+        file_format: FileFormatT,
+        columns: t.Optional[t.Sequence[str]],
+        chunk_rows: int,
+) -> t.Iterator['pa.Table']:
+    """ Reads a file into tables of exactly chunk_rows rows (but the last). """
+    import pyarrow as pa
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_rows,
+            columns=columns,
+        )
+    elif file_format == 'csv':
+        import pyarrow.csv
+
+        batches = pyarrow.csv.open_csv(
+            path,
+            convert_options=pyarrow.csv.ConvertOptions(include_columns=columns),
+        )
+    else:
+        # pyarrow.json reads a whole file at once
+        with open(path) as file:
+            lines = (line for line in file if line.strip())
+            while chunk := list(islice(lines, chunk_rows)):
+                table = pa.Table.from_pylist([json.loads(line) for line in chunk])
+                yield table.select(columns) if columns is not None else table
+        return
+    yield from _rebatch(batches, chunk_rows)
+
+
+def _rebatch(
+        batches: t.Iterable['pa.RecordBatch'],
+        chunk_rows: int,
+) -> t.Iterator['pa.Table']:
+    # chunk boundaries must not depend on reader's block sizes: they define
+    # deduplication tokens
+    import pyarrow as pa
+
+    pending: t.List['pa.RecordBatch'] = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_rows:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_rows)
+            rest = table.slice(chunk_rows)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
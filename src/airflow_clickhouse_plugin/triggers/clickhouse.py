@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import re
+import time
+import typing as t
+
+from airflow.triggers.base import BaseTrigger, TriggerEvent
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ExecuteParamsT, \
+    ExternalTable, default_conn_name
+
+logger = logging.getLogger(__name__)
+
+
+class ClickHouseTrigger(BaseTrigger):
+    """
+    Executes queries in the triggerer using ``ClickHouseAsyncHook``.
+
+    If ``poke_interval`` is ``None``, fires an event with a result of the last
+    query once it is executed. Otherwise, re-executes queries every
+    ``poke_interval`` seconds until the result is truthy.
+
+    The event payload is a dict: ``{'status': 'success', 'result': ...}`` or
+    ``{'status': 'error', 'message': ...}`` if a query fails.
+
+    If ``batched`` is set, pokes are aligned to multiples of
+    ``poke_interval``, and queries of triggers poking at the same time with
+    the same connection, database and settings are combined into a single
+    ``UNION ALL`` query. Rows are fanned back out to the triggers.
+    """
+
+    def __init__(
+            self,
+            sql: t.Union[str, t.Iterable[str]],
+            parameters: t.Optional[ExecuteParamsT] = None,
+            with_column_types: bool = False,
+            external_tables: t.Optional[t.List[ExternalTable]] = None,
+            query_id: t.Optional[str] = None,
+            settings: t.Dict[str, t.Any] = None,
+            types_check: bool = False,
+            columnar: bool = False,
+            clickhouse_conn_id: str = default_conn_name,
+            database: t.Optional[str] = None,
+            poke_interval: t.Optional[float] = None,
+            batched: bool = False,
+    ):
+        super().__init__()
+        self.sql = sql if isinstance(sql, str) else list(sql)
+        if batched and not (
+                isinstance(self.sql, str)
+                and (parameters is None or isinstance(parameters, dict))
+                and not with_column_types
+                and external_tables is None
+                and query_id is None
+                and not columnar
+        ):
+            raise ValueError(
+                'batched requires a single query with dict parameters and'
+                ' without with_column_types, external_tables, query_id and'
+                ' columnar',
+            )
+        self.parameters = parameters
+        self.with_column_types = with_column_types
+        self.external_tables = external_tables
+        self.query_id = query_id
+        self.settings = settings
+        self.types_check = types_check
+        self.columnar = columnar
+        self.clickhouse_conn_id = clickhouse_conn_id
+        self.database = database
+        self.poke_interval = poke_interval
+        self.batched = batched
+
+    def serialize(self) -> t.Tuple[str, t.Dict[str, t.Any]]:
+        return (
+            f'{type(self).__module__}.{type(self).__qualname__}',
+            {
+                'sql': self.sql,
+                'parameters': self.parameters,
+                'with_column_types': self.with_column_types,
+                'external_tables': self.external_tables,
+                'query_id': self.query_id,
+                'settings': self.settings,
+                'types_check': self.types_check,
+                'columnar': self.columnar,
+                'clickhouse_conn_id': self.clickhouse_conn_id,
+                'database': self.database,
+                'poke_interval': self.poke_interval,
+                'batched': self.batched,
+            },
+        )
+
+    async def run(self) -> t.AsyncIterator[TriggerEvent]:
+        # imported here: requires the async extra which the triggerer has
+        from airflow_clickhouse_plugin.hooks.clickhouse_async import \
+            ClickHouseAsyncHook
+
+        hook = ClickHouseAsyncHook(
+            clickhouse_conn_id=self.clickhouse_conn_id,
+            database=self.database,
+        )
+        while True:
+            try:
+                if self.batched:
+                    result = await _get_batch(
+                        hook,
+                        self.clickhouse_conn_id,
+                        self.database,
+                        self.settings,
+                        self.types_check,
+                    ).execute(self.sql, self.parameters)
+                else:
+                    result = await hook.execute(
+                        self.sql,
+                        self.parameters,
+                        self.with_column_types,
+                        self.external_tables,
+                        self.query_id,
+                        self.settings,
+                        self.types_check,
+                        self.columnar,
+                    )
+            except Exception as error:
+                yield TriggerEvent({'status': 'error', 'message': str(error)})
+                return
+            if self.poke_interval is None or result:
+                yield TriggerEvent({'status': 'success', 'result': result})
+                return
+            self.log.info('Result is falsy, sleeping for %s seconds', self.poke_interval)
+            if self.batched:
+                # triggers with the same poke_interval wake up together
+                await asyncio.sleep(
+                    self.poke_interval - time.time() % self.poke_interval,
+                )
+            else:
+                await asyncio.sleep(self.poke_interval)
+
+
+# queries submitted within this number of seconds are combined
+_BATCH_WINDOW = 1.0
+_PARAM_PATTERN = re.compile(r'(?<!%)%\((\w+)\)s')
+
+_BatchKeyT = t.Tuple[str, t.Optional[str], str, bool]
+_batches: t.Dict[_BatchKeyT, '_Batch'] = {}
+
+
+class _Batch:
+    """
+    Combines queries submitted by triggers within ``_BATCH_WINDOW`` seconds
+    into a single query. A batch is shared by triggers of the triggerer
+    process with the same connection, database, settings and types_check.
+    """
+
+    def __init__(
+            self,
+            hook: t.Any,  # ClickHouseAsyncHook, requires the async extra
+            settings: t.Optional[t.Dict[str, t.Any]],
+            types_check: bool,
+    ):
+        self._hook = hook
+        self._settings = settings
+        self._types_check = types_check
+        self._pending: t.List[t.Tuple[str, t.Optional[dict], asyncio.Future]] = []
+        self._flush_task: t.Optional[asyncio.Future] = None
+
+    async def execute(self, sql: str, parameters: t.Optional[dict]) -> list:
+        if not self._pending:
+            self._flush_task = asyncio.ensure_future(self._flush())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((sql, parameters, future))
+        return await future
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(_BATCH_WINDOW)
+        pending, self._pending = self._pending, []
+        if len(pending) > 1:
+            logger.info('Poking %s triggers with a single query', len(pending))
+            sql, parameters = _union_all([
+                (sql, parameters) for sql, parameters, _ in pending
+            ])
+            try:
+                rows = await self._execute(sql, parameters)
+            except Exception as error:
+                logger.warning(
+                    'Combined query failed, executing queries one by one: %s',
+                    error,
+                )
+            else:
+                results = [[] for _ in pending]
+                for index, *row in rows:
+                    results[index].append(tuple(row))
+                for (_, _, future), result in zip(pending, results):
+                    if not future.done():
+                        future.set_result(result)
+                return
+        await asyncio.gather(*(
+            self._resolve(future, self._execute(sql, parameters))
+            for sql, parameters, future in pending
+        ))
+
+    async def _execute(self, sql: str, parameters: t.Optional[dict]) -> list:
+        return await self._hook.execute(
+            sql,
+            parameters,
+            settings=self._settings,
+            types_check=self._types_check,
+        )
+
+    @staticmethod
+    async def _resolve(future: asyncio.Future, result: t.Awaitable) -> None:
+        try:
+            result = await result
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+
+def _get_batch(
+        hook: t.Any,
+        clickhouse_conn_id: str,
+        database: t.Optional[str],
+        settings: t.Optional[t.Dict[str, t.Any]],
+        types_check: bool,
+) -> _Batch:
+    key = (
+        clickhouse_conn_id,
+        database,
+        json.dumps(settings, sort_keys=True, default=str),
+        types_check,
+    )
+    if key not in _batches:
+        _batches[key] = _Batch(hook, settings, types_check)
+    return _batches[key]
+
+
+def _union_all(
+        queries: t.List[t.Tuple[str, t.Optional[dict]]],
+) -> t.Tuple[str, t.Optional[dict]]:
+    """
+    Combines queries into ``SELECT <index>, * FROM (<query>) UNION ALL ...``.
+
+    Parameters are prefixed by indices of queries to avoid name clashes.
+    """
+    has_parameters = any(parameters is not None for _, parameters in queries)
+    combined_parameters = {}
+    subqueries = []
+    for index, (sql, parameters) in enumerate(queries):
+        if parameters is not None:
+            sql = _PARAM_PATTERN.sub(rf'%(_{index}_\1)s', sql)
+            combined_parameters.update(
+                (f'_{index}_{name}', value)
+                for name, value in parameters.items()
+            )
+        elif has_parameters:
+            sql = sql.replace('%', '%%')  # is not substituted otherwise
+        subqueries.append(f'SELECT {index}, * FROM (\n{sql}\n)')
+    return (
+        '\nUNION ALL\n'.join(subqueries),
+        combined_parameters if has_parameters else None,
+    )
@@ -20,6 +20,17 @@ class ClickHouseHookTestCase(unittest.TestCase):
         )
         self.assertTupleEqual(([(6,)], [('output', 'Int64')]), return_value)
 
+    def test_execute_iter(self):
+        return_value = ClickHouseHook().execute_iter(
+            'SELECT number FROM system.numbers LIMIT 5',
+            settings={'max_block_size': 2},
+            chunk_size=2,
+        )
+        self.assertListEqual(
+            [[(0,), (1,)], [(2,), (3,)], [(4,)]],
+            list(return_value),
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
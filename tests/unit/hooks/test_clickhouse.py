@@ -1,10 +1,18 @@
+import importlib.util
 import unittest
 from unittest import mock
 
+import clickhouse_driver
 from airflow.models import Connection
 
 from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook, \
-    _format_query_log
+    ClickHouseParallelExecutionError, _QueryLog, _format_query_log, \
+    conn_to_kwargs
+from airflow_clickhouse_plugin.hooks.clickhouse_batcher import InsertBatcher
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import TTLCache
+from airflow_clickhouse_plugin.hooks.clickhouse_pool import ClientPool
+from airflow_clickhouse_plugin.hooks.clickhouse_result_cache import \
+    is_read_only
 
 
 class ClickHouseHookTestCase(unittest.TestCase):
@@ -104,6 +112,510 @@ class ClickHouseHookTestCase(unittest.TestCase):
         with self.subTest('return value'):
             self.assertEqual('test-return-value', return_value)
 
+    def test_execute_iter(self):
+        queries = ['CREATE TABLE test', 'SELECT 1']
+        client_instance_mock = self._client_cls_mock.return_value
+        client_instance_mock.execute_iter.return_value = iter([[(1,)], [(2,)]])
+        self._get_connection_mock.return_value = Connection()
+
+        result = ClickHouseHook().execute_iter(
+            sql=queries,
+            params={'test-param': 1},
+            with_column_types=True,
+            external_tables=[{'name': 'ext'}],  # type: ignore
+            query_id='test-query-id',
+            settings={'max_block_size': 1},
+            types_check=True,
+            chunk_size=2,
+        )
+
+        with self.subTest('lazy connection'):
+            self._client_cls_mock.assert_not_called()
+
+        with self.subTest('first chunk'):
+            self.assertEqual([(1,)], next(result))
+
+        with self.subTest('Client.execute'):
+            client_instance_mock.execute.assert_called_once_with(
+                'CREATE TABLE test',
+                params={'test-param': 1},
+                external_tables=[{'name': 'ext'}],
+                query_id='test-query-id',
+                settings={'max_block_size': 1},
+                types_check=True,
+            )
+
+        with self.subTest('Client.execute_iter'):
+            client_instance_mock.execute_iter.assert_called_once_with(
+                'SELECT 1',
+                params={'test-param': 1},
+                with_column_types=True,
+                external_tables=[{'name': 'ext'}],
+                query_id='test-query-id',
+                settings={'max_block_size': 1},
+                types_check=True,
+                chunk_size=2,
+            )
+
+        with self.subTest('connection is open while iterating'):
+            client_instance_mock.disconnect.assert_not_called()
+
+        with self.subTest('remaining chunks'):
+            self.assertListEqual([[(2,)]], list(result))
+
+        with self.subTest('Client.disconnect'):
+            client_instance_mock.disconnect.assert_called_once_with()
+
+    def test_execute_iter_closed_early(self):
+        client_instance_mock = self._client_cls_mock.return_value
+        client_instance_mock.execute_iter.return_value = iter([(1,), (2,)])
+        self._get_connection_mock.return_value = Connection()
+
+        result = ClickHouseHook().execute_iter('SELECT 1')
+        self.assertEqual((1,), next(result))
+        result.close()
+
+        client_instance_mock.execute.assert_not_called()
+        client_instance_mock.disconnect.assert_called_once_with()
+
+    def test_query_dataframe(self):
+        client_instance_mock = self._client_cls_mock.return_value
+        self._get_connection_mock.return_value = Connection(
+            extra='{"settings": {"max_threads": 2}}',
+        )
+
+        return_value = ClickHouseHook().query_dataframe(
+            sql=['SET max_threads = 1', 'SELECT 1'],
+            params={'test-param': 1},
+            external_tables=[{'name': 'ext'}],  # type: ignore
+            query_id='test-query-id',
+            settings={'test-setting': 1},
+            replace_nonwords=False,
+        )
+
+        with self.subTest('Client.__init__'):
+            self._client_cls_mock.assert_called_once_with(
+                host='localhost',
+                settings={'max_threads': 2, 'use_numpy': True},
+            )
+
+        with self.subTest('Client.execute'):
+            client_instance_mock.execute.assert_called_once_with(
+                'SET max_threads = 1',
+                params={'test-param': 1},
+                external_tables=[{'name': 'ext'}],
+                query_id='test-query-id',
+                settings={'test-setting': 1},
+            )
+
+        with self.subTest('Client.query_dataframe'):
+            client_instance_mock.query_dataframe.assert_called_once_with(
+                'SELECT 1',
+                params={'test-param': 1},
+                external_tables=[{'name': 'ext'}],
+                query_id='test-query-id',
+                settings={'test-setting': 1},
+                replace_nonwords=False,
+            )
+
+        with self.subTest('Client.disconnect'):
+            client_instance_mock.disconnect.assert_called_once_with()
+
+        with self.subTest('return value'):
+            self.assertIs(
+                client_instance_mock.query_dataframe.return_value,
+                return_value,
+            )
+
+    @unittest.skipUnless(importlib.util.find_spec('pandas'), 'requires pandas')
+    def test_insert_dataframe(self):
+        import pandas as pd
+
+        client_instance_mock = self._client_cls_mock.return_value
+        client_instance_mock.insert_dataframe.side_effect = [2, 1]
+        self._get_connection_mock.return_value = Connection()
+        dataframes = [
+            pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}),
+            pd.DataFrame({'a': [3]}),
+        ]
+
+        return_value = ClickHouseHook().insert_dataframe(
+            'test_table',
+            (dataframe for dataframe in dataframes),
+            chunk_rows=100,
+            query_id='test-query-id',
+            settings={'test-setting': 1},
+        )
+
+        with self.subTest('Client.__init__'):
+            self._client_cls_mock.assert_called_once_with(
+                host='localhost',
+                settings={'use_numpy': True},
+            )
+
+        with self.subTest('Client.insert_dataframe'):
+            self.assertListEqual(
+                [
+                    mock.call(
+                        'INSERT INTO test_table (`a`, `b`) VALUES',
+                        dataframes[0],
+                        external_tables=None,
+                        query_id='test-query-id',
+                        settings={'test-setting': 1, 'insert_block_size': 100},
+                    ),
+                    mock.call(
+                        'INSERT INTO test_table (`a`) VALUES',
+                        dataframes[1],
+                        external_tables=None,
+                        query_id='test-query-id',
+                        settings={'test-setting': 1, 'insert_block_size': 100},
+                    ),
+                ],
+                client_instance_mock.insert_dataframe.mock_calls,
+            )
+
+        with self.subTest('Client.disconnect'):
+            client_instance_mock.disconnect.assert_called_once_with()
+
+        with self.subTest('return value'):
+            self.assertEqual(3, return_value)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+    def test_insert_arrow(self):
+        import pyarrow as pa
+
+        client_instance_mock = self._client_cls_mock.return_value
+        client_instance_mock.insert_dataframe.side_effect = \
+            lambda query, dataframe, **kwargs: len(dataframe)
+        self._get_connection_mock.return_value = Connection()
+        table = pa.table({'a': [1, 2, 3, 4, 5]})
+
+        return_value = ClickHouseHook().insert_arrow(
+            'test_table',
+            [table, table.to_batches()[0].slice(0, 1)],
+            chunk_rows=2,
+        )
+
+        with self.subTest('chunks'):
+            self.assertListEqual(
+                [[1, 2], [3, 4], [5], [1]],
+                [
+                    mock_call.args[1]['a'].tolist()
+                    for mock_call
+                    in client_instance_mock.insert_dataframe.mock_calls
+                ],
+            )
+
+        with self.subTest('return value'):
+            self.assertEqual(6, return_value)
+
+    def test_use_pool(self):
+        client_instance_mock = self._client_cls_mock.return_value
+        client_instance_mock.connection.is_query_executing = False
+        self._get_connection_mock.return_value = Connection(host='test-host')
+
+        hook = ClickHouseHook(use_pool=True)
+        with mock.patch(
+                'airflow_clickhouse_plugin.hooks.clickhouse.client_pool',
+                ClientPool(),
+        ):
+            hook.execute('SELECT 1')
+            hook.execute('SELECT 2')
+
+        with self.subTest('Client.__init__'):
+            self._client_cls_mock.assert_called_once_with(host='test-host')
+
+        with self.subTest('Client.execute'):
+            self.assertEqual(2, client_instance_mock.execute.call_count)
+
+        with self.subTest('Client.disconnect'):
+            client_instance_mock.disconnect.assert_not_called()
+
+    def test_connection_cache(self):
+        self._get_connection_mock.return_value = Connection(host='test-host')
+        cache = TTLCache()
+        with mock.patch(
+                'airflow_clickhouse_plugin.hooks.clickhouse.connection_cache',
+                cache,
+        ):
+            hook = ClickHouseHook(database='test-db', connection_cache_ttl=60)
+            hook.execute('SELECT 1')
+            hook.execute('SELECT 2')
+
+        with self.subTest('connection lookup'):
+            self._get_connection_mock.assert_called_once_with('clickhouse_default')
+
+        with self.subTest('Client.__init__'):
+            self.assertListEqual(
+                [mock.call(host='test-host', database='test-db')] * 2,
+                [c for c in self._client_cls_mock.mock_calls if c[0] == ''],
+            )
+
+        with self.subTest('stats'):
+            self.assertDictEqual({'hits': 1, 'misses': 1, 'size': 1}, cache.stats())
+
+    def test_connection_cache_auth_failure(self):
+        client_instance_mock = self._client_cls_mock.return_value
+        client_instance_mock.execute.side_effect = \
+            clickhouse_driver.errors.ServerException('test', code=516)
+        self._get_connection_mock.return_value = Connection()
+        cache = TTLCache()
+        with mock.patch(
+                'airflow_clickhouse_plugin.hooks.clickhouse.connection_cache',
+                cache,
+        ):
+            with self.assertRaises(clickhouse_driver.errors.ServerException):
+                ClickHouseHook(connection_cache_ttl=60).execute('SELECT 1')
+
+        self.assertEqual(0, len(cache))
+        client_instance_mock.disconnect.assert_called_once_with()
+
+    def test_result_cache(self):
+        self._get_connection_mock.return_value = Connection()
+        client_mock = self._client_cls_mock.return_value
+        client_mock.execute.side_effect = [
+            [(1,)], [(2,)], [(3,)], [], [], [(0,)], [(4,)],
+        ]
+        hook = ClickHouseHook(result_cache_ttl=60)
+        with mock.patch(
+                'airflow_clickhouse_plugin.hooks.clickhouse_result_cache.result_cache',
+                TTLCache(),
+        ) as cache:
+            results = [
+                hook.execute('SELECT 1'),
+                hook.execute('SELECT 1'),
+                hook.execute('SELECT 1', {'param': 1}),
+                # INSERT queries are not cached
+                hook.execute('INSERT INTO test VALUES', [(1,)]),
+                # statements changing data are executed every time
+                hook.execute('INSERT INTO test SELECT 1'),
+                hook.execute('INSERT INTO test SELECT 1'),
+                hook.execute(['/* comment */ WITH 4 AS x SELECT x', 'SHOW TABLES']),
+            ]
+        self.assertListEqual(
+            [[(1,)], [(1,)], [(2,)], [(3,)], [], [], [(4,)]],
+            results,
+        )
+        self.assertDictEqual({'hits': 1, 'misses': 3, 'size': 3}, cache.stats())
+
+    def test_is_read_only(self):
+        for sql, expected in [
+            ('SELECT 1', True),
+            ('  (select 1) UNION ALL (SELECT 2)', True),
+            ('-- comment\nWITH 1 AS x SELECT x', True),
+            (['SHOW TABLES', 'DESCRIBE TABLE test', 'EXISTS test'], True),
+            ('INSERT INTO test SELECT 1', False),
+            ('OPTIMIZE TABLE test FINAL', False),
+            (['SELECT 1', 'TRUNCATE TABLE test'], False),
+            ('/* SELECT */ ALTER TABLE test DELETE WHERE 1', False),
+        ]:
+            with self.subTest(sql):
+                self.assertEqual(expected, is_read_only(sql))
+
+    def test_generator_row_count(self):
+        self._get_connection_mock.return_value = Connection()
+        client_mock = self._client_cls_mock.return_value
+        client_mock.execute.side_effect = lambda query, params, **kwargs: \
+            len(list(params))
+        hook = ClickHouseHook()
+        with mock.patch.object(hook.log, 'info') as log_info_mock:
+            hook.execute('INSERT INTO test VALUES', (row for row in [(1,), (2,)]))
+        log_info_mock.assert_called_with('Sent %s rows of a generator', 2)
+
+    def test_generator_multiple_queries(self):
+        with self.assertRaisesRegex(ValueError, 'generator'):
+            ClickHouseHook().execute(
+                ['INSERT INTO test1 VALUES', 'INSERT INTO test2 VALUES'],
+                (row for row in [(1,)]),
+            )
+        self._client_cls_mock.assert_not_called()
+
+    def test_secret_params(self):
+        self._get_connection_mock.return_value = Connection()
+        client_mock = self._client_cls_mock.return_value
+        hook = ClickHouseHook()
+        params = {'user': 'test-user', 'password': 'test-password'}
+        for parallelism in (1, 2):
+            with self.subTest(parallelism=parallelism), \
+                    mock.patch.object(hook.log, 'info') as log_info_mock:
+                hook.execute(
+                    ['SELECT %(user)s, %(password)s'] * parallelism,
+                    params,
+                    secret_params=('password',),
+                    parallelism=parallelism,
+                )
+                self.assertEqual(
+                    "SELECT %(user)s, %(password)s with"
+                    " {'user': 'test-user', 'password': '***'}",
+                    str(log_info_mock.call_args_list[0].args[0]),
+                )
+                self.assertNotIn('test-password', str([
+                    str(arg) for call in log_info_mock.call_args_list
+                    for arg in call.args
+                ]))
+                self.assertEqual(params, client_mock.execute.call_args.kwargs['params'])
+
+    def test_insert_rows(self):
+        self._get_connection_mock.return_value = Connection()
+        client_mock = self._client_cls_mock.return_value
+        sent_rows = []
+        client_mock.execute.side_effect = lambda query, params, **kwargs: \
+            len(sent_rows.extend(params) or sent_rows)
+        progress = []
+        with self.subTest('rows'):
+            inserted_rows = ClickHouseHook().insert_rows(
+                'test_table',
+                iter([(1, 'a'), (2, 'b'), (3, 'c')]),
+                columns=['id', 'name'],
+                block_size=2,
+                on_progress=progress.append,
+                settings={'test-setting': 1},
+            )
+            self.assertEqual(3, inserted_rows)
+            self.assertListEqual([2, 3], progress)
+            self.assertEqual(
+                'INSERT INTO test_table (`id`, `name`) VALUES',
+                client_mock.execute.call_args.args[0],
+            )
+            self.assertDictEqual(
+                {'test-setting': 1, 'insert_block_size': 2},
+                client_mock.execute.call_args.kwargs['settings'],
+            )
+        sent_rows.clear()
+        with self.subTest('batches'):
+            ClickHouseHook().insert_rows(
+                'test_table',
+                [[(1,), (2,)], [(3,)]],
+                batched=True,
+            )
+            self.assertListEqual([(1,), (2,), (3,)], sent_rows)
+        sent_rows.clear()
+        with self.subTest('async iterable'):
+            async def rows():
+                for row in range(2000):
+                    yield (row,)
+
+            ClickHouseHook().insert_rows('test_table', rows())
+            self.assertListEqual([(row,) for row in range(2000)], sent_rows)
+
+    def test_insert_rows_async_error(self):
+        self._get_connection_mock.return_value = Connection()
+        self._client_cls_mock.return_value.execute.side_effect = \
+            lambda query, params, **kwargs: list(params)
+
+        async def rows():
+            yield (1,)
+            raise ValueError('test-error')
+
+        with self.assertRaisesRegex(ValueError, 'test-error'):
+            ClickHouseHook().insert_rows('test_table', rows())
+
+    def test_async_insert(self):
+        self._get_connection_mock.return_value = Connection()
+        client_mock = self._client_cls_mock.return_value
+        hook = ClickHouseHook(async_insert='fire_and_forget')
+        with self.subTest('execute'):
+            hook.execute(
+                'INSERT INTO test_table VALUES',
+                [(1,)],
+                settings={'async_insert_busy_timeout_ms': 200},
+            )
+            self.assertDictEqual(
+                {
+                    'async_insert': 1,
+                    'wait_for_async_insert': 0,
+                    'async_insert_busy_timeout_ms': 200,
+                },
+                client_mock.execute.call_args.kwargs['settings'],
+            )
+        with self.subTest('insert_rows'):
+            hook.insert_rows('test_table', [(1,)], block_size=10)
+            self.assertDictEqual(
+                {
+                    'async_insert': 1,
+                    'wait_for_async_insert': 0,
+                    'async_insert_busy_timeout_ms': 1000,
+                    'insert_block_size': 10,
+                },
+                client_mock.execute.call_args.kwargs['settings'],
+            )
+        with self.subTest('unknown mode'), self.assertRaises(ValueError):
+            ClickHouseHook(async_insert='unknown')
+
+    def test_buffer_rows(self):
+        self._get_connection_mock.return_value = Connection()
+        client_mock = self._client_cls_mock.return_value
+        client_mock.execute.side_effect = \
+            lambda query, params, **kwargs: len(list(params))
+        batcher = InsertBatcher(max_rows=3)
+        with mock.patch(
+                'airflow_clickhouse_plugin.hooks.clickhouse.insert_batcher',
+                batcher,
+        ), batcher.batching():
+            ClickHouseHook().buffer_rows('test_table', [(1, 'a')], ['id', 'name'])
+            ClickHouseHook().buffer_rows('test_table', [(2,)], ['id'])
+            ClickHouseHook().buffer_rows('test_table', [(3, 'c'), (4, 'd')], ('id', 'name'))
+            with self.subTest('flushed by size'):
+                client_mock.execute.assert_called_once()
+                self.assertEqual(
+                    'INSERT INTO test_table (`id`, `name`) VALUES',
+                    client_mock.execute.call_args.args[0],
+                )
+            self.assertEqual(1, len(batcher))
+        with self.subTest('flushed on exit of the block'):
+            self.assertEqual(0, len(batcher))
+            self.assertEqual(
+                'INSERT INTO test_table (`id`) VALUES',
+                client_mock.execute.call_args.args[0],
+            )
+
+    def test_parallelism(self):
+        self._get_connection_mock.return_value = Connection()
+        # every connection is a separate client returning its query's number
+        self._client_cls_mock.side_effect = lambda **kwargs: mock.MagicMock(**{
+            'execute.side_effect': lambda query, **kwargs: int(query[-1]),
+        })
+        queries = [f'SELECT {number}' for number in range(5)]
+        return_value = ClickHouseHook().execute(
+            queries,
+            query_id='test-query-id',
+            parallelism=2,
+        )
+        with self.subTest('separate connections'):
+            self.assertEqual(5, self._client_cls_mock.call_count)
+        with self.subTest('return value'):
+            self.assertEqual(4, return_value)
+
+    def test_parallelism_no_queries(self):
+        self._get_connection_mock.return_value = Connection()
+        self.assertIsNone(ClickHouseHook().execute([]))
+        self.assertIsNone(ClickHouseHook().execute([], parallelism=2))
+        self._client_cls_mock.return_value.execute.assert_not_called()
+
+    def test_parallelism_fail_fast(self):
+        self._get_connection_mock.return_value = Connection()
+        self._client_cls_mock.return_value.execute.side_effect = \
+            ValueError('test-error')
+        with self.assertRaisesRegex(ValueError, 'test-error'):
+            ClickHouseHook().execute(['SELECT 1'] * 10, parallelism=2)
+        self.assertLess(self._client_cls_mock.call_count, 10)
+
+    def test_parallelism_collect_all(self):
+        self._get_connection_mock.return_value = Connection()
+        self._client_cls_mock.side_effect = lambda **kwargs: mock.MagicMock(**{
+            'execute.side_effect': lambda query, **kwargs:
+                int(query[-1]) if query[-1] != '1' else 1 / 0,
+        })
+        with self.assertRaises(ClickHouseParallelExecutionError) as raised:
+            ClickHouseHook().execute(
+                ['SELECT 0', 'SELECT 1', 'SELECT 2'],
+                parallelism=3,
+                error_policy='collect_all',
+            )
+        self.assertListEqual([0, None, 2], raised.exception.results)
+        self.assertListEqual([1], list(raised.exception.errors))
+        self.assertIsInstance(raised.exception.errors[1], ZeroDivisionError)
+
     def setUp(self):
         self._client_cls_patcher = mock.patch('clickhouse_driver.Client')
         self._client_cls_mock = self._client_cls_patcher.start()
@@ -116,6 +628,25 @@ class ClickHouseHookTestCase(unittest.TestCase):
         self._get_connection_patcher.stop()
 
 
+class ConnToKwargsTestCase(unittest.TestCase):
+    def test_use_numpy(self):
+        subtests = (
+            ('{"use_numpy": true}', {'use_numpy': True}),
+            ('{"use_numpy": "true"}', {'use_numpy': True}),
+            ('{"use_numpy": "false"}', {'use_numpy': False}),
+            (
+                '{"use_numpy": 1, "settings": {"max_threads": 2}}',
+                {'max_threads': 2, 'use_numpy': True},
+            ),
+        )
+        for extra, expected_settings in subtests:
+            with self.subTest(extra):
+                self.assertDictEqual(
+                    {'host': 'localhost', 'settings': expected_settings},
+                    conn_to_kwargs(Connection(extra=extra), None),
+                )
+
+
 class ClickHouseHookLoggingTestCase(unittest.TestCase):
     def test(self):
         test_generator = (_ for _ in range(1))
@@ -179,12 +710,31 @@ class ClickHouseHookLoggingTestCase(unittest.TestCase):
             # params: Generator
             (
                 'INSERT INTO test11 VALUES', test_generator,
-                f'INSERT INTO test11 VALUES with {test_generator}',
+                'INSERT INTO test11 VALUES with rows of a generator',
+            ),
+            # params: rows
+            (
+                'INSERT INTO test12 VALUES', [(row, 'x') for row in range(11)],
+                ''.join((
+                    'INSERT INTO test12 VALUES with [',
+                    ', '.join(f"({row}, 'x')" for row in range(10)),
+                    " … and 1 more parameters] (11 rows, 2 columns, ~154 B)",
+                )),
             ),
         )
         for query, params, expected in subtests:
             with self.subTest((query, params)):
-                self.assertEqual(expected, _format_query_log(query, params))
+                self.assertEqual(expected, str(_format_query_log(query, params)))
+
+    def test_format_query_log_lazy(self):
+        params = mock.MagicMock(spec=list)
+        _format_query_log('INSERT INTO test VALUES', params)
+        params.__len__.assert_not_called()
+        with self.subTest('size cap'):
+            self.assertEqual(
+                'SELECT … and 7 more characters',
+                str(_QueryLog('SELECT 123456', None, max_size=6)),
+            )
 
 
 if __name__ == '__main__':
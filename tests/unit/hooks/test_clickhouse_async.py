@@ -0,0 +1,110 @@
+import asyncio
+import importlib.util
+import unittest
+from unittest import mock
+
+from airflow.models import Connection
+
+
+@unittest.skipUnless(importlib.util.find_spec('asynch'), 'requires asynch')
+class ClickHouseAsyncHookTestCase(unittest.TestCase):
+    def test_execute(self):
+        cursor_mock = self._cursor_mock
+        cursor_mock.fetchall.return_value = [(1, 'a'), (2, 'b')]
+        cursor_mock.description = [
+            mock.Mock(name_='x', type_code='Int32'),
+            mock.Mock(name_='y', type_code='String'),
+        ]
+        for column, name in zip(cursor_mock.description, 'xy'):
+            column.name = name
+        self._get_connection_mock.return_value = Connection(
+            host='test-host',
+            schema='test-schema',
+        )
+
+        return_value = asyncio.run(self._hook_cls(
+            clickhouse_conn_id='test-conn-id',
+            database='test-database',
+        ).execute(
+            'SELECT 1',
+            params={'test-param': 1},
+            with_column_types=True,
+            external_tables=[{'name': 'ext', 'structure': [], 'data': []}],
+            query_id='test-query-id',
+            settings={'test-setting': 1},
+            types_check=True,
+            columnar=True,
+        ))
+
+        with self.subTest('connection id'):
+            self._get_connection_mock.assert_called_once_with('test-conn-id')
+
+        with self.subTest('asynch.Connection.__init__'):
+            self._connection_cls_mock.assert_called_once_with(
+                host='test-host',
+                database='test-database',
+            )
+
+        with self.subTest('cursor'):
+            cursor_mock.set_external_table.assert_called_once_with('ext', [], [])
+            cursor_mock.set_query_id.assert_called_once_with('test-query-id')
+            cursor_mock.set_settings.assert_called_once_with({'test-setting': 1})
+            cursor_mock.set_types_check.assert_called_once_with(True)
+            cursor_mock.execute.assert_awaited_once_with(
+                'SELECT 1',
+                {'test-param': 1},
+            )
+
+        with self.subTest('return value'):
+            self.assertTupleEqual(
+                (
+                    [(1, 2), ('a', 'b')],
+                    [('x', 'Int32'), ('y', 'String')],
+                ),
+                return_value,
+            )
+
+    def test_insert(self):
+        cursor_mock = self._cursor_mock
+        cursor_mock.execute.return_value = 2
+        self._get_connection_mock.return_value = Connection()
+
+        return_value = asyncio.run(self._hook_cls().execute(
+            'INSERT INTO test VALUES',
+            [(1,), (2,)],
+        ))
+
+        cursor_mock.fetchall.assert_not_called()
+        self.assertEqual(2, return_value)
+
+    def setUp(self):
+        from airflow_clickhouse_plugin.hooks.clickhouse_async import \
+            ClickHouseAsyncHook
+
+        self._hook_cls = ClickHouseAsyncHook
+        self._connection_cls_patcher = mock.patch('asynch.Connection')
+        self._connection_cls_mock = self._connection_cls_patcher.start()
+        # Connection.cursor is a regular method returning an async context
+        self._cursor_mock = mock.Mock(
+            execute=mock.AsyncMock(),
+            fetchall=mock.AsyncMock(),
+        )
+        connection_mock = mock.MagicMock()
+        connection_mock.__aenter__.return_value = mock.Mock(**{
+            'cursor.return_value.__aenter__': mock.AsyncMock(
+                return_value=self._cursor_mock,
+            ),
+            'cursor.return_value.__aexit__': mock.AsyncMock(return_value=False),
+        })
+        self._connection_cls_mock.return_value = connection_mock
+        self._get_connection_patcher = \
+            mock.patch.object(ClickHouseAsyncHook, 'get_connection')
+        self._get_connection_mock = self._get_connection_patcher.start()
+
+    def tearDown(self):
+        self._connection_cls_patcher.stop()
+        self._get_connection_patcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import threading
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.hooks.clickhouse_batcher import InsertBatcher
+
+
+class InsertBatcherTestCase(unittest.TestCase):
+    def test_max_rows(self):
+        batcher = InsertBatcher(max_rows=3)
+        insert_mock = mock.Mock()
+        with batcher.batching():
+            batcher.add('a', [1, 2], insert_mock)
+            batcher.add('b', [10], insert_mock)
+            insert_mock.assert_not_called()
+            batcher.add('a', [3], insert_mock)
+            insert_mock.assert_called_once_with([1, 2, 3])
+            self.assertEqual(1, len(batcher))
+        insert_mock.assert_called_with([10])
+
+    def test_max_delay(self):
+        batcher = InsertBatcher()
+        insert_a_mock, insert_b_mock = mock.Mock(), mock.Mock()
+        with batcher.batching():
+            with mock.patch('time.monotonic', return_value=100):
+                batcher.add('a', [1], insert_a_mock)
+            with mock.patch('time.monotonic', return_value=104):
+                batcher.add('b', [2], insert_b_mock)
+            insert_a_mock.assert_not_called()
+            with mock.patch('time.monotonic', return_value=105):
+                batcher.add('b', [3], insert_b_mock)
+            insert_a_mock.assert_called_once_with([1])
+            insert_b_mock.assert_not_called()
+            self.assertEqual(2, len(batcher))
+
+    def test_batching(self):
+        batcher = InsertBatcher()
+        insert_a_mock, insert_b_mock = mock.Mock(), mock.Mock()
+        with batcher.batching():
+            with batcher.batching():
+                batcher.add('a', [1], insert_a_mock)
+                batcher.add('b', [2], insert_b_mock)
+            insert_a_mock.assert_not_called()  # flushed by the outermost block
+            batcher.add('a', [3], insert_b_mock)  # inserted by the first insert
+        insert_a_mock.assert_called_once_with([1, 3])
+        insert_b_mock.assert_called_once_with([2])
+        with self.subTest('outside of a block'), \
+                self.assertRaisesRegex(RuntimeError, 'batching block'):
+            batcher.add('a', [4], insert_a_mock)
+
+    def test_batching_error(self):
+        batcher = InsertBatcher()
+        insert_mock = mock.Mock()
+        with self.assertRaisesRegex(ValueError, 'test-error'), \
+                self.assertLogs(
+                    'airflow_clickhouse_plugin.hooks.clickhouse_batcher',
+                    'WARNING',
+                ):
+            with batcher.batching():
+                batcher.add('a', [1], insert_mock)
+                raise ValueError('test-error')
+        insert_mock.assert_not_called()
+        self.assertEqual(0, len(batcher))
+
+    def test_insert_error(self):
+        batcher = InsertBatcher()
+        insert_mock = mock.Mock()
+        with self.assertRaisesRegex(ValueError, 'test-error'), \
+                self.assertLogs(
+                    'airflow_clickhouse_plugin.hooks.clickhouse_batcher',
+                    'ERROR',
+                ):
+            with batcher.batching():
+                batcher.add('a', [1], mock.Mock(side_effect=ValueError('test-error')))
+                batcher.add('b', [2], insert_mock)
+        insert_mock.assert_called_once_with([2])
+
+    def test_threads(self):
+        batcher = InsertBatcher()
+        insert_mock = mock.Mock()
+        added = threading.Event()
+        errors = []
+
+        def fail():
+            try:
+                with batcher.batching():
+                    batcher.add('a', [2], insert_mock)
+                    added.wait()
+                    raise ValueError('test-error')
+            except ValueError as error:
+                errors.append(error)
+
+        thread = threading.Thread(target=fail)
+        with batcher.batching():
+            batcher.add('a', [1], insert_mock)
+            thread.start()
+            added.set()
+            thread.join()
+            with self.subTest('rows of other threads are not dropped'):
+                self.assertEqual(1, len(errors))
+                self.assertEqual(1, len(batcher))
+                insert_mock.assert_not_called()
+        with self.subTest('rows of other threads are not inserted'):
+            insert_mock.assert_called_once_with([1])
+        with self.subTest('blocks of other threads'):
+            def add():
+                try:
+                    batcher.add('a', [3], insert_mock)
+                except RuntimeError as error:
+                    errors.append(error)
+
+            thread = threading.Thread(target=add)
+            with batcher.batching():
+                thread.start()
+                thread.join()
+            self.assertIsInstance(errors[-1], RuntimeError)
+            insert_mock.assert_called_once_with([1])
+
+if __name__ == '__main__':
+    unittest.main()
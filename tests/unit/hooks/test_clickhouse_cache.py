@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import DiskTTLCache, \
+    TTLCache
+
+
+class TTLCacheTestCase(unittest.TestCase):
+    def test_ttl(self):
+        cache = TTLCache()
+        with mock.patch('time.monotonic', return_value=100):
+            cache.set('key', 'value', ttl=10)
+        with mock.patch('time.monotonic', return_value=109):
+            self.assertEqual('value', cache.get('key'))
+        with mock.patch('time.monotonic', return_value=110):
+            self.assertIsNone(cache.get('key'))
+        self.assertDictEqual({'hits': 1, 'misses': 1, 'size': 0}, cache.stats())
+
+    def test_max_size(self):
+        cache = TTLCache(max_size=2)
+        cache.set('a', 1, ttl=60)
+        cache.set('b', 2, ttl=60)
+        cache.get('a')  # makes 'b' the least recently used
+        cache.set('c', 3, ttl=60)
+        self.assertListEqual([1, None, 3], [cache.get(k) for k in 'abc'])
+        self.assertEqual(2, len(cache))
+
+    def test_invalidate(self):
+        cache = TTLCache()
+        cache.set('a', 1, ttl=60)
+        cache.set('b', 2, ttl=60)
+        cache.invalidate('a')
+        cache.invalidate('missing')
+        self.assertListEqual([None, 2], [cache.get(k) for k in 'ab'])
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+
+
+class DiskTTLCacheTestCase(unittest.TestCase):
+    def test_ttl(self):
+        with mock.patch('time.time', return_value=100):
+            self._cache.set('key', [(1, 'a')], ttl=10)
+        with mock.patch('time.time', return_value=109):
+            self.assertListEqual([(1, 'a')], self._cache.get('key'))
+        with mock.patch('time.time', return_value=110):
+            self.assertIsNone(self._cache.get('key'))
+        self.assertDictEqual(
+            {'hits': 1, 'misses': 1, 'size': 1},
+            self._cache.stats(),
+        )
+
+    def test_max_size(self):
+        self._cache.max_size = 2
+        with mock.patch('time.time', return_value=100):
+            self._cache.set('a', 1, ttl=60)
+        with mock.patch('time.time', return_value=101):
+            self._cache.set('b', 2, ttl=60)
+        with mock.patch('time.time', return_value=102):
+            self._cache.get('a')  # makes 'b' the least recently used
+        with mock.patch('time.time', return_value=103):
+            self._cache.set('c', 3, ttl=60)
+            self.assertListEqual([1, None, 3], [self._cache.get(k) for k in 'abc'])
+
+    def test_shared(self):
+        self._cache.set('a', 1, ttl=60)
+        self.assertEqual(1, DiskTTLCache(self._cache.path).get('a'))
+        self._cache.invalidate('a')
+        self.assertIsNone(DiskTTLCache(self._cache.path).get('a'))
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._cache = DiskTTLCache(os.path.join(temp_dir.name, 'cache.sqlite'))
+
+
+if __name__ == '__main__':
+    unittest.main()
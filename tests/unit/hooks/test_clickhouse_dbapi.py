@@ -1,9 +1,13 @@
 import unittest
 from unittest import mock
 
+import clickhouse_driver
 from airflow.models import Connection
 
-from airflow_clickhouse_plugin.hooks.clickhouse_dbapi import ClickHouseDbApiHook
+from airflow_clickhouse_plugin.hooks.clickhouse_dbapi import ClickHouseDbApiHook, \
+    ClickHouseDbApiConnection
+from airflow_clickhouse_plugin.hooks.clickhouse_cache import TTLCache
+from airflow_clickhouse_plugin.hooks.clickhouse_pool import ClientPool
 
 
 class ClickHouseDbApiHookTestCase(unittest.TestCase):
@@ -42,6 +46,59 @@ class ClickHouseDbApiHookTestCase(unittest.TestCase):
         self._get_connection_mock.assert_called_once_with('clickhouse_default')
         self._connect_mock.assert_called_once_with(host='localhost')
 
+    def test_use_pool(self):
+        self._get_connection_mock.return_value = Connection(host='test-host')
+        pool = ClientPool()
+        with mock.patch('clickhouse_driver.Client') as client_cls_mock, \
+                mock.patch(
+                    'airflow_clickhouse_plugin.hooks.clickhouse_dbapi.client_pool',
+                    pool,
+                ):
+            client_cls_mock.return_value.connection.is_query_executing = False
+            hook = ClickHouseDbApiHook(use_pool=True)
+            for _ in range(2):
+                conn = hook.get_conn()
+                cursor = conn.cursor()
+                conn.close()
+
+        with self.subTest('connection class'):
+            self.assertIsInstance(conn, ClickHouseDbApiConnection)
+            self._connect_mock.assert_not_called()
+
+        with self.subTest('Client.__init__'):
+            client_cls_mock.assert_called_once_with(host='test-host')
+
+        with self.subTest('Client.disconnect'):
+            client_cls_mock.return_value.disconnect.assert_not_called()
+            self.assertIs(client_cls_mock.return_value, cursor._client)
+
+    def test_connection_cache(self):
+        self._get_connection_mock.return_value = Connection(host='test-host')
+        cache = TTLCache()
+        with mock.patch('clickhouse_driver.dbapi.connection.Client') as client_cls_mock, \
+                mock.patch(
+                    'airflow_clickhouse_plugin.hooks.clickhouse.connection_cache',
+                    cache,
+                ), \
+                mock.patch(
+                    'airflow_clickhouse_plugin.hooks.clickhouse_dbapi.connection_cache',
+                    cache,
+                ):
+            client_cls_mock.return_value.execute.side_effect = \
+                clickhouse_driver.errors.ServerException('test', code=193)
+            hook = ClickHouseDbApiHook(schema='test-db', connection_cache_ttl=60)
+            hook.get_conn()
+            with self.subTest('cached'):
+                self.assertEqual(1, len(cache))
+            with self.assertRaises(clickhouse_driver.dbapi.errors.OperationalError):
+                hook.get_conn().cursor().execute('SELECT 1')
+
+        with self.subTest('connection lookup'):
+            self._get_connection_mock.assert_called_once_with('clickhouse_default')
+
+        with self.subTest('invalidated on auth failure'):
+            self.assertEqual(0, len(cache))
+
     def test_get_openlineage_database_info(self):
         hook = ClickHouseDbApiHook()
 
@@ -59,6 +116,61 @@ class ClickHouseDbApiHookTestCase(unittest.TestCase):
         self.assertEqual(ClickHouseDbApiHook().get_openlineage_default_schema(), 'default')
         self.assertEqual(ClickHouseDbApiHook(schema='mydb').get_openlineage_default_schema(), 'mydb')
 
+    def test_result_cache(self):
+        hook = ClickHouseDbApiHook(result_cache_ttl=60)
+        with mock.patch(
+                'airflow.providers.common.sql.hooks.sql.DbApiHook.get_first',
+                side_effect=[(1,), (2,)],
+        ) as get_first_mock, mock.patch(
+            'airflow_clickhouse_plugin.hooks.clickhouse_result_cache.result_cache',
+            TTLCache(),
+        ):
+            results = [
+                hook.get_first('SELECT 1'),
+                hook.get_first('SELECT 1'),
+                hook.get_first('SELECT 1', {'param': 1}),
+            ]
+        self.assertListEqual([(1,), (1,), (2,)], results)
+        self.assertEqual(2, get_first_mock.call_count)
+
+    def test_get_records_by_chunks(self):
+        self._get_connection_mock.return_value = Connection(host='test-host')
+        with mock.patch('clickhouse_driver.dbapi.connection.Client') as client_cls_mock:
+            client_mock = client_cls_mock.return_value
+            client_mock.connection.is_query_executing = False
+            client_mock.execute_iter.return_value = iter([
+                [('number', 'UInt64')],
+                *((number,) for number in range(5)),
+            ])
+            chunks = list(ClickHouseDbApiHook(max_row_buffer=100)
+                          .get_records_by_chunks('SELECT 1', chunk_size=2))
+        with self.subTest('chunks'):
+            self.assertListEqual([[(0,), (1,)], [(2,), (3,)], [(4,)]], chunks)
+        with self.subTest('execute_iter'):
+            client_mock.execute.assert_not_called()
+            self.assertEqual(
+                {'max_block_size': 100},
+                client_mock.execute_iter.call_args.kwargs['settings'],
+            )
+        with self.subTest('connection is closed'):
+            client_mock.disconnect.assert_called_once_with()
+
+    def test_partially_consumed_stream(self):
+        self._get_connection_mock.return_value = Connection(host='test-host')
+        with mock.patch('clickhouse_driver.dbapi.connection.Client') as client_cls_mock:
+            client_mock = client_cls_mock.return_value
+            client_mock.execute_iter.side_effect = lambda *args, **kwargs: iter([
+                [('number', 'UInt64')], (1,), (2,),
+            ])
+            client_mock.connection.is_query_executing = False
+            cursor = ClickHouseDbApiHook(stream_results=True).get_conn().cursor()
+            cursor.execute('SELECT 1')
+            self.assertEqual((1,), cursor.fetchone())
+            client_mock.connection.is_query_executing = True
+            cursor.execute('SELECT 2')
+        client_mock.disconnect.assert_called_once_with()
+        self.assertEqual(2, client_mock.execute_iter.call_count)
+
     def setUp(self) -> None:
         self._get_connection_patcher = \
             mock.patch.object(ClickHouseDbApiHook, 'get_connection')
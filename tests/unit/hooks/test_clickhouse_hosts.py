@@ -0,0 +1,154 @@
+import socket
+import unittest
+from unittest import mock
+
+from airflow.models import Connection
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook
+from airflow_clickhouse_plugin.hooks.clickhouse_dbapi import ClickHouseDbApiHook
+from airflow_clickhouse_plugin.hooks.clickhouse_hosts import HostHealth, \
+    parse_hosts, select_host
+
+
+class HostHealthTestCase(unittest.TestCase):
+    def test_in_order(self):
+        first, second = _serve(self), _serve(self)
+        for _ in range(2):
+            self.assertListEqual(
+                [first, second],
+                self._health.select([first, second], 'in_order'),
+            )
+
+    def test_round_robin(self):
+        hosts = [_serve(self) for _ in range(3)]
+        selected = [
+            self._health.select(hosts, 'round_robin')[0] for _ in range(4)
+        ]
+        self.assertListEqual(hosts + hosts[:1], selected)
+
+    def test_random(self):
+        hosts = [_serve(self) for _ in range(3)]
+        with mock.patch('random.sample', side_effect=lambda hosts, k: hosts[::-1]):
+            self.assertListEqual(hosts[::-1], self._health.select(hosts, 'random'))
+
+    def test_least_latency(self):
+        fast, slow = _serve(self), _serve(self)
+        self._health.mark_success(fast, 0.001)
+        self._health.mark_success(slow, 0.1)
+        self.assertListEqual([fast, slow], self._health.select([slow, fast], 'least_latency'))
+
+    def test_unknown_policy(self):
+        with self.assertRaisesRegex(ValueError, 'test-policy'):
+            self._health.select([_serve(self)], 'test-policy')
+
+    def test_failover(self):
+        down, up = _unreachable(), _serve(self)
+        with self.subTest('unreachable host is skipped'):
+            self.assertListEqual([up, down], self._health.select([down, up]))
+        with self.subTest('unreachable host is not checked during backoff'):
+            with mock.patch('socket.create_connection') as connect_mock:
+                self.assertListEqual([up, down], self._health.select([down, up]))
+            connect_mock.assert_not_called()
+
+    def test_backoff(self):
+        host = _unreachable()
+        self._health.base_backoff = 2
+        self._health.max_backoff = 5
+        retries_at = []
+        with mock.patch('time.monotonic', return_value=100):
+            for _ in range(4):
+                self._health.mark_failure(host)
+                retries_at.append(self._health._states[host].retry_at)
+        self.assertListEqual([102, 104, 105, 105], retries_at)
+        with self.subTest('reset on success'):
+            self._health.mark_success(host, 0.01)
+            self.assertEqual(0, self._health._states[host].failures)
+
+    def test_all_unreachable(self):
+        hosts = [_unreachable(), _unreachable()]
+        self.assertListEqual(hosts, self._health.select(hosts))
+
+    def test_check_interval(self):
+        host = _serve(self)
+        self._health.select([host])
+        with mock.patch('socket.create_connection') as connect_mock:
+            self._health.select([host])
+        connect_mock.assert_not_called()
+
+    def setUp(self):
+        self._health = HostHealth()
+
+
+class ParseHostsTestCase(unittest.TestCase):
+    def test(self):
+        self.assertListEqual(
+            [('a', 9000), ('b', 9001), ('::1', 9002), ('fe80::1', 9000)],
+            parse_hosts('a, b:9001,[::1]:9002,fe80::1,', 9000),
+        )
+        self.assertListEqual([('a', 9440)], parse_hosts(['a'], 9440))
+
+
+class SelectHostTestCase(unittest.TestCase):
+    def test_no_hosts(self):
+        connection_kwargs = {'host': 'test-host'}
+        self.assertIs(connection_kwargs, select_host(connection_kwargs))
+
+    def test_host_selection_without_hosts(self):
+        connection_kwargs = {'host': 'test-host', 'host_selection': 'random'}
+        self.assertDictEqual({'host': 'test-host'}, select_host(connection_kwargs))
+        # the input is not modified
+        self.assertIn('host_selection', connection_kwargs)
+
+    def test_hook(self):
+        (_, down_port), (_, up_port) = _unreachable(), _serve(self)
+        connection = Connection(
+            host='ignored-host',
+            port=up_port,
+            extra={
+                'hosts': f'127.0.0.1:{down_port},127.0.0.1',
+                'host_selection': 'in_order',
+            },
+        )
+        expected_kwargs = {
+            'host': '127.0.0.1',
+            'port': up_port,
+            'alt_hosts': f'127.0.0.1:{down_port}',
+        }
+        with self.subTest('ClickHouseHook'), \
+                mock.patch('clickhouse_driver.Client') as client_cls_mock, \
+                mock.patch.object(ClickHouseHook, 'get_connection', return_value=connection):
+            ClickHouseHook().get_conn()
+            client_cls_mock.assert_called_once_with(**expected_kwargs)
+        with self.subTest('ClickHouseDbApiHook'), \
+                mock.patch('clickhouse_driver.dbapi.connect') as connect_mock, \
+                mock.patch.object(ClickHouseDbApiHook, 'get_connection', return_value=connection):
+            ClickHouseDbApiHook().get_conn()
+            connect_mock.assert_called_once_with(**expected_kwargs)
+
+    def setUp(self):
+        health_patcher = mock.patch(
+            'airflow_clickhouse_plugin.hooks.clickhouse_hosts.host_health',
+            HostHealth(),
+        )
+        health_patcher.start()
+        self.addCleanup(health_patcher.stop)
+
+
+def _serve(test_case: unittest.TestCase):
+    """ Starts a fake server which accepts TCP connections. """
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    test_case.addCleanup(server.close)
+    return server.getsockname()
+
+
+def _unreachable():
+    """ Returns an address of a closed port. """
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        return server.getsockname()
+
+
+if __name__ == '__main__':
+    unittest.main()
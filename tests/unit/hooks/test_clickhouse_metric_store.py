@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.hooks.clickhouse_metric_store import MetricStore
+
+
+class MetricStoreTestCase(unittest.TestCase):
+    def test_fingerprint(self):
+        key = ['test-conn-id', None, 'db.events', 'count()', '2024-01-01']
+        self._store.set(key, [2, 100, '2024-01-02 00:00:00'], 100)
+        with self.subTest('valid'):
+            self.assertEqual(
+                100,
+                self._store.get(key, [2, 100, '2024-01-02 00:00:00']),
+            )
+        with self.subTest('parts changed'):
+            self.assertIsNone(self._store.get(key, [3, 110, '2024-01-03 00:00:00']))
+        with self.subTest('missing'):
+            self.assertIsNone(self._store.get(key[:-1] + ['2024-01-02'], [0, 0, '']))
+
+    def test_get_fingerprint(self):
+        hook_mock = mock.Mock()
+        hook_mock.run.return_value = (2, 100, '2024-01-02 00:00:00')
+        self.assertListEqual(
+            [2, 100, '2024-01-02 00:00:00'],
+            MetricStore.get_fingerprint(hook_mock, 'db.events', '2024-01-01'),
+        )
+        sql = hook_mock.run.call_args.args[0]
+        self.assertIn('FROM system.parts', sql)
+        self.assertDictEqual(
+            {'database': 'db', 'table': 'events', 'date': '2024-01-01'},
+            hook_mock.run.call_args.kwargs['parameters'],
+        )
+        MetricStore.get_fingerprint(hook_mock, 'events', '2024-01-01')
+        self.assertEqual('', hook_mock.run.call_args.kwargs['parameters']['database'])
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._store = MetricStore(os.path.join(temp_dir.name, 'metrics.sqlite'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.hooks.clickhouse_pool import ClientPool
+
+
+class ClientPoolTestCase(unittest.TestCase):
+    def test_reuse(self):
+        pool = ClientPool()
+        client = pool.acquire({'host': 'test-host'})
+        pool.release(client)
+        with self.subTest('same kwargs'):
+            self.assertIs(client, pool.acquire({'host': 'test-host'}))
+        with self.subTest('Client.__init__'):
+            self._client_cls_mock.assert_called_once_with(host='test-host')
+        with self.subTest('different kwargs'):
+            pool.release(client)
+            self.assertIsNot(client, pool.acquire({'host': 'other-host'}))
+        with self.subTest('not disconnected'):
+            client.disconnect.assert_not_called()
+
+    def test_max_size(self):
+        pool = ClientPool(max_size=1)
+        first, second = pool.acquire({}), pool.acquire({})
+        self.assertIsNot(first, second)
+        pool.release(first)
+        pool.release(second)
+        with self.subTest('released above max_size'):
+            first.disconnect.assert_not_called()
+            second.disconnect.assert_called_once_with()
+        with self.subTest('reused'):
+            self.assertIs(first, pool.acquire({}))
+
+    def test_partially_consumed(self):
+        pool = ClientPool()
+        client = pool.acquire({})
+        client.connection.is_query_executing = True
+        pool.release(client)
+        client.disconnect.assert_called_once_with()
+        self.assertIsNot(client, pool.acquire({}))
+
+    def test_idle_timeout(self):
+        pool = ClientPool(idle_timeout=10)
+        with mock.patch('time.monotonic', return_value=100):
+            client = pool.acquire({})
+            pool.release(client)
+        with mock.patch('time.monotonic', return_value=111):
+            pool.evict_idle()
+        client.disconnect.assert_called_once_with()
+        self.assertIsNot(client, pool.acquire({}))
+
+    def test_health_check(self):
+        pool = ClientPool(health_check_interval=10)
+        with mock.patch('time.monotonic', return_value=100):
+            client = pool.acquire({})
+            pool.release(client)
+        client.connection.connected = True
+        client.connection.ping.return_value = False
+        with self.subTest('recently released'):
+            with mock.patch('time.monotonic', return_value=105):
+                self.assertIs(client, pool.acquire({}))
+                pool.release(client)
+            client.connection.ping.assert_not_called()
+        with self.subTest('idle for too long'):
+            with mock.patch('time.monotonic', return_value=120):
+                self.assertIs(client, pool.acquire({}))
+            client.connection.ping.assert_called_once_with()
+            client.disconnect.assert_called_once_with()
+
+    def test_borrow(self):
+        pool = ClientPool()
+        with self.subTest('success'):
+            with pool.borrow({}) as client:
+                pass
+            client.disconnect.assert_not_called()
+            self.assertIs(client, pool.acquire({}))
+            pool.release(client)
+        with self.subTest('failure'):
+            with self.assertRaises(ValueError):
+                with pool.borrow({}) as client:
+                    raise ValueError
+            client.disconnect.assert_called_once_with()
+            self.assertIsNot(client, pool.acquire({}))
+
+    def test_fork(self):
+        pool = ClientPool()
+        client = pool.acquire({})
+        pool.release(client)
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertIsNot(client, pool.acquire({}))
+        client.disconnect.assert_not_called()
+
+    def test_clear(self):
+        pool = ClientPool()
+        client = pool.acquire({})
+        pool.release(client)
+        pool.clear()
+        client.disconnect.assert_called_once_with()
+        self.assertIsNot(client, pool.acquire({}))
+
+    def setUp(self):
+        self._client_cls_patcher = mock.patch('clickhouse_driver.Client')
+        self._client_cls_mock = self._client_cls_patcher.start()
+        # every Client.__init__ call creates a new client
+        self._client_cls_mock.side_effect = lambda **kwargs: mock.Mock(
+            connection=mock.Mock(is_query_executing=False),
+        )
+
+    def tearDown(self):
+        self._client_cls_patcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
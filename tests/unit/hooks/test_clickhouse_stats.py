@@ -0,0 +1,173 @@
+import types
+import unittest
+from unittest import mock
+
+from airflow.models import Connection
+from clickhouse_driver.protocol import ServerPacketTypes
+from clickhouse_driver.result import QueryInfo
+
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook
+from airflow_clickhouse_plugin.hooks.clickhouse_stats import \
+    emit_query_stats, format_bytes, format_query_stats, get_query_stats, \
+    track_profile_events
+
+
+class QueryStatsTestCase(unittest.TestCase):
+    def test_profile_events(self):
+        packets = iter([
+            _profile_events_packet([
+                ('increment', 'SelectedRows', 10),
+                ('gauge', 'MemoryTrackerPeakUsage', 2048),
+            ]),
+            _profile_events_packet([
+                ('increment', 'SelectedRows', 5),
+                ('gauge', 'MemoryTrackerPeakUsage', 1024),
+            ]),
+            types.SimpleNamespace(type=ServerPacketTypes.END_OF_STREAM),
+        ])
+        client = mock.Mock(last_query=None)
+        client.connection.receive_packet.side_effect = lambda: next(packets)
+        track_profile_events(client)
+        track_profile_events(client)  # the connection is wrapped once
+        for _ in range(3):
+            client.connection.receive_packet()
+        stats = get_query_stats(client, 'test-query-id')
+        self.assertDictEqual(
+            {
+                'query_id': 'test-query-id',
+                'memory_usage': 2048,
+                'profile_events': {
+                    'SelectedRows': 15,
+                    'MemoryTrackerPeakUsage': 2048,
+                },
+            },
+            stats,
+        )
+        with self.subTest('events are reset'):
+            self.assertDictEqual({}, get_query_stats(client)['profile_events'])
+
+    def test_last_query(self):
+        last_query = QueryInfo()
+        last_query.progress.rows = 100
+        last_query.progress.bytes = 4096
+        last_query.progress.elapsed_ns = 250_000_000
+        last_query.profile_info.rows = 1
+        last_query.store_elapsed(0.5)
+        client = mock.Mock(last_query=last_query)
+        stats = get_query_stats(client)
+        with self.subTest('stats'):
+            self.assertDictEqual(
+                {
+                    'query_id': None,
+                    'elapsed': 0.5,
+                    'server_elapsed': 0.25,
+                    'rows_read': 100,
+                    'bytes_read': 4096,
+                    'total_rows_to_read': 0,
+                    'written_rows': 0,
+                    'written_bytes': 0,
+                    'result_rows': 1,
+                    'result_bytes': 0,
+                },
+                stats,
+            )
+        with self.subTest('elapsed override'):
+            self.assertEqual(2.0, get_query_stats(client, elapsed=2)['elapsed'])
+        with self.subTest('format'):
+            self.assertEqual(
+                '0.500 s, read 100 rows (4.0 KiB), result 1 rows',
+                format_query_stats(stats),
+            )
+
+    def test_format_bytes(self):
+        for size, expected in [
+            (0, '0 B'),
+            (1023, '1023 B'),
+            (1536, '1.5 KiB'),
+            (3 * 1024 ** 3, '3.0 GiB'),
+            (2 * 1024 ** 4, '2.0 TiB'),
+        ]:
+            with self.subTest(size):
+                self.assertEqual(expected, format_bytes(size))
+
+    def test_emit(self):
+        stats = {
+            'elapsed': 0.5, 'rows_read': 100, 'bytes_read': 4096,
+            'written_rows': 0, 'written_bytes': 0, 'result_rows': 1,
+            'memory_usage': 2048,
+        }
+        tags = {'conn_id': 'test-conn-id'}
+        with mock.patch('airflow.stats.Stats') as stats_mock:
+            emit_query_stats(stats, tags)
+        stats_mock.incr.assert_any_call('clickhouse.queries', tags=tags)
+        stats_mock.incr.assert_any_call(
+            'clickhouse.query.rows_read', count=100, tags=tags,
+        )
+        stats_mock.timing.assert_called_once_with(
+            'clickhouse.query.duration', 500, tags=tags,
+        )
+        stats_mock.gauge.assert_called_once_with(
+            'clickhouse.query.memory_usage', 2048, tags=tags,
+        )
+
+    def test_emit_untagged(self):
+        class LegacyStatsLogger:  # Airflow < 2.6 API
+            calls = []
+
+            def incr(self, stat, count=1, rate=1):
+                self.calls.append((stat, count))
+
+            def timing(self, stat, dt):
+                self.calls.append((stat, dt))
+
+        stats = {
+            'elapsed': 0.5, 'rows_read': 100, 'bytes_read': 4096,
+            'written_rows': 0, 'written_bytes': 0, 'result_rows': 1,
+        }
+        with mock.patch('airflow.stats.Stats', LegacyStatsLogger()):
+            emit_query_stats(stats, {'conn_id': 'test-conn-id'})
+        self.assertIn(('clickhouse.queries', 1), LegacyStatsLogger.calls)
+        self.assertIn(('clickhouse.query.duration', 500), LegacyStatsLogger.calls)
+        self.assertIn(('clickhouse.query.rows_read', 100), LegacyStatsLogger.calls)
+
+
+class ClickHouseHookQueryStatsTestCase(unittest.TestCase):
+    def test(self):
+        with mock.patch('clickhouse_driver.Client') as client_cls_mock, \
+                mock.patch.object(
+                    ClickHouseHook, 'get_connection', return_value=Connection(),
+                ), \
+                mock.patch('airflow.stats.Stats') as stats_mock:
+            client_cls_mock.return_value.last_query = QueryInfo()
+            hook = ClickHouseHook(metrics_tags={'dag_id': 'test-dag-id'})
+            hook.execute(['SELECT 1', 'SELECT 2'], query_id='test-query-id')
+            list(hook.execute_iter('SELECT 3'))
+        with self.subTest('query_stats'):
+            self.assertListEqual(
+                ['test-query-id', 'test-query-id', None],
+                [stats['query_id'] for stats in hook.query_stats],
+            )
+        with self.subTest('metrics'):
+            stats_mock.incr.assert_any_call(
+                'clickhouse.queries',
+                tags={'dag_id': 'test-dag-id', 'conn_id': 'clickhouse_default'},
+            )
+
+
+def _profile_events_packet(events):
+    block = mock.Mock(
+        columns_with_types=[
+            ('host_name', 'String'), ('current_time', 'DateTime'),
+            ('thread_id', 'UInt64'), ('type', 'Enum8'), ('name', 'String'),
+            ('value', 'Int64'),
+        ],
+        **{'get_rows.return_value': [
+            ('test-host', None, 0, type_, name, value)
+            for type_, name, value in events
+        ]},
+    )
+    return types.SimpleNamespace(type=ServerPacketTypes.PROFILE_EVENTS, block=block)
+
+
+if __name__ == '__main__':
+    unittest.main()
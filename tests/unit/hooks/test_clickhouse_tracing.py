@@ -0,0 +1,60 @@
+import contextlib
+import unittest
+from unittest import mock
+
+from airflow.models import Connection
+
+from airflow_clickhouse_plugin.hooks import clickhouse_tracing
+from airflow_clickhouse_plugin.hooks.clickhouse import ClickHouseHook
+
+
+class TracingTestCase(unittest.TestCase):
+    def test_disabled(self):
+        with mock.patch('airflow.configuration.conf.getboolean', return_value=False):
+            clickhouse_tracing._get_trace.cache_clear()
+            self.addCleanup(clickhouse_tracing._get_trace.cache_clear)
+            self.assertFalse(clickhouse_tracing.is_tracing_enabled())
+            self.assertIsInstance(
+                clickhouse_tracing.span('test-span'),
+                contextlib.nullcontext,
+            )
+
+    def test_hook(self):
+        trace_mock = mock.MagicMock()
+        span_mock = trace_mock.start_span.return_value.__enter__.return_value
+        with mock.patch.object(
+                clickhouse_tracing, '_get_trace', return_value=trace_mock,
+        ), mock.patch('clickhouse_driver.Client') as client_cls_mock, \
+                mock.patch.object(
+                    ClickHouseHook, 'get_connection', return_value=Connection(),
+                ), \
+                mock.patch('opentelemetry.trace.get_current_span') as current_span_mock:
+            client_mock = client_cls_mock.return_value
+            client_mock.connection.connected = False
+            client_mock.last_query.progress.rows = 10
+            ClickHouseHook().execute('SELECT 1', query_id='test-query-id')
+        with self.subTest('spans'):
+            self.assertListEqual(
+                [
+                    'clickhouse.get_connection',
+                    'clickhouse.connect',
+                    'clickhouse.execute',
+                ],
+                [
+                    call.kwargs['span_name']
+                    for call in trace_mock.start_span.call_args_list
+                ],
+            )
+            span_mock.set_attributes.assert_any_call({
+                'db.system': 'clickhouse',
+                'clickhouse.query_id': 'test-query-id',
+            })
+        with self.subTest('client connects within the span'):
+            client_mock.connection.force_connect.assert_called_once_with()
+        with self.subTest('query stats'):
+            attributes, = current_span_mock.return_value.set_attributes.call_args.args
+            self.assertEqual(10, attributes['clickhouse.rows_read'])
+
+
+if __name__ == '__main__':
+    unittest.main()
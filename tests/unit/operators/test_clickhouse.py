@@ -1,6 +1,13 @@
+import gzip
+import json
+import os
+import tempfile
 import unittest
 from unittest import mock
 
+from airflow import AirflowException
+from airflow.exceptions import TaskDeferred
+
 from airflow_clickhouse_plugin.operators.clickhouse import \
     ClickHouseOperator
 
@@ -35,6 +42,8 @@ class ClickHouseOperatorTestCase(unittest.TestCase):
                 {'test-setting': 1},
                 True,
                 True,
+                parallelism=1,
+                error_policy='fail_fast',
             )
         with self.subTest('return value'):
             self.assertIs(
@@ -62,14 +71,256 @@ class ClickHouseOperatorTestCase(unittest.TestCase):
                 None,
                 False,
                 False,
+                parallelism=1,
+                error_policy='fail_fast',
             )
 
+    def test_hook_params(self):
+        ClickHouseOperator(
+            task_id='test5',  # required by Airflow
+            sql='SELECT 5',
+            hook_params={'use_pool': True},
+        ).execute(context={})
+        self._hook_cls_mock.assert_called_once_with(
+            clickhouse_conn_id='clickhouse_default',
+            database=None,
+            use_pool=True,
+        )
+
+    def test_async_insert(self):
+        ClickHouseOperator(
+            task_id='test12',  # required by Airflow
+            sql='INSERT INTO test12 VALUES',
+            parameters=[(12,)],
+            settings={'wait_for_async_insert': 1},
+            async_insert='fire_and_forget',
+        ).execute(context={})
+        self.assertDictEqual(
+            {
+                'async_insert': 1,
+                'wait_for_async_insert': 1,
+                'async_insert_busy_timeout_ms': 1000,
+            },
+            self._hook_cls_mock.return_value.execute.call_args.args[5],
+        )
+
+    def test_emit_metrics(self):
+        operator = ClickHouseOperator(
+            task_id='test11',  # required by Airflow
+            sql='SELECT 11',
+            hook_params={'use_pool': True},
+            emit_metrics=True,
+        )
+        operator.execute(context={})
+        self._hook_cls_mock.assert_called_once_with(
+            clickhouse_conn_id='clickhouse_default',
+            database=None,
+            use_pool=True,
+            metrics_tags={'dag_id': operator.dag_id, 'task_id': 'test11'},
+        )
+
+    def test_sink(self):
+        sink_mock = mock.Mock()
+        execute_iter_mock = self._hook_cls_mock.return_value.execute_iter
+        return_value = ClickHouseOperator(
+            task_id='test3',  # required by Airflow
+            sql='SELECT 3',
+            parameters={'test-param': 3},
+            with_column_types=True,
+            settings={'max_block_size': 3},
+            sink=sink_mock,
+            chunk_size=100,
+        ).execute(context={})
+        with self.subTest('ClickHouseHook.execute_iter'):
+            execute_iter_mock.assert_called_once_with(
+                'SELECT 3',
+                {'test-param': 3},
+                True,
+                None,
+                None,
+                {'max_block_size': 3},
+                False,
+                100,
+            )
+        with self.subTest('ClickHouseHook.execute'):
+            self._hook_cls_mock.return_value.execute.assert_not_called()
+        with self.subTest('sink'):
+            sink_mock.assert_called_once_with(execute_iter_mock.return_value)
+        with self.subTest('return value'):
+            self.assertIs(return_value, sink_mock.return_value)
+
+    def test_sink_stops_early(self):
+        rows = _generator([(number,) for number in range(10)])
+        self._execute_iter_mock.return_value = rows
+        return_value = ClickHouseOperator(
+            task_id='test12',  # required by Airflow
+            sql='SELECT number FROM numbers(10)',
+            sink=next,
+        ).execute(context={})
+        self.assertEqual((0,), return_value)
+        with self.subTest('streaming is stopped'):
+            self.assertIsNone(rows.gi_frame)
+
+    def test_sink_columnar(self):
+        with self.assertRaisesRegex(ValueError, 'columnar'):
+            ClickHouseOperator(
+                task_id='test4',  # required by Airflow
+                sql='SELECT 4',
+                columnar=True,
+                sink=list,
+            )
+
+    def test_deferrable(self):
+        operator = ClickHouseOperator(
+            task_id='test6',  # required by Airflow
+            sql='SELECT 6',
+            settings={'test-setting': 6},
+            clickhouse_conn_id='test-conn-id',
+            deferrable=True,
+        )
+        with self.assertRaises(TaskDeferred) as deferred:
+            operator.execute(context={})
+        with self.subTest('ClickHouseHook.execute'):
+            self._hook_cls_mock.return_value.execute.assert_not_called()
+        with self.subTest('trigger'):
+            self.assertEqual('execute_complete', deferred.exception.method_name)
+            _, trigger_kwargs = deferred.exception.trigger.serialize()
+            self.assertEqual('SELECT 6', trigger_kwargs['sql'])
+            self.assertEqual({'test-setting': 6}, trigger_kwargs['settings'])
+            self.assertEqual('test-conn-id', trigger_kwargs['clickhouse_conn_id'])
+            self.assertIsNone(trigger_kwargs['poke_interval'])
+        with self.subTest('execute_complete'):
+            self.assertEqual([(6,)], operator.execute_complete(
+                context={},
+                event={'status': 'success', 'result': [(6,)]},
+            ))
+        with self.subTest('execute_complete error'):
+            with self.assertRaisesRegex(AirflowException, 'test-error'):
+                operator.execute_complete(
+                    context={},
+                    event={'status': 'error', 'message': 'test-error'},
+                )
+
+    def test_result_mode(self):
+        columns = [('id', 'UInt64'), ('name', 'String')]
+        rows = [(1, 'a'), (2, 'b'), (3, 'c')]
+        expected = {
+            'none': None,
+            'first': [(1, 'a'), (2, 'b')],
+            'scalar': 1,
+        }
+        for result_mode, expected_result in expected.items():
+            with self.subTest(result_mode):
+                self._execute_iter_mock.return_value = _generator([columns, *rows])
+                result = ClickHouseOperator(
+                    task_id='test7',  # required by Airflow
+                    sql='SELECT 7',
+                    result_mode=result_mode,
+                    result_rows=2,
+                ).execute(context={})
+                self.assertEqual(expected_result, result)
+                self._hook_cls_mock.return_value.execute.assert_not_called()
+        with self.subTest('first with_column_types columnar'):
+            self._execute_iter_mock.return_value = _generator([columns, *rows])
+            result = ClickHouseOperator(
+                task_id='test7',  # required by Airflow
+                sql='SELECT 7',
+                with_column_types=True,
+                columnar=True,
+                result_mode='first',
+                result_rows=2,
+            ).execute(context={})
+            self.assertEqual(([(1, 2), ('a', 'b')], columns), result)
+        with self.subTest('stats'):
+            self._execute_iter_mock.return_value = _generator([columns, *rows])
+            result = ClickHouseOperator(
+                task_id='test7',  # required by Airflow
+                sql='SELECT 7',
+                result_mode='stats',
+            ).execute(context={})
+            self.assertEqual(3, result['rows'])
+            self.assertGreater(result['bytes'], 0)
+            self.assertEqual(columns, result['columns'])
+
+    def test_result_mode_no_result(self):
+        # e.g. DDL or INSERT ... SELECT
+        expected = {
+            'none': None,
+            'first': [],
+            'scalar': None,
+            'stats': {'rows': 0, 'bytes': 0, 'columns': []},
+        }
+        for result_mode, expected_result in expected.items():
+            with self.subTest(result_mode):
+                self._execute_iter_mock.return_value = _generator([])
+                result = ClickHouseOperator(
+                    task_id='test11',  # required by Airflow
+                    sql='CREATE TABLE test (id UInt64) ENGINE = Log',
+                    result_mode=result_mode,
+                ).execute(context={})
+                if result_mode == 'stats':
+                    result = {key: result[key] for key in expected_result}
+                self.assertEqual(expected_result, result)
+        with self.subTest('spill'), tempfile.TemporaryDirectory() as temp_dir:
+            self._execute_iter_mock.return_value = _generator([])
+            path = os.path.join(temp_dir, 'rows.jsonl.gz')
+            result = ClickHouseOperator(
+                task_id='test11',  # required by Airflow
+                sql='CREATE TABLE test (id UInt64) ENGINE = Log',
+                result_mode='spill',
+                result_path=path,
+            ).execute(context={})
+            self.assertEqual(0, result['rows'])
+            with gzip.open(path, 'rt') as file:
+                self.assertListEqual([[]], [json.loads(line) for line in file])
+
+    def test_result_mode_spill(self):
+        self._execute_iter_mock.return_value = _generator(
+            [[('id', 'UInt64'), ('name', 'String')], (1, 'a'), (2, 'b')],
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'result', 'rows.jsonl.gz')
+            result = ClickHouseOperator(
+                task_id='test8',  # required by Airflow
+                sql='SELECT 8',
+                result_mode='spill',
+                result_path=path,
+            ).execute(context={})
+            with gzip.open(path, 'rt') as file:
+                lines = [json.loads(line) for line in file]
+        self.assertListEqual([['id', 'name'], [1, 'a'], [2, 'b']], lines)
+        self.assertEqual(path, result['path'])
+        self.assertEqual(2, result['rows'])
+
+    def test_max_result_bytes(self):
+        rows = _generator([[('name', 'String')]] + [('x' * 100,)] * 10)
+        self._execute_iter_mock.return_value = rows
+        with self.assertRaisesRegex(AirflowException, 'max_result_bytes=500'):
+            ClickHouseOperator(
+                task_id='test9',  # required by Airflow
+                sql='SELECT 9',
+                max_result_bytes=500,
+            ).execute(context={})
+        with self.subTest('streaming is stopped'):
+            self.assertIsNone(rows.gi_frame)
+
+    def test_result_mode_insert(self):
+        operator = ClickHouseOperator(
+            task_id='test10',  # required by Airflow
+            sql='INSERT INTO test VALUES',
+            parameters=[(1,)],
+            result_mode='none',
+        )
+        self.assertIsNone(operator.execute(context={}))
+        self._hook_cls_mock.return_value.execute.assert_called_once()
+
     def setUp(self):
         self._hook_cls_patcher = mock.patch('.'.join((
             'airflow_clickhouse_plugin.operators',
             'clickhouse.ClickHouseHook',
         )))
         self._hook_cls_mock = self._hook_cls_patcher.start()
+        self._execute_iter_mock = self._hook_cls_mock.return_value.execute_iter
 
     def tearDown(self):
         self._hook_cls_patcher.stop()
@@ -85,10 +336,16 @@ class ClickHouseOperatorClassTestCase(unittest.TestCase):
                 '_query_id',
                 '_settings',
                 '_database',
+                '_result_path',
             },
             frozenset(ClickHouseOperator.template_fields),
         )
 
 
+def _generator(items: list):
+    # ClickHouseHook.execute_iter returns a generator
+    yield from items
+
+
 if __name__ == '__main__':
     unittest.main()
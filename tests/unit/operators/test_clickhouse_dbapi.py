@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
 from unittest import mock
 
+from airflow.exceptions import AirflowException
+
 from airflow_clickhouse_plugin.operators.clickhouse_dbapi import (
     ClickHouseBaseDbApiOperator,
     ClickHouseBranchSQLOperator,
@@ -70,6 +74,36 @@ class ClickHouseSQLExecuteQueryOperatorTestCase(unittest.TestCase):
                 self.assertEqual(kwargs[name], value)
 
 
+    def test_max_rows(self):
+        with mock.patch('.'.join((
+            'airflow_clickhouse_plugin.operators',
+            'clickhouse_dbapi.ClickHouseDbApiHook',
+        ))) as hook_cls_mock:
+            operator = ClickHouseSQLExecuteQueryOperator(
+                task_id='test-max-rows',  # required by Airflow
+                sql='SELECT number FROM system.numbers',
+                max_rows=2,
+            )
+            operator.get_db_hook()
+        with self.subTest('results are streamed'):
+            hook_cls_mock.assert_called_once_with(schema=None, stream_results=True)
+        with self.subTest('handler'):
+            cursor_mock = mock.Mock()
+            self.assertIs(
+                cursor_mock.fetchmany.return_value,
+                operator.handler(cursor_mock),
+            )
+            cursor_mock.fetchmany.assert_called_once_with(2)
+        with self.subTest('handler is not supported'):
+            with self.assertRaisesRegex(ValueError, 'handler is not supported'):
+                ClickHouseSQLExecuteQueryOperator(
+                    task_id='test-max-rows-handler',  # required by Airflow
+                    sql='SELECT 1',
+                    max_rows=2,
+                    handler=list,
+                )
+
+
 class ClickHouseSQLColumnCheckOperatorTestCase(unittest.TestCase):
     def test_init_arguments(self):
         with mock.patch(
@@ -89,6 +123,52 @@ class ClickHouseSQLColumnCheckOperatorTestCase(unittest.TestCase):
                 self.assertEqual(kwargs[name], value)
 
 
+    def test_single_pass(self):
+        operator = ClickHouseSQLColumnCheckOperator(
+            task_id='test-single-pass',  # required by Airflow
+            table='test_table',
+            column_mapping={
+                'col1': {
+                    'null_check': {'equal_to': 0, 'partition_clause': 'id > 10'},
+                    'distinct_check': {'geq_to': 2},
+                },
+                'col2': {'median': {'less_than': 5}},
+            },
+            partition_clause="date = '2024-01-01'",
+            sample=0.1,
+            approximate=True,
+        )
+        with mock.patch.object(operator, 'get_db_hook') as get_db_hook_mock:
+            get_first_mock = get_db_hook_mock.return_value.get_first
+            get_first_mock.return_value = (0, 3, 4.5)
+            operator.execute(context={})
+            with self.subTest('query'):
+                get_first_mock.assert_called_once_with(
+                    'SELECT sumIf(isNull(col1), id > 10) * any(_sample_factor),'
+                    ' uniq(col1), quantileTDigest(0.5)(col2)'
+                    " FROM test_table SAMPLE 0.1 WHERE (date = '2024-01-01')"
+                )
+            with self.subTest('failure'):
+                get_first_mock.return_value = (1, 3, 4.5)
+                with self.assertRaisesRegex(AirflowException, 'Check: null_check'):
+                    operator.execute(context={})
+
+    def test_pruning(self):
+        operator = ClickHouseSQLColumnCheckOperator(
+            task_id='test-pruning',  # required by Airflow
+            table='test_table',
+            column_mapping={'col1': {
+                'min': {'geq_to': 0, 'partition_clause': 'id = 1'},
+                'max': {'leq_to': 9, 'partition_clause': 'id = 2'},
+            }},
+        )
+        self.assertEqual(
+            'SELECT minIf(col1, id = 1), maxIf(col1, id = 2) FROM test_table'
+            ' WHERE ((id = 1) OR (id = 2))',
+            operator._generate_single_pass_query([('col1', 'min'), ('col1', 'max')]),
+        )
+
+
 class ClickHouseSQLTableCheckOperatorTestCase(unittest.TestCase):
     def test_init_arguments(self):
         with mock.patch(
@@ -106,6 +186,65 @@ class ClickHouseSQLTableCheckOperatorTestCase(unittest.TestCase):
             for name, value in params.items():
                 self.assertEqual(kwargs[name], value)
 
+    def test_single_pass(self):
+        operator = ClickHouseSQLTableCheckOperator(
+            task_id='test-single-pass',  # required by Airflow
+            table='test_table',
+            checks={
+                'row_count_check': {'check_statement': 'COUNT(*) = 1000'},
+                'row_check': {'check_statement': 'col_a + col_b < col_c'},
+                'partition_check': {
+                    'check_statement': 'col_a > 0',
+                    'partition_clause': 'id > 0',
+                },
+                'partition_count_check': {
+                    'check_statement': 'count() > 0',
+                    'partition_clause': 'id > 0',
+                },
+            },
+        )
+        with mock.patch.object(operator, 'get_db_hook') as get_db_hook_mock:
+            get_first_mock = get_db_hook_mock.return_value.get_first
+            get_first_mock.return_value = (1, 1, 1, 1)
+            operator.execute(context={})
+            with self.subTest('query'):
+                get_first_mock.assert_called_once_with(
+                    'SELECT toUInt8(COUNT(*) = 1000),'
+                    ' min(toUInt8(col_a + col_b < col_c)),'
+                    ' minIf(toUInt8(col_a > 0), id > 0),'
+                    ' (SELECT toUInt8(count() > 0) FROM test_table WHERE (id > 0))'
+                    ' FROM test_table'
+                )
+            with self.subTest('failure'):
+                get_first_mock.return_value = (1, 0, 1, 1)
+                with self.assertRaisesRegex(AirflowException, 'Check: row_check'):
+                    operator.execute(context={})
+
+    def test_single_pass_combinators(self):
+        operator = ClickHouseSQLTableCheckOperator(
+            task_id='test-single-pass-combinators',  # required by Airflow
+            table='test_table',
+            checks={
+                'null_check': {'check_statement': 'countIf(col_a IS NULL) = 0'},
+                'distinct_check': {'check_statement': 'uniqExactIf(id, id > 0) > 1'},
+                'top_check': {'check_statement': 'has(topK(3)(col_b), 1)'},
+                'state_check': {'check_statement': 'sumMerge(col_c) > 0'},
+                'row_check': {'check_statement': 'minus(col_a, col_b) > 0'},
+            },
+        )
+        with mock.patch.object(operator, 'get_db_hook') as get_db_hook_mock:
+            get_first_mock = get_db_hook_mock.return_value.get_first
+            get_first_mock.return_value = (1, 1, 1, 1, 1)
+            operator.execute(context={})
+            get_first_mock.assert_called_once_with(
+                'SELECT toUInt8(countIf(col_a IS NULL) = 0),'
+                ' toUInt8(uniqExactIf(id, id > 0) > 1),'
+                ' toUInt8(has(topK(3)(col_b), 1)),'
+                ' toUInt8(sumMerge(col_c) > 0),'
+                ' min(toUInt8(minus(col_a, col_b) > 0))'
+                ' FROM test_table'
+            )
+
 
 class ClickHouseSQLCheckOperatorTestCase(unittest.TestCase):
     def test_init_arguments(self):
@@ -141,6 +280,73 @@ class ClickHouseSQLValueCheckOperatorTestCase(unittest.TestCase):
             for name, value in params.items():
                 self.assertEqual(kwargs[name], value)
 
+    def test_approximate(self):
+        operator = ClickHouseSQLValueCheckOperator(
+            task_id='test-approximate',  # required by Airflow
+            sql='SELECT count() FROM test_table',
+            pass_value=1000,
+            tolerance=0.2,
+            sample=0.1,
+        )
+        with mock.patch.object(operator, 'get_db_hook') as get_db_hook_mock:
+            get_first_mock = get_db_hook_mock.return_value.get_first
+            with self.subTest('passed approximately'):
+                get_first_mock.side_effect = [(1010,)]
+                operator.execute(context={})
+                get_first_mock.assert_called_once_with(
+                    'SELECT (count() * any(_sample_factor))'
+                    ' FROM test_table SAMPLE 0.1',
+                    None,
+                )
+            with self.subTest('failed approximately'):
+                get_first_mock.side_effect = [(2000,)]
+                with self.assertRaisesRegex(AirflowException, 'Approximate results'):
+                    operator.execute(context={})
+            with self.subTest('exact fallback'):
+                get_first_mock.reset_mock()
+                get_first_mock.side_effect = [(1150,), (1190,)]
+                operator.execute(context={})
+                get_first_mock.assert_called_with('SELECT count() FROM test_table', None)
+                self.assertEqual(2, get_first_mock.call_count)
+
+    def test_approximate_query_shapes(self):
+        for sql, expected in [
+            (
+                'SELECT sum(x) FROM db.test_table WHERE dt = today()',
+                'SELECT (sum(x) * any(_sample_factor))'
+                ' FROM db.test_table SAMPLE 0.1 WHERE dt = today()',
+            ),
+            (
+                'SELECT countIf(x > 0) FROM test_table;',
+                'SELECT (countIf(x > 0) * any(_sample_factor))'
+                ' FROM test_table SAMPLE 0.1;',
+            ),
+            ('SELECT count() FROM test_table WHERE EXTRACT(DAY FROM dt) = 1', None),
+            ('SELECT EXTRACT(DAY FROM dt) FROM test_table', None),
+            ('SELECT count() FROM (SELECT * FROM test_table)', None),
+            ('SELECT count() FROM test_table WHERE x IN (SELECT x FROM other)', None),
+            ('SELECT count() FROM test_table JOIN other USING x', None),
+            ('WITH 1 AS x SELECT count() FROM test_table', None),
+        ]:
+            operator = ClickHouseSQLValueCheckOperator(
+                task_id='test-approximate-query-shapes',  # required by Airflow
+                sql=sql,
+                pass_value=1000,
+                tolerance=0.2,
+                sample=0.1,
+            )
+            with self.subTest(sql), \
+                    mock.patch.object(operator, 'get_db_hook') as get_db_hook_mock:
+                get_first_mock = get_db_hook_mock.return_value.get_first
+                get_first_mock.return_value = (1000,)
+                if expected is None:
+                    with self.assertRaisesRegex(ValueError, 'use exact mode'):
+                        operator.execute(context={})
+                    get_first_mock.assert_not_called()
+                else:
+                    operator.execute(context={})
+                    get_first_mock.assert_called_once_with(expected, None)
+
 
 class ClickHouseSQLIntervalCheckOperatorTestCase(unittest.TestCase):
     def test_init_arguments(self):
@@ -162,6 +368,83 @@ class ClickHouseSQLIntervalCheckOperatorTestCase(unittest.TestCase):
             for name, value in params.items():
                 self.assertEqual(kwargs[name], value)
 
+    def test_approximate(self):
+        operator = ClickHouseSQLIntervalCheckOperator(
+            task_id='test-approximate',  # required by Airflow
+            table='test_table',
+            metrics_thresholds={'count()': 1.5, 'uniqExact(user_id)': 2},
+            approximate=True,
+        )
+        operator.sql1 = "SELECT count(), uniqExact(user_id) FROM test_table WHERE ds='2024-01-08'"
+        operator.sql2 = "SELECT count(), uniqExact(user_id) FROM test_table WHERE ds='2024-01-01'"
+        with mock.patch.object(operator, 'get_db_hook') as get_db_hook_mock:
+            get_first_mock = get_db_hook_mock.return_value.get_first
+            with self.subTest('passed approximately'):
+                get_first_mock.side_effect = [(100, 10), (110, 12)]
+                operator.execute(context={})
+                self.assertListEqual(
+                    [
+                        mock.call("SELECT count(), uniq(user_id) FROM test_table WHERE ds='2024-01-08'"),
+                        mock.call("SELECT count(), uniq(user_id) FROM test_table WHERE ds='2024-01-01'"),
+                    ],
+                    get_first_mock.call_args_list,
+                )
+            with self.subTest('failed approximately'):
+                get_first_mock.side_effect = [(100, 10), (300, 12)]
+                with self.assertRaisesRegex(AirflowException, 'count()'):
+                    operator.execute(context={})
+            with self.subTest('exact fallback'):
+                get_first_mock.reset_mock()
+                get_first_mock.side_effect = [(100, 10), (150, 12), (100, 10), (140, 12)]
+                operator.execute(context={})
+                self.assertEqual(4, get_first_mock.call_count)
+                get_first_mock.assert_called_with(operator.sql1)
+
+    def test_metric_store(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        operator = ClickHouseSQLIntervalCheckOperator(
+            task_id='test-metric-store',  # required by Airflow
+            table='test_table',
+            metrics_thresholds={'count()': 1.5},
+            metric_store=True,
+            metric_store_path=os.path.join(temp_dir.name, 'metrics.sqlite'),
+        )
+        operator.sql1 = "SELECT count() FROM test_table WHERE ds='2024-01-08'"
+        operator.sql2 = "SELECT count() FROM test_table WHERE ds='2024-01-01'"
+        with mock.patch.object(
+                ClickHouseBaseDbApiOperator, 'get_db_hook',
+        ) as get_db_hook_mock:
+            hook_mock = get_db_hook_mock.return_value
+            hook_mock.run.return_value = (1, 100, '2024-01-09 00:00:00')
+            with self.subTest('computed'):
+                hook_mock.get_first.side_effect = [(100,), (110,)]
+                operator.execute(context={'ds': '2024-01-08'})
+                self.assertEqual(2, hook_mock.get_first.call_count)
+                self.assertListEqual(
+                    ['2024-01-01', '2024-01-08'],
+                    [
+                        call.kwargs['parameters']['date']
+                        for call in hook_mock.run.call_args_list
+                    ],
+                )
+            with self.subTest('reused'):
+                hook_mock.get_first.reset_mock()
+                operator.execute(context={'ds': '2024-01-08'})
+                hook_mock.get_first.assert_not_called()
+            with self.subTest('another date filter column'):
+                operator.date_filter_column = 'event_date'
+                hook_mock.get_first.side_effect = [(100,), (110,)]
+                operator.execute(context={'ds': '2024-01-08'})
+                self.assertEqual(2, hook_mock.get_first.call_count)
+                operator.date_filter_column = 'ds'
+                hook_mock.get_first.reset_mock()
+            with self.subTest('invalidated'):
+                hook_mock.run.return_value = (2, 120, '2024-01-10 00:00:00')
+                hook_mock.get_first.side_effect = [(100,), (120,)]
+                operator.execute(context={'ds': '2024-01-08'})
+                self.assertEqual(2, hook_mock.get_first.call_count)
+
 
 class ClickHouseSQLThresholdCheckOperatorTestCase(unittest.TestCase):
     def test_init_arguments(self):
@@ -2,8 +2,10 @@ import unittest
 from unittest import mock
 
 from airflow import AirflowException
+from airflow.exceptions import AirflowSensorTimeout, TaskDeferred
 
-from airflow_clickhouse_plugin.sensors.clickhouse import ClickHouseSensor
+from airflow_clickhouse_plugin.sensors.clickhouse import \
+    ClickHousePartitionSensor, ClickHouseSensor, ClickHouseTableChangeSensor
 
 
 class ClickHouseSensorTestCase(unittest.TestCase):
@@ -41,6 +43,8 @@ class ClickHouseSensorTestCase(unittest.TestCase):
                 {'test-setting': 1},
                 True,
                 True,
+                parallelism=1,
+                error_policy='fail_fast',
             )
         with self.subTest('is_failure'):
             is_failure_mock.assert_called_once_with(execute_mock.return_value)
@@ -73,6 +77,8 @@ class ClickHouseSensorTestCase(unittest.TestCase):
                 None,
                 False,
                 False,
+                parallelism=1,
+                error_policy='fail_fast',
             )
         with self.subTest('is_success is bool'):
             self.assertIs(return_value, bool_mock.return_value)
@@ -86,6 +92,63 @@ class ClickHouseSensorTestCase(unittest.TestCase):
                 is_failure=is_failure_mock,
             ).poke(context={})
 
+    def test_deferrable(self):
+        is_success_mock = mock.Mock(side_effect=[False, True])
+        sensor = ClickHouseSensor(
+            task_id='test4',  # required by Airflow
+            sql='SELECT 4',
+            poke_interval=10,
+            timeout=100,
+            is_success=is_success_mock,
+            deferrable=True,
+        )
+        with self.assertRaises(TaskDeferred) as deferred, \
+                mock.patch('time.time', return_value=1000):
+            sensor.execute(context={})
+        with self.subTest('ClickHouseHook.execute'):
+            self._hook_cls_mock.return_value.execute.assert_not_called()
+        with self.subTest('trigger'):
+            self.assertEqual('execute_complete', deferred.exception.method_name)
+            self.assertEqual(100, deferred.exception.timeout.total_seconds())
+            self.assertDictEqual({'deadline': 1100}, deferred.exception.kwargs)
+            self.assertEqual(10, deferred.exception.trigger.poke_interval)
+        event = {'status': 'success', 'result': [(4,)]}
+        with self.subTest('is_success is falsy'):
+            with self.assertRaises(TaskDeferred) as deferred, \
+                    mock.patch('time.time', return_value=1030):
+                sensor.execute_complete(context={}, event=event, deadline=1100)
+            # the rest of the timeout
+            self.assertEqual(70, deferred.exception.timeout.total_seconds())
+            self.assertDictEqual({'deadline': 1100}, deferred.exception.kwargs)
+        with self.subTest('is_success is truthy'):
+            sensor.execute_complete(context={}, event=event, deadline=1100)
+            is_success_mock.assert_called_with([(4,)])
+        with self.subTest('timed out'):
+            is_success_mock.side_effect = None
+            is_success_mock.return_value = False
+            with self.assertRaises(AirflowSensorTimeout), \
+                    mock.patch('time.time', return_value=1100):
+                sensor.execute_complete(context={}, event=event, deadline=1100)
+        with self.subTest('error'):
+            with self.assertRaisesRegex(AirflowException, 'test-error'):
+                sensor.execute_complete(
+                    context={},
+                    event={'status': 'error', 'message': 'test-error'},
+                )
+
+    def test_batched(self):
+        with self.subTest('requires deferrable'):
+            with self.assertRaisesRegex(ValueError, 'batched requires deferrable'):
+                ClickHouseSensor(task_id='test5', sql='SELECT 5', batched=True)
+        with self.assertRaises(TaskDeferred) as deferred:
+            ClickHouseSensor(
+                task_id='test5',  # required by Airflow
+                sql='SELECT 5',
+                deferrable=True,
+                batched=True,
+            ).execute(context={})
+        self.assertTrue(deferred.exception.trigger.batched)
+
     def setUp(self):
         self._hook_cls_patcher = mock.patch('.'.join((
             'airflow_clickhouse_plugin.operators',
@@ -97,6 +160,85 @@ class ClickHouseSensorTestCase(unittest.TestCase):
         self._hook_cls_patcher.stop()
 
 
+class ClickHouseTablesSensorTestCase(unittest.TestCase):
+    def test_partition(self):
+        execute_mock: mock.Mock = self._hook_cls_mock.return_value.execute
+        execute_mock.return_value = [('test_db', 'events', True)]
+        sensor = ClickHousePartitionSensor(
+            task_id='test-partition',  # required by Airflow
+            tables=['events', 'other_db.sessions'],
+            partition='20240101',
+            min_rows=10,
+        )
+        with self.subTest('single query'):
+            self.assertFalse(sensor.poke(context={}))
+            execute_mock.assert_called_once()
+            sql, parameters = execute_mock.call_args.args[:2]
+            self.assertIn('FROM system.parts', sql)
+            self.assertIn('partition = %(partition)s', sql)
+            self.assertNotIn('%(modified_after)s', sql)
+            self.assertDictEqual(
+                {
+                    'tables': ['events', 'other_db.sessions'],
+                    'partition': '20240101',
+                    'min_rows': 10,
+                    'modified_after': None,
+                },
+                parameters,
+            )
+        with self.subTest('all tables found'):
+            execute_mock.return_value.append(('other_db', 'sessions', False))
+            self.assertTrue(sensor.poke(context={}))
+        with self.subTest('table of another database'):
+            execute_mock.return_value = [
+                ('other_db', 'events', False),
+                ('other_db', 'sessions', False),
+            ]
+            self.assertFalse(sensor.poke(context={}))
+
+    def test_table_change(self):
+        execute_mock: mock.Mock = self._hook_cls_mock.return_value.execute
+        execute_mock.return_value = [('test_db', 'events', True)]
+        sensor = ClickHouseTableChangeSensor(
+            task_id='test-table-change',  # required by Airflow
+            tables='test_db.events',
+            modified_after='2024-01-01T00:00:00+00:00',
+        )
+        self.assertTrue(sensor.poke(context={}))
+        sql, parameters = execute_mock.call_args.args[:2]
+        self.assertIn('FROM system.tables', sql)
+        self.assertDictEqual(
+            {
+                'tables': ['test_db.events'],
+                'modified_after': '2024-01-01T00:00:00+00:00',
+            },
+            parameters,
+        )
+
+    def test_is_success(self):
+        is_success_mock = mock.Mock()
+        self.assertIs(
+            is_success_mock.return_value,
+            ClickHousePartitionSensor(
+                task_id='test-is-success',  # required by Airflow
+                tables='events',
+                is_success=is_success_mock,
+            ).poke(context={}),
+        )
+
+    def test_empty_tables(self):
+        with self.assertRaisesRegex(ValueError, 'tables must not be empty'):
+            ClickHousePartitionSensor(task_id='test-empty', tables=[])
+
+    def setUp(self):
+        hook_cls_patcher = mock.patch('.'.join((
+            'airflow_clickhouse_plugin.operators',
+            'clickhouse.ClickHouseHook',
+        )))
+        self._hook_cls_mock = hook_cls_patcher.start()
+        self.addCleanup(hook_cls_patcher.stop)
+
+
 class ClickHouseSensorClassTestCase(unittest.TestCase):
     def test_template_fields(self):
         self.assertSetEqual(
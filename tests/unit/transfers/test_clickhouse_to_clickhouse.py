@@ -0,0 +1,169 @@
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.transfers.clickhouse_to_clickhouse import \
+    ClickHouseToClickHouseOperator
+
+
+class ClickHouseToClickHouseOperatorTestCase(unittest.TestCase):
+    def test_transfer(self):
+        self._source_mock.execute_iter.return_value = _generator(
+            [[('id', 'UInt64'), ('name', 'String')]]
+            + [(number, str(number)) for number in range(5)]
+        )
+        inserted = []
+        self._destination_mock.execute.side_effect = \
+            lambda query, rows, settings: inserted.extend(rows) or len(inserted)
+        return_value = ClickHouseToClickHouseOperator(
+            task_id='test1',  # required by Airflow
+            sql='SELECT id, name FROM source',
+            table='destination',
+            parameters={'test-param': 1},
+            source_conn_id='source-conn-id',
+            source_settings={'max_block_size': 2},
+            destination_conn_id='destination-conn-id',
+            destination_database='test-database',
+            destination_settings={'test-setting': 1},
+            chunk_rows=2,
+            queue_size=1,
+        ).execute(context={})
+        with self.subTest('ClickHouseHook.__init__'):
+            self.assertListEqual(
+                [
+                    mock.call(clickhouse_conn_id='source-conn-id', database=None),
+                    mock.call(
+                        clickhouse_conn_id='destination-conn-id',
+                        database='test-database',
+                    ),
+                ],
+                self._hook_cls_mock.mock_calls,
+            )
+        with self.subTest('ClickHouseHook.execute_iter'):
+            self._source_mock.execute_iter.assert_called_once_with(
+                'SELECT id, name FROM source',
+                {'test-param': 1},
+                with_column_types=True,
+                settings={'max_block_size': 2},
+            )
+        with self.subTest('ClickHouseHook.execute'):
+            self._destination_mock.execute.assert_called_once_with(
+                'INSERT INTO destination (`id`, `name`) VALUES',
+                mock.ANY,
+                settings={'test-setting': 1, 'insert_block_size': 2},
+            )
+        with self.subTest('inserted rows'):
+            self.assertListEqual(
+                [(number, str(number)) for number in range(5)],
+                inserted,
+            )
+        with self.subTest('return value'):
+            self.assertEqual(5, return_value)
+
+    def test_columns(self):
+        self._source_mock.execute_iter.return_value = _generator([[('x', 'UInt8')]])
+        self._destination_mock.execute.side_effect = \
+            lambda query, rows, settings: len(list(rows))
+        ClickHouseToClickHouseOperator(
+            task_id='test2',  # required by Airflow
+            sql='SELECT 1',
+            table='destination',
+            columns=['id'],
+        ).execute(context={})
+        self.assertEqual(
+            'INSERT INTO destination (`id`) VALUES',
+            self._destination_mock.execute.call_args.args[0],
+        )
+
+    def test_source_failure(self):
+        def fail():
+            yield [('id', 'UInt64')]
+            yield (1,)
+            raise ValueError('test-error')
+
+        self._source_mock.execute_iter.return_value = fail()
+        self._destination_mock.execute.side_effect = \
+            lambda query, rows, settings: len(list(rows))
+        with self.assertRaisesRegex(ValueError, 'test-error'):
+            ClickHouseToClickHouseOperator(
+                task_id='test3',  # required by Airflow
+                sql='SELECT 1',
+                table='destination',
+                chunk_rows=1,
+            ).execute(context={})
+
+    def test_destination_failure(self):
+        rows = _generator([[('id', 'UInt64')]] + [(number,) for number in range(100)])
+        self._source_mock.execute_iter.return_value = rows
+        self._destination_mock.execute.side_effect = ValueError('test-error')
+        with self.assertRaisesRegex(ValueError, 'test-error'):
+            ClickHouseToClickHouseOperator(
+                task_id='test4',  # required by Airflow
+                sql='SELECT 1',
+                table='destination',
+                chunk_rows=1,
+                queue_size=1,
+            ).execute(context={})
+        with self.subTest('reader is stopped'):
+            self.assertIsNone(rows.gi_frame)
+
+    def test_server_side(self):
+        self._source_mock.query_stats = [{'written_rows': 10}]
+        with mock.patch(
+            'airflow_clickhouse_plugin.transfers.clickhouse_to_clickhouse'
+            '.get_connection_kwargs',
+            return_value={
+                'host': 'dest-host',
+                'alt_hosts': 'dest-replica:9001',
+                'user': 'test-user',
+                'password': 'test-password',
+                'database': 'test-database',
+                'secure': True,
+            },
+        ):
+            return_value = ClickHouseToClickHouseOperator(
+                task_id='test5',  # required by Airflow
+                sql='SELECT * FROM source WHERE id > %(min_id)s',
+                table='destination',
+                columns=['id'],
+                parameters={'min_id': 1},
+                source_settings={'test-setting': 1},
+                server_side=True,
+            ).execute(context={})
+        with self.subTest('query'):
+            self._source_mock.execute.assert_called_once_with(
+                'INSERT INTO FUNCTION remoteSecure(%(_remote_addresses)s,'
+                ' %(_remote_table)s, %(_remote_user)s, %(_remote_password)s)'
+                ' (`id`) SELECT * FROM source WHERE id > %(min_id)s',
+                {
+                    'min_id': 1,
+                    '_remote_addresses': 'dest-host:9440|dest-replica:9001',
+                    '_remote_table': 'test-database.destination',
+                    '_remote_user': 'test-user',
+                    '_remote_password': 'test-password',
+                },
+                settings={'test-setting': 1},
+                secret_params=('_remote_password',),
+            )
+        with self.subTest('return value'):
+            self.assertEqual(10, return_value)
+
+    def setUp(self):
+        self._hook_cls_patcher = mock.patch('.'.join((
+            'airflow_clickhouse_plugin.transfers',
+            'clickhouse_to_clickhouse.ClickHouseHook',
+        )))
+        self._hook_cls_mock = self._hook_cls_patcher.start()
+        self._source_mock, self._destination_mock = mock.Mock(), mock.Mock()
+        self._hook_cls_mock.side_effect = [self._source_mock, self._destination_mock]
+
+    def tearDown(self):
+        self._hook_cls_patcher.stop()
+
+
+def _generator(items: list):
+    # ClickHouseHook.execute_iter returns a generator
+    yield from items
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+import csv
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.transfers.clickhouse_to_file import \
+    ClickHouseToFileOperator
+
+_COLUMNS = [('id', 'UInt64'), ('name', 'Nullable(String)')]
+
+
+class ClickHouseToFileOperatorTestCase(unittest.TestCase):
+    def test_csv(self):
+        self._execute_iter_mock.side_effect = lambda query, *args, **kwargs: \
+            _generator([_COLUMNS, (1, 'a'), (2, None), (3, 'c')])
+        manifest = ClickHouseToFileOperator(
+            task_id='test1',  # required by Airflow
+            sql='SELECT id, name FROM test',
+            output_dir=self._output_dir,
+            file_format='csv',
+            chunk_rows=2,
+            clickhouse_conn_id='test-conn-id',
+        ).execute(context={})
+        path = os.path.join(self._output_dir, 'part-00000.csv')
+        with self.subTest('ClickHouseHook.__init__'):
+            self._hook_cls_mock.assert_called_once_with(
+                clickhouse_conn_id='test-conn-id',
+                database=None,
+                use_pool=True,
+            )
+        with self.subTest('ClickHouseHook.execute_iter'):
+            self._execute_iter_mock.assert_called_once_with(
+                'SELECT id, name FROM test',
+                None,
+                with_column_types=True,
+                settings=None,
+            )
+        with self.subTest('file'):
+            with open(path, newline='') as file:
+                self.assertListEqual(
+                    [['id', 'name'], ['1', 'a'], ['2', ''], ['3', 'c']],
+                    list(csv.reader(file)),
+                )
+        with self.subTest('manifest'):
+            self.assertDictEqual(
+                {
+                    'format': 'csv',
+                    'rows': 3,
+                    'files': [{
+                        'path': path,
+                        'partition': None,
+                        'rows': 3,
+                        'bytes': os.path.getsize(path),
+                    }],
+                },
+                manifest,
+            )
+
+    def test_hash_partitions(self):
+        # the second slice is empty
+        self._execute_iter_mock.side_effect = [
+            _generator([_COLUMNS, (1, 'a')]),
+            _generator([_COLUMNS]),
+            _generator([_COLUMNS, (3, 'c'), (4, 'd')]),
+        ]
+        manifest = ClickHouseToFileOperator(
+            task_id='test2',  # required by Airflow
+            sql='SELECT id, name FROM test',
+            output_dir=self._output_dir,
+            file_format='csv',
+            partition_by='id',
+            partitions=3,
+            parallelism=1,  # slices are queried in order
+        ).execute(context={})
+        with self.subTest('queries'):
+            self.assertListEqual(
+                [
+                    'SELECT * FROM (SELECT id, name FROM test)'
+                    f' WHERE cityHash64(id) % 3 = {partition}'
+                    for partition in range(3)
+                ],
+                [call.args[0] for call in self._execute_iter_mock.mock_calls],
+            )
+        with self.subTest('manifest'):
+            self.assertEqual(3, manifest['rows'])
+            self.assertListEqual(
+                [(0, 1), (2, 2)],
+                [(file['partition'], file['rows']) for file in manifest['files']],
+            )
+
+    def test_distinct_partitions(self):
+        self._hook_cls_mock.return_value.execute.return_value = [('x',), ('y',)]
+        self._execute_iter_mock.side_effect = lambda query, *args, **kwargs: \
+            _generator([_COLUMNS, (1, 'a')])
+        manifest = ClickHouseToFileOperator(
+            task_id='test3',  # required by Airflow
+            sql='SELECT id, name FROM test WHERE id > %(min_id)s',
+            parameters={'min_id': 0},
+            output_dir=self._output_dir,
+            file_format='csv',
+            partition_by='name',
+        ).execute(context={})
+        with self.subTest('ClickHouseHook.execute'):
+            self._hook_cls_mock.return_value.execute.assert_called_once_with(
+                'SELECT DISTINCT name'
+                ' FROM (SELECT id, name FROM test WHERE id > %(min_id)s)',
+                {'min_id': 0},
+                settings=None,
+            )
+        with self.subTest('parameters'):
+            self.assertCountEqual(
+                [{'min_id': 0, '_partition': 'x'}, {'min_id': 0, '_partition': 'y'}],
+                [call.args[1] for call in self._execute_iter_mock.mock_calls],
+            )
+        with self.subTest('manifest'):
+            self.assertListEqual(
+                ['x', 'y'],
+                [file['partition'] for file in manifest['files']],
+            )
+
+    def test_no_partitions(self):
+        self._hook_cls_mock.return_value.execute.return_value = []
+        for partitions in ([], None):
+            with self.subTest(partitions=partitions):
+                manifest = ClickHouseToFileOperator(
+                    task_id='test8',  # required by Airflow
+                    sql='SELECT id, name FROM test',
+                    output_dir=self._output_dir,
+                    partition_by='name',
+                    partitions=partitions,
+                    parallelism=4,
+                ).execute(context={})
+                self.assertDictEqual(
+                    {'format': 'parquet', 'rows': 0, 'files': []},
+                    manifest,
+                )
+                self._execute_iter_mock.assert_not_called()
+
+    def test_no_result(self):
+        self._execute_iter_mock.side_effect = lambda query, *args, **kwargs: \
+            _generator([])
+        manifest = ClickHouseToFileOperator(
+            task_id='test9',  # required by Airflow
+            sql='SELECT id, name FROM test',
+            output_dir=self._output_dir,
+            file_format='csv',
+        ).execute(context={})
+        self.assertDictEqual({'format': 'csv', 'rows': 0, 'files': []}, manifest)
+
+    def test_failure(self):
+        self._execute_iter_mock.side_effect = ValueError('test-error')
+        with self.assertRaisesRegex(ValueError, 'test-error'):
+            ClickHouseToFileOperator(
+                task_id='test4',  # required by Airflow
+                sql='SELECT 1',
+                output_dir=self._output_dir,
+                partition_by='id',
+                partitions=2,
+            ).execute(context={})
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+    def test_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._execute_iter_mock.side_effect = lambda query, *args, **kwargs: \
+            _generator([_COLUMNS + [('tags', 'Array(String)')], (1, None, ['t']), (2, 'b', [])])
+        manifest = ClickHouseToFileOperator(
+            task_id='test5',  # required by Airflow
+            sql='SELECT id, name, tags FROM test',
+            output_dir=self._output_dir,
+            chunk_rows=1,
+        ).execute(context={})
+        table = pq.read_table(manifest['files'][0]['path'])
+        with self.subTest('schema'):
+            self.assertListEqual(
+                [pa.uint64(), pa.string(), pa.list_(pa.string())],
+                table.schema.types,
+            )
+        with self.subTest('data'):
+            self.assertDictEqual(
+                {'id': [1, 2], 'name': [None, 'b'], 'tags': [['t'], []]},
+                table.to_pydict(),
+            )
+
+    def test_arguments_validation(self):
+        with self.subTest('file_format'), \
+                self.assertRaisesRegex(ValueError, 'test-format'):
+            ClickHouseToFileOperator(
+                task_id='test6',  # required by Airflow
+                sql='SELECT 1',
+                output_dir=self._output_dir,
+                file_format='test-format',
+            )
+        with self.subTest('partitions'), \
+                self.assertRaisesRegex(ValueError, 'partition_by'):
+            ClickHouseToFileOperator(
+                task_id='test7',  # required by Airflow
+                sql='SELECT 1',
+                output_dir=self._output_dir,
+                partitions=2,
+            )
+
+    def setUp(self):
+        self._hook_cls_patcher = mock.patch('.'.join((
+            'airflow_clickhouse_plugin.transfers',
+            'clickhouse_to_file.ClickHouseHook',
+        )))
+        self._hook_cls_mock = self._hook_cls_patcher.start()
+        self._execute_iter_mock = self._hook_cls_mock.return_value.execute_iter
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._output_dir = os.path.join(temp_dir.name, 'output')
+
+    def tearDown(self):
+        self._hook_cls_patcher.stop()
+
+
+def _generator(items: list):
+    # ClickHouseHook.execute_iter returns a generator
+    yield from items
+
+
+if __name__ == '__main__':
+    unittest.main()
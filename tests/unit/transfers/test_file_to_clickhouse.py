@@ -0,0 +1,150 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.transfers.file_to_clickhouse import \
+    FileToClickHouseOperator
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+class FileToClickHouseOperatorTestCase(unittest.TestCase):
+    def test_csv(self):
+        path = self._write('data.csv', 'id,name\n1,a\n2,b\n3,c\n')
+        result = FileToClickHouseOperator(
+            task_id='test1',  # required by Airflow
+            path=path,
+            table='test_table',
+            chunk_rows=2,
+            parallelism=1,  # chunks are inserted in order
+            settings={'test-setting': 1},
+            clickhouse_conn_id='test-conn-id',
+        ).execute(context={})
+        with self.subTest('ClickHouseHook.__init__'):
+            self._hook_cls_mock.assert_called_once_with(
+                clickhouse_conn_id='test-conn-id',
+                database=None,
+                use_pool=True,
+            )
+        with self.subTest('ClickHouseHook.insert_arrow'):
+            self.assertListEqual(
+                [
+                    ('test_table', {'id': [1, 2], 'name': ['a', 'b']}, 2, {'test-setting': 1}),
+                    ('test_table', {'id': [3], 'name': ['c']}, 2, {'test-setting': 1}),
+                ],
+                self._inserted,
+            )
+        with self.subTest('result'):
+            self.assertEqual(3, result['rows'])
+            self.assertEqual(2, result['chunks'])
+            self.assertGreater(result['rows_per_second'], 0)
+
+    def test_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self._temp_dir, 'data.parquet')
+        pq.write_table(
+            pa.table({'id': [1, 2, 3], 'name': ['a', 'b', 'c']}),
+            path,
+            row_group_size=1,
+        )
+        FileToClickHouseOperator(
+            task_id='test2',  # required by Airflow
+            path=path,
+            table='test_table',
+            columns=['id'],
+            chunk_rows=2,
+            parallelism=1,  # chunks are inserted in order
+        ).execute(context={})
+        self.assertListEqual(
+            [{'id': [1, 2]}, {'id': [3]}],
+            [data for _, data, _, _ in self._inserted],
+        )
+
+    def test_ndjson(self):
+        path = self._write('data.jsonl', '\n'.join(
+            json.dumps({'id': number, 'name': str(number)}) for number in range(5)
+        ))
+        result = FileToClickHouseOperator(
+            task_id='test3',  # required by Airflow
+            path=path,
+            table='test_table',
+            chunk_rows=3,
+            parallelism=2,
+        ).execute(context={})
+        self.assertEqual(5, result['rows'])
+        self.assertCountEqual(
+            [[0, 1, 2], [3, 4]],
+            [data['id'] for _, data, _, _ in self._inserted],
+        )
+
+    def test_insert_deduplication_token(self):
+        paths = [
+            self._write('first.csv', 'id\n1\n2\n3\n'),
+            self._write('second.csv', 'id\n4\n'),
+        ]
+        FileToClickHouseOperator(
+            task_id='test4',  # required by Airflow
+            path=paths,
+            table='test_table',
+            chunk_rows=2,
+            insert_deduplication_token='test-token',
+        ).execute(context={})
+        self.assertCountEqual(
+            ['test-token-0-0', 'test-token-0-1', 'test-token-1-0'],
+            [settings['insert_deduplication_token'] for *_, settings in self._inserted],
+        )
+
+    def test_failure(self):
+        path = self._write('data.csv', 'id\n1\n2\n')
+        self._hook_cls_mock.return_value.insert_arrow.side_effect = \
+            ValueError('test-error')
+        with self.assertRaisesRegex(ValueError, 'test-error'):
+            FileToClickHouseOperator(
+                task_id='test5',  # required by Airflow
+                path=path,
+                table='test_table',
+                chunk_rows=1,
+            ).execute(context={})
+
+    def test_unknown_file_format(self):
+        path = self._write('data.txt', '')
+        with self.assertRaisesRegex(ValueError, 'data.txt'):
+            FileToClickHouseOperator(
+                task_id='test6',  # required by Airflow
+                path=path,
+                table='test_table',
+            ).execute(context={})
+
+    def _write(self, name: str, content: str) -> str:
+        path = os.path.join(self._temp_dir, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def _insert_arrow(self, table, data, chunk_rows, settings):
+        self._inserted.append((table, data.to_pydict(), chunk_rows, settings))
+        return data.num_rows
+
+    def setUp(self):
+        self._hook_cls_patcher = mock.patch('.'.join((
+            'airflow_clickhouse_plugin.transfers',
+            'file_to_clickhouse.ClickHouseHook',
+        )))
+        self._hook_cls_mock = self._hook_cls_patcher.start()
+        self._inserted = []
+        self._hook_cls_mock.return_value.insert_arrow.side_effect = \
+            self._insert_arrow
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._temp_dir = temp_dir.name
+
+    def tearDown(self):
+        self._hook_cls_patcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
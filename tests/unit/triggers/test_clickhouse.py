@@ -0,0 +1,171 @@
+import asyncio
+import sys
+import unittest
+from unittest import mock
+
+from airflow_clickhouse_plugin.triggers import clickhouse as triggers_module
+from airflow_clickhouse_plugin.triggers.clickhouse import ClickHouseTrigger
+
+
+class ClickHouseTriggerTestCase(unittest.TestCase):
+    def test_serialize(self):
+        trigger = ClickHouseTrigger(
+            ('SELECT 1', 'SELECT 2'),
+            {'test-param': 1},
+            True,
+            [{'name': 'ext'}],
+            'test-query-id',
+            {'test-setting': 1},
+            True,
+            True,
+            clickhouse_conn_id='test-conn-id',
+            database='test-database',
+            poke_interval=5,
+        )
+        classpath, kwargs = trigger.serialize()
+        self.assertEqual(
+            'airflow_clickhouse_plugin.triggers.clickhouse.ClickHouseTrigger',
+            classpath,
+        )
+        self.assertDictEqual(
+            {
+                'sql': ['SELECT 1', 'SELECT 2'],
+                'parameters': {'test-param': 1},
+                'with_column_types': True,
+                'external_tables': [{'name': 'ext'}],
+                'query_id': 'test-query-id',
+                'settings': {'test-setting': 1},
+                'types_check': True,
+                'columnar': True,
+                'clickhouse_conn_id': 'test-conn-id',
+                'database': 'test-database',
+                'poke_interval': 5,
+                'batched': False,
+            },
+            kwargs,
+        )
+        self.assertTupleEqual(
+            (classpath, kwargs),
+            ClickHouseTrigger(**kwargs).serialize(),
+        )
+
+    def test_run_once(self):
+        self._execute_mock.side_effect = [[]]
+        events = self._run(ClickHouseTrigger(
+            'SELECT 1',
+            clickhouse_conn_id='test-conn-id',
+            database='test-database',
+        ))
+        with self.subTest('ClickHouseAsyncHook.__init__'):
+            self._hook_cls_mock.assert_called_once_with(
+                clickhouse_conn_id='test-conn-id',
+                database='test-database',
+            )
+        with self.subTest('ClickHouseAsyncHook.execute'):
+            self._execute_mock.assert_called_once_with(
+                'SELECT 1', None, False, None, None, None, False, False,
+            )
+        with self.subTest('event'):
+            self.assertListEqual([{'status': 'success', 'result': []}], events)
+
+    def test_run_poke(self):
+        self._execute_mock.side_effect = [[], [], [(1,)]]
+        with mock.patch('asyncio.sleep') as sleep_mock:
+            events = self._run(ClickHouseTrigger('SELECT 1', poke_interval=5))
+        self.assertEqual(3, self._execute_mock.call_count)
+        self.assertListEqual([mock.call(5)] * 2, sleep_mock.mock_calls)
+        self.assertListEqual([{'status': 'success', 'result': [(1,)]}], events)
+
+    def test_run_error(self):
+        self._execute_mock.side_effect = ValueError('test-error')
+        events = self._run(ClickHouseTrigger('SELECT 1', poke_interval=5))
+        self.assertListEqual([{'status': 'error', 'message': 'test-error'}], events)
+
+    def test_batched(self):
+        self._execute_mock.side_effect = [[(0, 1), (0, 2), (2, 3)]]
+        events = self._run(
+            ClickHouseTrigger('SELECT %(a)s', {'a': 1}, batched=True),
+            ClickHouseTrigger("SELECT 'b%'", batched=True),
+            ClickHouseTrigger('SELECT %(a)s', {'a': 3}, batched=True),
+        )
+        with self.subTest('single query'):
+            self._execute_mock.assert_called_once_with(
+                '\nUNION ALL\n'.join((
+                    'SELECT 0, * FROM (\nSELECT %(_0_a)s\n)',
+                    "SELECT 1, * FROM (\nSELECT 'b%%'\n)",
+                    'SELECT 2, * FROM (\nSELECT %(_2_a)s\n)',
+                )),
+                {'_0_a': 1, '_2_a': 3},
+                settings=None,
+                types_check=False,
+            )
+        with self.subTest('results are fanned out'):
+            self.assertListEqual(
+                [
+                    [{'status': 'success', 'result': [(1,), (2,)]}],
+                    [{'status': 'success', 'result': []}],
+                    [{'status': 'success', 'result': [(3,)]}],
+                ],
+                events,
+            )
+
+    def test_batched_error(self):
+        self._execute_mock.side_effect = [
+            ValueError('test-combined-error'),
+            [(1,)],
+            ValueError('test-error'),
+        ]
+        events = self._run(
+            ClickHouseTrigger('SELECT 1', batched=True),
+            ClickHouseTrigger('SELECT x', batched=True),
+        )
+        self.assertEqual(3, self._execute_mock.call_count)
+        self.assertListEqual(
+            [
+                [{'status': 'success', 'result': [(1,)]}],
+                [{'status': 'error', 'message': 'test-error'}],
+            ],
+            events,
+        )
+
+    def test_batched_validation(self):
+        with self.assertRaisesRegex(ValueError, 'batched requires'):
+            ClickHouseTrigger(['SELECT 1', 'SELECT 2'], batched=True)
+
+    @staticmethod
+    def _run(*triggers: ClickHouseTrigger) -> list:
+        async def collect(trigger: ClickHouseTrigger) -> list:
+            return [event.payload async for event in trigger.run()]
+
+        async def collect_all() -> list:
+            return await asyncio.gather(*map(collect, triggers))
+
+        if len(triggers) == 1:
+            return asyncio.run(collect(*triggers))
+        return asyncio.run(collect_all())
+
+    def setUp(self):
+        # hook module is mocked because it requires the async extra
+        self._hook_module_mock = mock.Mock()
+        self._hook_cls_mock = self._hook_module_mock.ClickHouseAsyncHook
+        self._execute_mock = mock.AsyncMock()
+        self._hook_cls_mock.return_value.execute = self._execute_mock
+        self._modules_patcher = mock.patch.dict(sys.modules, {
+            'airflow_clickhouse_plugin.hooks.clickhouse_async':
+                self._hook_module_mock,
+        })
+        self._modules_patcher.start()
+        self._batch_patcher = mock.patch.multiple(
+            triggers_module,
+            _BATCH_WINDOW=0,
+            _batches={},
+        )
+        self._batch_patcher.start()
+        self.addCleanup(self._batch_patcher.stop)
+
+    def tearDown(self):
+        self._modules_patcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()